@@ -0,0 +1,356 @@
+"""
+Occupancy of the places, classes and professors, computed with NumPy.
+
+The class times of the courses (see timeslots.parse_day_time) are gathered
+once into flat session arrays. For each entity field (place, class_name,
+professor) they become an occupancy matrix of entity × weekday × 5-minute
+bin holding the number of sessions in progress, from which every report is
+an array reduction:
+
+    - the hours each entity is occupied on each weekday, and its utilization
+      of the opening hours,
+    - the periods an entity has two sessions at once (double-booked rooms),
+    - the units and weekly class hours of each professor,
+    - the number of entities in use at each hour, shown as heatmaps.
+
+Requires NumPy (pip install numpy).
+"""
+import csv
+import html
+import json
+import os
+
+import numpy as np
+
+from timeslots import WEEKDAY_NAMES, format_time, parse_day_time
+
+BIN_MINUTES = 5
+BINS_PER_DAY = 24 * 60 // BIN_MINUTES
+BINS_PER_HOUR = 60 // BIN_MINUTES
+
+# Fields whose values are the entities of the reports, with their titles in the page
+ENTITY_FIELDS = {
+    "place": "مکان برگزاری",
+    "class_name": "نام کلاس",
+    "professor": "استاد",
+}
+
+# Hours the utilization is measured against, and shown in the heatmaps
+OPEN_HOURS = (7, 21)
+OPEN_DAYS = 6  # Saturday to Thursday
+
+
+class Sessions:
+    """
+    Class sessions of a set of courses, as flat arrays.
+
+    Attributes:
+        course (ndarray): Row of the course of each session.
+        weekday, start, end (ndarray): Weekday number and first and end bin
+            of each session. Times are rounded to the nearest bin, so a
+            session ending when the next starts never overlaps it, and each
+            session covers at least one bin.
+        units (ndarray): Total units of each course.
+        codes (dict): For each of ENTITY_FIELDS, the entity of each course as
+            an index into names[field], or -1 if the value is empty.
+        names (dict): For each of ENTITY_FIELDS, the name of each entity.
+        course_codes, class_codes (list): course_code and class_code of each course.
+    """
+
+    def __init__(self, course, weekday, start, end, units, codes, names, course_codes, class_codes):
+        self.course = np.asarray(course, dtype=np.intp)
+        self.weekday = np.asarray(weekday, dtype=np.intp)
+        self.start = np.minimum((np.asarray(start, dtype=np.intp) + BIN_MINUTES // 2) // BIN_MINUTES,
+                                BINS_PER_DAY - 1)
+        self.end = np.clip((np.asarray(end, dtype=np.intp) + BIN_MINUTES // 2) // BIN_MINUTES,
+                           self.start + 1, BINS_PER_DAY)
+        self.units = np.asarray(units, dtype=np.float64)
+        self.codes = codes
+        self.names = names
+        self.course_codes = course_codes
+        self.class_codes = class_codes
+
+    @classmethod
+    def from_courses(cls, courses):
+        """Gather the sessions of an iterable of courses."""
+        course, weekday, start, end, units, course_codes, class_codes = [], [], [], [], [], [], []
+        codes = {field: [] for field in ENTITY_FIELDS}
+        entities = {field: {} for field in ENTITY_FIELDS}
+        sessions = {}  # day_time -> its parsed sessions
+        for row, item in enumerate(courses):
+            day_time = item.day_time
+            if day_time not in sessions:
+                sessions[day_time] = parse_day_time(day_time)
+            for session_weekday, session_start, session_end in sessions[day_time]:
+                course.append(row)
+                weekday.append(session_weekday)
+                start.append(session_start)
+                end.append(session_end)
+            for field, field_codes in codes.items():
+                value = getattr(item, field).strip()
+                field_codes.append(entities[field].setdefault(value, len(entities[field])) if value else -1)
+            units.append(item.total_units)
+            course_codes.append(item.course_code)
+            class_codes.append(item.class_code)
+        return cls(
+            course, weekday, start, end, units,
+            {field: np.asarray(field_codes, dtype=np.intp) for field, field_codes in codes.items()},
+            {field: list(entities[field]) for field in ENTITY_FIELDS},
+            course_codes, class_codes,
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+        Gather the sessions of every row of a snapshot.
+
+        The session and string index columns of the snapshot are used as
+        arrays without copying them row by row, only the distinct entities
+        are decoded.
+        """
+        columns = snapshot.columns
+        offsets = np.asarray(columns["session_offsets"], dtype=np.intp)
+        course = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        codes, names = {}, {}
+        for field in ENTITY_FIELDS:
+            strings, inverse = np.unique(np.asarray(columns[field]), return_inverse=True)
+            values = [snapshot.string(int(index)).strip() for index in strings]
+            # Number the non-empty values, in order
+            renumber = np.full(len(values), -1, dtype=np.intp)
+            kept = [index for index, value in enumerate(values) if value]
+            renumber[kept] = np.arange(len(kept))
+            codes[field] = renumber[inverse]
+            names[field] = [values[index] for index in kept]
+        return cls(
+            course, columns["session_weekday"], columns["session_start"], columns["session_end"],
+            np.asarray(columns["total_units"]) / 100, codes, names, snapshot.column("course_code"),
+            snapshot.column("class_code"),
+        )
+
+    @classmethod
+    def from_schedule(cls, weekly_schedule, table=None):
+        """
+        Gather the sessions of the courses of a weekly schedule.
+
+        Args:
+            weekly_schedule (dict): Courses of each weekday, as returned by parse_html_files.
+            table (CourseTable): Table the rows of weekly_schedule refer to, if any.
+        """
+        if table is not None and "session_offsets" in getattr(table, "columns", ()):
+            return cls.from_snapshot(table)  # Its schedule holds every row
+        rows = (course for courses in weekly_schedule.values() for course in courses)
+        return cls.from_courses(rows if table is None else map(table.__getitem__, rows))
+
+    def occupancy(self, field):
+        """
+        Build the occupancy matrix of the entities of a field.
+
+        Returns:
+            ndarray: Number of sessions of each entity in progress during each
+            bin of each weekday, of shape (entities, 7, BINS_PER_DAY).
+        """
+        entity = self.codes[field][self.course]
+        known = entity >= 0
+        entity, weekday = entity[known], self.weekday[known]
+        shape = (len(self.names[field]), len(WEEKDAY_NAMES), BINS_PER_DAY + 1)
+        # +1 where each session starts and -1 where it ends, summed along the day
+        first = np.ravel_multi_index((entity, weekday, self.start[known]), shape)
+        last = np.ravel_multi_index((entity, weekday, self.end[known]), shape)
+        size = np.prod(shape)
+        changes = np.bincount(first, minlength=size) - np.bincount(last, minlength=size)
+        return np.cumsum(changes.reshape(shape), axis=2)[:, :, :-1]
+
+
+def find_runs(mask):
+    """
+    Find the runs of consecutive True bins of a boolean (entities, 7, bins) array.
+
+    Returns:
+        ndarray: (entity, weekday, first bin, end bin) of each run, in order.
+    """
+    padded = np.zeros(mask.shape[:2] + (mask.shape[2] + 2,), dtype=np.int8)
+    padded[:, :, 1:-1] = mask
+    changes = np.diff(padded, axis=2)
+    starts = np.argwhere(changes == 1)
+    ends = np.argwhere(changes == -1)
+    return np.column_stack((starts, ends[:, 2]))
+
+
+class OccupancyReport:
+    """
+    Occupancy reports of every entity field of a set of sessions.
+
+    Args:
+        sessions (Sessions): Class sessions of the courses.
+    """
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.fields = {field: self._field_report(field) for field in ENTITY_FIELDS}
+
+    def _field_report(self, field):
+        sessions = self.sessions
+        names = sessions.names[field]
+        counts = sessions.occupancy(field)
+        occupied = counts > 0
+        hours = occupied.sum(axis=2) * (BIN_MINUTES / 60)
+        open_bins = occupied[:, :, OPEN_HOURS[0] * BINS_PER_HOUR:OPEN_HOURS[1] * BINS_PER_HOUR]
+        open_bin_count = OPEN_DAYS * (OPEN_HOURS[1] - OPEN_HOURS[0]) * BINS_PER_HOUR
+
+        # Units of the courses and hours of their sessions, summed per entity
+        course_entity = sessions.codes[field]
+        has_entity = course_entity >= 0
+        session_entity = course_entity[sessions.course]
+        has_session = session_entity >= 0
+        session_hours = (sessions.end - sessions.start)[has_session] * (BIN_MINUTES / 60)
+
+        double_booked = counts > 1
+        return {
+            "names": names,
+            "counts": counts,
+            "hours": hours,
+            "utilization": open_bins.sum(axis=(1, 2)) / open_bin_count,
+            "double_booked_minutes": double_booked.sum(axis=(1, 2)) * BIN_MINUTES,
+            "courses": np.bincount(course_entity[has_entity], minlength=len(names)),
+            "units": np.bincount(course_entity[has_entity], weights=sessions.units[has_entity],
+                                 minlength=len(names)),
+            "session_hours": np.bincount(session_entity[has_session], weights=session_hours,
+                                         minlength=len(names)),
+            "conflicts": self._conflicts(field, find_runs(double_booked)),
+            # Entities in use during each hour, averaged over its bins
+            "heatmap": occupied.sum(axis=0).reshape(len(WEEKDAY_NAMES), 24, BINS_PER_HOUR).mean(axis=2),
+        }
+
+    def _conflicts(self, field, runs):
+        """List the double-booked periods, with the courses sharing each."""
+        sessions = self.sessions
+        entity = sessions.codes[field][sessions.course]
+        # Sessions sorted by entity and weekday, so each run only looks at its own
+        keys = entity * len(WEEKDAY_NAMES) + sessions.weekday
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        conflicts = []
+        for entity_code, weekday, first, last in runs.tolist():
+            key = entity_code * len(WEEKDAY_NAMES) + weekday
+            candidates = order[np.searchsorted(sorted_keys, key):np.searchsorted(sorted_keys, key, "right")]
+            overlapping = candidates[(sessions.start[candidates] < last) & (sessions.end[candidates] > first)]
+            rows = sessions.course[overlapping].tolist()
+            conflicts.append({
+                "name": sessions.names[field][entity_code],
+                "weekday": WEEKDAY_NAMES[weekday],
+                "start": format_time(first * BIN_MINUTES),
+                "end": format_time(last * BIN_MINUTES),
+                "courses": sorted({sessions.course_codes[row] for row in rows}),
+                "classes": sorted({sessions.class_codes[row] for row in rows}),
+            })
+        return conflicts
+
+    def rows(self, field):
+        """Yield a dict of the totals of each entity of a field, busiest first."""
+        report = self.fields[field]
+        for index in np.argsort(-report["hours"].sum(axis=1), kind="stable").tolist():
+            yield {
+                "name": report["names"][index],
+                "courses": int(report["courses"][index]),
+                "units": float(report["units"][index]),
+                "hours": dict(zip(WEEKDAY_NAMES, report["hours"][index].round(2).tolist())),
+                "total_hours": round(float(report["hours"][index].sum()), 2),
+                "session_hours": round(float(report["session_hours"][index]), 2),
+                "utilization": round(float(report["utilization"][index]), 4),
+                "double_booked_minutes": int(report["double_booked_minutes"][index]),
+            }
+
+    def to_json(self):
+        """Return the reports as a dict that can be written as JSON."""
+        return {
+            "bin_minutes": BIN_MINUTES,
+            "open_hours": list(OPEN_HOURS),
+            "fields": {field: list(self.rows(field)) for field in ENTITY_FIELDS},
+            "conflicts": {field: self.fields[field]["conflicts"] for field in ENTITY_FIELDS},
+        }
+
+    def write(self, folder_path):
+        """
+        Write the reports to a folder, created if needed: occupancy.json and
+        one CSV file of the totals of each entity field.
+
+        Returns:
+            list: Paths of the written files.
+        """
+        os.makedirs(folder_path, exist_ok=True)
+        paths = [os.path.join(folder_path, "occupancy.json")]
+        with open(paths[0], "w", encoding="utf-8") as file:
+            json.dump(self.to_json(), file, ensure_ascii=False, indent=1)
+        for field in ENTITY_FIELDS:
+            paths.append(os.path.join(folder_path, f"{field}.csv"))
+            with open(paths[-1], "w", encoding="utf-8-sig", newline="") as file:  # BOM for spreadsheets
+                writer = csv.writer(file)
+                writer.writerow(["name", "courses", "units", *WEEKDAY_NAMES, "total_hours", "session_hours",
+                                 "utilization", "double_booked_minutes"])
+                for row in self.rows(field):
+                    writer.writerow([row["name"], row["courses"], row["units"], *row["hours"].values(),
+                                     row["total_hours"], row["session_hours"], row["utilization"],
+                                     row["double_booked_minutes"]])
+        return paths
+
+    def render_view(self):
+        """
+        Return the occupancy view of the page: for each entity field, a
+        heatmap of the entities in use at each hour of each weekday, and
+        the double-booked periods.
+        """
+        hours = range(*OPEN_HOURS)
+        parts = ["""
+        <div id="occupancyView" class="view">
+            <div class="help-text">
+                تعداد مکان‌ها، کلاس‌ها و استادانی که در هر ساعت از هفته درگیر کلاس هستند (بدون فیلتر).
+            </div>
+    """]
+        for field, title in ENTITY_FIELDS.items():
+            heatmap = self.fields[field]["heatmap"]
+            busiest = heatmap.max() or 1
+            parts.append(f"""
+            <h2>{title}</h2>
+            <table>
+                <thead>
+                    <tr><th>روز</th>{"".join(f"<th>{hour}</th>" for hour in hours)}</tr>
+                </thead>
+                <tbody>
+""")
+            for weekday, name in enumerate(WEEKDAY_NAMES):
+                if not heatmap[weekday].any():
+                    continue
+                cells = "".join(
+                    f'<td style="background-color: rgba(0, 123, 255, {heatmap[weekday, hour] / busiest:.2f})">'
+                    f"{heatmap[weekday, hour]:.0f}</td>"
+                    for hour in hours
+                )
+                parts.append(f"<tr><th>{name}</th>{cells}</tr>\n")
+            parts.append("""
+                </tbody>
+            </table>
+""")
+            conflicts = self.fields[field]["conflicts"]
+            if conflicts and field != "class_name":  # A class name is shared by the classes of a cohort
+                parts.append("""
+            <table>
+                <thead>
+                    <tr><th>هم‌پوشانی</th><th>روز</th><th>زمان</th><th>کد دروس</th><th>کد ارائه</th></tr>
+                </thead>
+                <tbody>
+""")
+                parts.extend(
+                    f"<tr><td>{html.escape(conflict['name'])}</td><td>{conflict['weekday']}</td>"
+                    f"<td>{conflict['start']} تا {conflict['end']}</td>"
+                    f"<td>{html.escape(' - '.join(conflict['courses']))}</td>"
+                    f"<td>{html.escape(' - '.join(conflict['classes']))}</td></tr>\n"
+                    for conflict in conflicts
+                )
+                parts.append("""
+                </tbody>
+            </table>
+""")
+        parts.append("""
+        </div>
+    """)
+        return "".join(parts)
@@ -0,0 +1,313 @@
+"""
+Minified and precompressed output files.
+
+Most of the bytes of the generated page are the indentation of the HTML
+templates of script.py. minify_html removes it while the page is streamed:
+the whitespace between block and table tags is dropped, the other runs of
+whitespace are collapsed to one space (as the browser shows them), the
+stylesheet is compacted and the scripts lose their indentation, blank lines
+and comment lines. The contents of JSON scripts are left as they are.
+
+compress_files then writes a .gz and a .br copy next to each output file, at
+the highest compression levels, so that web servers can send them as they
+are (nginx gzip_static and brotli_static, Caddy precompressed, ...) instead
+of compressing the page on every request. Large files are compressed in
+parallel, and a manifest lists the size and SHA-256 of every file and of its
+compressed copies.
+
+Brotli requires the brotli package (pip install brotli); without it only the
+.gz copies are written.
+
+Usage:
+    python artifacts.py schedule_output.html --minify --workers 2
+"""
+import argparse
+import base64
+import gzip
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+# Suffix of the compressed copy of each format
+COMPRESSED_SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+# Files smaller than this are not compressed (the headers outweigh the saving)
+MIN_COMPRESS_SIZE = 1024
+
+# Tags whose surrounding whitespace is not shown by browsers
+BLOCK_TAGS = {
+    "!doctype", "html", "head", "body", "title", "meta", "link", "style", "script", "div", "p", "br", "hr",
+    "h1", "h2", "h3", "h4", "h5", "h6", "table", "thead", "tbody", "tfoot", "tr", "td", "th", "caption",
+    "ul", "ol", "li", "select", "option",
+}
+
+# Tokens of a document: script and style elements, comments, tags and text
+HTML_MINIFY_TOKEN_RE = re.compile(
+    r"""<(script|style)\b(?:"[^"]*"|'[^']*'|[^'">])*>.*?</\1\s*>"""
+    r"""|<!--.*?-->"""
+    r"""|<[!?/]?[a-zA-Z](?:"[^"]*"|'[^']*'|[^'">])*>"""
+    r"""|<?[^<]+|<""",
+    re.DOTALL | re.IGNORECASE,
+)
+TAG_NAME_RE = re.compile(r"<[/]?([!a-zA-Z][^\s/>]*)")
+RAW_ELEMENT_RE = re.compile(r"(<[^>]*>)(.*)(</[^>]*>)", re.DOTALL)
+WHITESPACE_RE = re.compile(r"\s+")
+CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+CSS_PUNCTUATION_RE = re.compile(r"\s*([{};,>])\s*")
+
+
+def minify_css(css):
+    """Remove the comments and the whitespace that does not matter from a stylesheet."""
+    css = WHITESPACE_RE.sub(" ", CSS_COMMENT_RE.sub("", css))
+    css = CSS_PUNCTUATION_RE.sub(r"\1", css)
+    return css.replace(": ", ":").replace(";}", "}").strip()
+
+
+def minify_script(script):
+    """Remove the indentation, blank lines and comment lines of a script."""
+    lines = (line.strip() for line in script.splitlines())
+    return "\n".join(line for line in lines if line and not line.startswith("//"))
+
+
+def minify_element(element):
+    """Minify a <script> or <style> element and its content."""
+    start, content, end = RAW_ELEMENT_RE.fullmatch(element).groups()
+    start = WHITESPACE_RE.sub(" ", start).replace(" >", ">")
+    name = TAG_NAME_RE.match(start).group(1).lower()
+    if name == "style":
+        content = minify_css(content)
+    elif "json" not in start.lower():  # JSON data is already compact
+        content = minify_script(content)
+    return f"{start}{content}{end}"
+
+
+def minify_html(chunks):
+    """
+    Minify an HTML document while it is streamed.
+
+    Tags are only rewritten once they are complete, so a chunk may end
+    anywhere, even in the middle of a tag or a script.
+
+    Args:
+        chunks (iterable): Consecutive chunks of the document, like the ones
+            of script.render_schedule.
+
+    Yields:
+        str: Consecutive chunks of the minified document.
+    """
+    pending = []  # Chunks of a token cut by the end of a chunk
+    closing = None  # End tag of a script or style cut by the end of a chunk, not seen yet
+    space = False  # Whitespace seen since the last output, written before inline content
+    block = True  # The last output was a block tag, after which whitespace is not shown
+    chunks = iter(chunks)
+    last = False
+    while not last:
+        chunk = next(chunks, None)
+        last = chunk is None
+        if not last:
+            # Only look for the end of a long script in the new chunk
+            if closing and closing not in (pending[-1][-len(closing):] + chunk).lower():
+                pending.append(chunk)
+                continue
+            pending.append(chunk)
+        text = "".join(pending)
+        pending = []
+        closing = None
+        output = []
+        consumed = 0
+        for match in HTML_MINIFY_TOKEN_RE.finditer(text):
+            token = match.group()
+            tag = TAG_NAME_RE.match(token) if match.group(1) is None and token.endswith(">") else None
+            name = tag.group(1).lower() if tag else None
+            # Wait for the rest of a token cut by the end of the chunk, or of a script not closed yet
+            if not last and match.end() == len(text):
+                break
+            if not last and name in ("script", "style") and token[1] != "/":
+                closing = f"</{name}"
+                break
+            consumed = match.end()
+            if match.group(1) is not None:
+                output.append(" " if space and not block else "")
+                output.append(minify_element(token))
+                space, block = False, True
+            elif token.startswith("<!--"):
+                continue
+            elif tag:
+                is_block = name in BLOCK_TAGS
+                if space and not block and not is_block:
+                    output.append(" ")
+                output.append(WHITESPACE_RE.sub(" ", token).replace(" >", ">").replace(" />", "/>"))
+                space, block = False, is_block
+            else:
+                content = WHITESPACE_RE.sub(" ", token)
+                stripped = content.strip()
+                if not stripped:
+                    space = True
+                    continue
+                if (space or content[0] == " ") and not block:
+                    output.append(" ")
+                output.append(stripped)
+                space, block = content[-1] == " ", False
+        if consumed < len(text):
+            pending.append(text[consumed:])
+        if output:
+            yield "".join(output)
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _compress(path, compression):
+    """Write the compressed copy of a file, and return the size and hash of both."""
+    with open(path, "rb") as file:
+        data = file.read()
+    if compression == "gzip":
+        compressed = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)  # Same bytes for the same file
+    else:
+        import brotli
+
+        compressed = brotli.compress(data, mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY)
+    compressed_path = path + COMPRESSED_SUFFIXES[compression]
+    temp_path = f"{compressed_path}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(compressed)
+    os.replace(temp_path, compressed_path)
+    return len(compressed), _sha256(compressed)
+
+
+def available_compressions():
+    """Return the compressions that can be written, "br" requiring the brotli package."""
+    return [compression for compression in COMPRESSED_SUFFIXES
+            if compression != "br" or importlib.util.find_spec("brotli") is not None]
+
+
+def remove_compressed(path):
+    """Remove the compressed copies of a file, which would be served instead of its new content."""
+    for suffix in COMPRESSED_SUFFIXES.values():
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def compress_files(paths, root, workers=1, manifest_path=None, immutable=()):
+    """
+    Write the .gz and .br copies of files and a manifest of their sizes and hashes.
+
+    Each file and compression is one job, the large ones being run first
+    across the processes, so a single large page is still compressed in
+    gzip and Brotli at the same time.
+
+    Args:
+        paths (list): Paths of the files.
+        root (str): Folder the paths of the manifest are relative to.
+        workers (int): Number of processes compressing the files.
+        manifest_path (str): Where the manifest is written as JSON, if given.
+        immutable (iterable): Paths of files named after their content (like
+            the shards of script.write_schedule_shards), whose existing
+            compressed copies are kept as they are.
+
+    Returns:
+        dict: The manifest: "files" maps the path of each file to its "size",
+        "sha256", SRI "integrity" and, if compressed, the "file", "size" and
+        "sha256" of each of its compressed copies by compression.
+    """
+    immutable = set(immutable)
+    compressions = available_compressions()
+    entries = {}
+    jobs = []
+    for path in paths:
+        with open(path, "rb") as file:
+            data = file.read()
+        digest = hashlib.sha256(data)
+        entries[path] = {
+            "size": len(data),
+            "sha256": digest.hexdigest(),
+            "integrity": "sha256-" + base64.b64encode(digest.digest()).decode("ascii"),
+        }
+        if len(data) < MIN_COMPRESS_SIZE:
+            remove_compressed(path)
+            continue
+        for compression in compressions:
+            jobs.append((len(data), path, compression))
+    jobs.sort(reverse=True)  # Largest first, so the processes finish at about the same time
+
+    def existing(path, compression):
+        compressed_path = path + COMPRESSED_SUFFIXES[compression]
+        if path not in immutable or not os.path.exists(compressed_path):
+            return None
+        with open(compressed_path, "rb") as file:
+            compressed = file.read()
+        return len(compressed), _sha256(compressed)
+
+    results = [existing(path, compression) for _, path, compression in jobs]
+    todo = [(path, compression) for (_, path, compression), result in zip(jobs, results) if result is None]
+    if workers and workers > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as executor:
+            done = iter(list(executor.map(_compress, *zip(*todo))))
+    else:
+        done = iter([_compress(path, compression) for path, compression in todo])
+    results = [result if result is not None else next(done) for result in results]
+
+    for (_, path, compression), (size, sha256) in zip(jobs, results):
+        entries[path][compression] = {
+            "file": os.path.relpath(path + COMPRESSED_SUFFIXES[compression], root).replace(os.sep, "/"),
+            "size": size,
+            "sha256": sha256,
+        }
+    manifest = {
+        "files": {os.path.relpath(path, root).replace(os.sep, "/"): entries[path] for path in sorted(entries)},
+    }
+    if manifest_path:
+        temp_path = f"{manifest_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, indent=1)
+        os.replace(temp_path, manifest_path)
+    return manifest
+
+
+def manifest_summary(manifest):
+    """Return the total size of the files and of each of their compressed copies, for printing."""
+    files = manifest["files"].values()
+    parts = [f"{len(manifest['files'])} files, {sum(entry['size'] for entry in files)} bytes"]
+    for compression in COMPRESSED_SUFFIXES:
+        sizes = [entry[compression]["size"] for entry in files if compression in entry]
+        if sizes:
+            parts.append(f"{compression} {sum(sizes)} bytes")
+    return ", ".join(parts)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Minify HTML files and write their compressed copies and manifest.")
+    parser.add_argument("paths", nargs="+", help="files to compress")
+    parser.add_argument("--minify", action="store_true", help="minify the .html files first, in place")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of processes compressing the files (default: number of cores)")
+    parser.add_argument("--manifest", metavar="PATH", default="manifest.json",
+                        help="where the manifest is written (default: manifest.json)")
+    args = parser.parse_args()
+
+    try:
+        if args.minify:
+            for path in args.paths:
+                if path.endswith(".html"):
+                    with open(path, encoding="utf-8") as file:
+                        minified = "".join(minify_html([file.read()]))
+                    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+                        file.write(minified)
+                    os.replace(f"{path}.tmp", path)
+        root = os.path.dirname(os.path.abspath(args.manifest))
+        manifest = compress_files([os.path.abspath(path) for path in args.paths], root, workers=args.workers,
+                                  manifest_path=args.manifest)
+    except OSError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    print(manifest_summary(manifest))
@@ -0,0 +1,228 @@
+"""
+Time each stage of script.py on synthetic pages.
+
+For each number of files, pages are generated with generate_pages.py and the
+stages of the pipeline are timed separately:
+
+    read       reading and decoding every file
+    extract    extracting the course table rows (load_table_rows, without cache)
+    normalize  turning the rows into courses (find_columns and iter_courses)
+    group      grouping the courses by weekday
+    render     rendering the page (into a byte counter, not a file; shards are
+               written to a temporary folder)
+
+Each stage is run --repeat times and the fastest run is kept. The results are
+written as JSON; with --compare, the stages are compared to a previous result
+file and the exit status is 1 if one of them got slower than --tolerance.
+
+With --check-parsers, the rows extracted by the stream and strainer parsers
+are also compared with the ones of bs4 (the reference, as BeautifulSoup with
+html.parser), malformed rows included, and the exit status is 1 if they
+differ. lxml is left out, as it closes an open cell when the next one starts.
+
+Usage:
+    python benchmarks/bench_pipeline.py --files 1 10 100 1000 --output results.json
+    python benchmarks/bench_pipeline.py --compare results.json
+    python benchmarks/bench_pipeline.py --files 10 --malformed 0.2 --check-parsers
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import script
+from generate_pages import generate_pages
+
+STAGES = ("read", "extract", "normalize", "group", "render")
+
+# Slowdowns smaller than this (in seconds) are timing noise, not regressions
+MIN_REGRESSION = 0.001
+
+# Parsers expected to extract the same rows as bs4
+CHECKED_PARSERS = ("stream", "strainer")
+
+
+class ByteCounter:
+    """Text sink that only counts the UTF-8 size of what is written to it."""
+
+    def __init__(self):
+        self.size = 0
+
+    def writelines(self, chunks):
+        for chunk in chunks:
+            self.size += len(chunk.encode("utf-8"))
+
+
+def best_time(function, repeat):
+    """Run function repeat times and return (fastest duration in seconds, last result)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best, result
+
+
+def read_files(folder_path):
+    """Read and decode every HTML file of a folder, return the number of characters."""
+    size = 0
+    for name in os.listdir(folder_path):
+        if name.endswith(".html"):
+            with open(os.path.join(folder_path, name), "rb") as file:
+                size += len(file.read().decode("utf-8", errors="replace"))
+    return size
+
+
+def benchmark(folder_path, parser="stream", workers=1, render="static", repeat=3):
+    """
+    Time the stages of the pipeline on the pages of a folder.
+
+    Returns:
+        dict: Duration of each stage in seconds ("stages"), with the number of
+        "rows" extracted, "courses" built and "output_bytes" rendered.
+    """
+    stages = {}
+    # Messages about malformed rows are not part of the measurement
+    with contextlib.redirect_stdout(io.StringIO()):
+        stages["read"], _ = best_time(lambda: read_files(folder_path), repeat)
+        stages["extract"], (headers, data_rows) = best_time(
+            lambda: script.load_table_rows(folder_path, workers=workers, parser=parser), repeat
+        )
+        columns = script.find_columns(headers)
+        stages["normalize"], courses = best_time(lambda: list(script.iter_courses(columns, data_rows)), repeat)
+
+        def group_courses():
+            script.course_weekday.cache_clear()  # Time it as in a fresh run
+            return script.group_by_weekday(courses)
+
+        stages["group"], schedule = best_time(group_courses, repeat)
+
+        def render_page():
+            if render == "shards":
+                with tempfile.TemporaryDirectory() as output_path:
+                    script.write_schedule_shards(schedule, output_path, workers=workers)
+                    return sum(entry.stat().st_size for folder in (output_path, os.path.join(output_path, script.SHARDS_FOLDER))
+                               for entry in os.scandir(folder) if entry.is_file())
+            sink = ByteCounter()
+            renderer = script.render_schedule_data if render == "data" else script.render_schedule
+            sink.writelines(renderer(schedule))
+            return sink.size
+
+        stages["render"], output_bytes = best_time(render_page, repeat)
+
+    return {"stages": stages, "rows": len(data_rows), "courses": len(courses), "output_bytes": output_bytes}
+
+
+def check_parsers(folder_path, parsers=CHECKED_PARSERS):
+    """
+    Compare the rows extracted by parsers with the ones of bs4, and print the differences.
+
+    Returns:
+        bool: True if every parser extracted the same rows as bs4.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = script.load_table_rows(folder_path, parser="bs4")
+        extracted = {parser: script.load_table_rows(folder_path, parser=parser) for parser in parsers}
+    ok = True
+    for parser, (headers, rows) in extracted.items():
+        if headers != expected[0]:
+            print(f"{parser}: headers differ from bs4")
+            ok = False
+        differences = [index for index, (row, other) in enumerate(zip(rows, expected[1])) if row != other]
+        if differences or len(rows) != len(expected[1]):
+            print(f"{parser}: {len(differences)} rows differ from bs4 (first at {differences[:1]}), "
+                  f"{len(rows)} rows instead of {len(expected[1])}")
+            ok = False
+    return ok
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print the change of each stage from a baseline result file.
+
+    Returns:
+        bool: True if no stage is slower than the baseline by more than
+        tolerance (and MIN_REGRESSION).
+    """
+    previous = {(run["files"], run["rows_per_file"]): run for run in baseline["runs"]}
+    ok = True
+    for run in results["runs"]:
+        old = previous.get((run["files"], run["rows_per_file"]))
+        if old is None:
+            continue
+        for stage in STAGES:
+            if stage not in old["stages"]:
+                continue
+            ratio = run["stages"][stage] / old["stages"][stage] if old["stages"][stage] else 1.0
+            slower = ratio > tolerance and run["stages"][stage] - old["stages"][stage] > MIN_REGRESSION
+            ok = ok and not slower
+            print(f"{run['files']:>6} files  {stage:<10} {old['stages'][stage]:9.4f}s -> "
+                  f"{run['stages'][stage]:9.4f}s  x{ratio:.2f}{'  SLOWER' if slower else ''}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the stages of script.py on synthetic pages.")
+    parser.add_argument("--files", type=int, nargs="+", default=[1, 10, 100, 1000],
+                        help="numbers of files to benchmark, up to 10000 (default: 1 10 100 1000)")
+    parser.add_argument("--rows", type=int, default=50, help="courses per page (default: 50)")
+    parser.add_argument("--malformed", type=float, default=0.01,
+                        help="fraction of malformed rows (default: 0.01)")
+    parser.add_argument("--parser", choices=script.PARSERS, default="stream",
+                        help="parser used to extract the tables (default: stream)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes used to extract the tables (default: 1)")
+    parser.add_argument("--render", choices=script.RENDER_MODES, default="static",
+                        help="how the page is rendered (default: static)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each stage, the fastest is kept (default: 3)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generated pages (default: 0)")
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="JSON file to write the results to (default: benchmark_results.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="result file of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=1.2,
+                        help="slowdown ratio from the baseline reported as a regression (default: 1.2)")
+    parser.add_argument("--check-parsers", action="store_true",
+                        help="also check that the stream and strainer parsers extract the same rows as bs4")
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parser": args.parser,
+        "workers": args.workers,
+        "render": args.render,
+        "malformed": args.malformed,
+        "runs": [],
+    }
+    parsers_ok = True
+    for files in args.files:
+        with tempfile.TemporaryDirectory() as folder_path:
+            pages = generate_pages(folder_path, files, args.rows, args.malformed, args.seed)
+            if args.check_parsers and not check_parsers(folder_path):
+                print(f"{files:>6} files: the parsers disagree")
+                parsers_ok = False
+            run = benchmark(folder_path, args.parser, args.workers, args.render, args.repeat)
+        run.update(files=files, rows_per_file=args.rows, input_bytes=pages["bytes"])
+        run["rows_per_second"] = run["rows"] / run["stages"]["extract"] if run["stages"]["extract"] else None
+        results["runs"].append(run)
+        print(f"{files:>6} files: " + "  ".join(f"{stage} {run['stages'][stage]:.4f}s" for stage in STAGES))
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        if not compare(results, baseline, args.tolerance):
+            sys.exit(1)
+    if not parsers_ok:
+        sys.exit(1)
@@ -0,0 +1,177 @@
+"""
+Generate synthetic Amozeshyar pages for the benchmarks.
+
+The pages have the structure of the real exports in html-pages/: the course
+table (<table id="scrollable">) inside the datagrid container, the command and
+row number columns, the same Persian headers and cells padded with the same
+kind of whitespace. Some rows can be made malformed on purpose, as a missing
+cell (dropped by the column count check), invalid unit data (reported and
+skipped), unclosed cell tags or an unclosed empty cell holding the others
+(left to the parser to recover from).
+
+Usage:
+    python benchmarks/generate_pages.py OUTPUT_FOLDER --files 100 --rows 50 --malformed 0.01
+"""
+import argparse
+import os
+import random
+
+# Headers of the exported table, after the command and row number columns
+HEADERS = (
+    "كد درس", "نام درس", "نوع درس", "تعداد واحد نظري", "تعداد واحد عملي", "كد ارائه کلاس درس",
+    "نام كلاس درس", "زمانبندي تشکيل کلاس", "استاد", "ساير اساتيد", "حداكثر ظرفيت",
+    "تعداد ثبت نامي تاکنون", "زمان امتحان", "مكان برگزاري", "مقطع ارائه درس", "نوع ارائه",
+    "سطح ارائه", "دانشجويان مجاز به اخذ کلاس", "گروه آموزشی", "دانشکده", "واحد", "استان",
+)
+
+# Ways a row can be malformed
+MALFORMATIONS = ("missing_cell", "invalid_units", "unclosed_cells", "nested_cells")
+
+DAYS = ("شنبه", "يكشنبه", "دوشنبه", "سه شنبه", "چهارشنبه", "پنج شنبه")
+TIMES = (("07:15", "08:30"), ("08:30", "10:00"), ("10:35", "12:15"), ("12:15", "14:00"),
+         ("14:45", "16:30"), ("16:30", "18:15"), ("18:15", "20:00"))
+NAME_PARTS = ("ریاضی", "فیزیک", "مبانی", "برنامه نویسی", "سیستم های عامل", "پایگاه داده",
+              "شبکه های کامپیوتری", "آزمایشگاه", "معماری کامپیوتر", "زبان تخصصی", "آمار", "هوش مصنوعی")
+FIRST_NAMES = ("علی", "محمد", "زهرا", "مریم", "حسین", "فاطمه", "رضا", "نرگس", "احمد", "پروانه")
+LAST_NAMES = ("احمدی", "محمدی", "حسینی", "رضایی", "کریمی", "اصغری", "هاشمی", "افضلي", "نوری", "صادقی")
+SECTIONS = ("كارشناسي پيوسته", "كارشناسي ناپيوسته", "كارشناسي ارشد", "دكتري")
+DELIVERY = ("حضوري", "آموزش الکترونیکی")
+GROUPS = ("گروه آموزشي کامپيوتر و فناوري اطلاعات(2110130)", "گروه آموزشي رياضي(2110140)",
+          "گروه آموزشي فيزيک(2110150)", "گروه آموزشي زبان و ادبيات فارسي(2110151)")
+
+# Whitespace around the value of a cell, as in the real exports
+CELL_START = '<td nowrap="nowrap">\n' + "              \n" * 6 + " " * 22
+CELL_END = "\n" + "              \n" * 6 + "              </td>\n"
+EMPTY_CELL = '<td nowrap="nowrap">\n</td>\n'
+COMMAND_CELL = (
+    '<td align="center" nowrap="nowrap" onclick="gotoFormCmd(\'formCommands\')" '
+    'onmouseout="toggleCmdImg(this)" onmouseover="toggleCmdImg(this)" '
+    'style="cursor: pointer; cursor: hand" title="كليدهاي فرمان" width="1%">\n'
+    '<img alt="كليدهاي فرمان" src="Pages/images/icons/down.gif" style="visibility: hidden"/>\n</td>\n'
+)
+
+
+def random_row(rng):
+    """Return the values of one random course, in the order of HEADERS."""
+    theory = rng.choice((0, 1, 2, 3))
+    practical = rng.choice((0, 0, 1)) if theory else rng.choice((1, 2, 3))
+    sessions = rng.choice((0, 1, 1, 1, 2))
+    day_time = " ".join(
+        "%s  از %s تا %s" % (rng.choice(DAYS), *rng.choice(TIMES)) for _ in range(sessions)
+    )
+    exam = ""
+    if rng.random() < 0.7:
+        exam = "1404/%02d/%02d از %s تا %s" % (rng.randint(3, 4), rng.randint(1, 30), *rng.choice(TIMES))
+    return (
+        str(rng.randint(4600000000, 6199999999)),
+        " ".join(rng.sample(NAME_PARTS, rng.randint(1, 3))),
+        "نظري" if theory else "عملي",
+        str(theory),
+        str(practical),
+        str(rng.randint(100, 7000099999)),
+        rng.choice(("", "کلاس %d" % rng.randint(1, 400))),
+        day_time,
+        "%s %s" % (rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)),
+        "",
+        str(rng.randint(1, 60)),
+        "",
+        exam,
+        rng.choice(("", "دانشکده فنی-%d" % rng.randint(1000, 2000))),
+        rng.choice(SECTIONS),
+        rng.choice(DELIVERY),
+        "ارائه در سطح گروه آموزشی",
+        "",
+        rng.choice(GROUPS),
+        "101 - تهران مركزي(101)",
+        "101 - تهران مركزي(21101)",
+        "21 - تهران(21)",
+    )
+
+
+def render_row(number, values, malformation=None):
+    """Return the <tr> of a course, malformed as requested."""
+    values = list(values)
+    if malformation == "missing_cell":
+        del values[-1]
+    elif malformation == "invalid_units":
+        values[HEADERS.index("تعداد واحد نظري")] = "سه"
+
+    cell_end = CELL_END.replace("</td>", "") if malformation == "unclosed_cells" else CELL_END
+    parts = ['<tr class="%s">\n' % ("even" if number % 2 else "odd")]
+    if malformation == "nested_cells":
+        parts.append('<td nowrap="nowrap">\n')  # Never closed, holds the cells after it
+    parts += [COMMAND_CELL,
+             '<td nowrap="nowrap">\n        %d\n      </td>\n' % number]
+    for value in values:
+        parts.append(CELL_START + value + cell_end if value else EMPTY_CELL)
+    parts.append("</tr>\n")
+    return "".join(parts)
+
+
+def render_page(rows):
+    """Return a page with the course table holding the given <tr> rows."""
+    header_cells = "".join(
+        '<th class="sortableColumn" width="0">\n          %s\n        </th>\n' % header for header in HEADERS
+    )
+    return (
+        '<div class="datagrid" id="tableContainer" style="width: 766px;">\n'
+        '<table id="scrollable">\n<thead>\n<tr>\n'
+        '<th _sorttype="None" align="center" nowrap="" onclick="gotoFormCmd(\'formCommands\')" '
+        'style="cursor: pointer; cursor: hand" title="كليدهاي فرمان" width="16">\n'
+        '<img alt="كليدهاي فرمان" src="Pages/images/icons/down.gif"/>\n</th>\n'
+        '<th class="sortableColumn" nowrap="nowrap" width="16">\n'
+        '<img border="0" src="Pages/images/row_icon.gif"/>\n</th>\n'
+        + header_cells
+        + "</tr>\n</thead>\n<tbody>\n"
+        + "".join(rows)
+        + '</tbody>\n</table>\n<div class="grid-scrollbar" style="width: 768px; left: 15px; display: none;">'
+        '<div class="slider" style="width: 244.944px; left: -0.118978px;"></div></div></div>'
+    )
+
+
+def generate_pages(folder_path, files=10, rows=50, malformed=0.0, seed=0):
+    """
+    Write synthetic pages to a folder.
+
+    Args:
+        folder_path (str): Folder to write the pages to (created if needed).
+        files (int): Number of pages.
+        rows (int): Number of courses on each page.
+        malformed (float): Fraction of the rows that are malformed, each in
+            one of the ways of MALFORMATIONS.
+        seed (int): Seed of the random values, the same seed gives the same pages.
+
+    Returns:
+        dict: Number of "files", "rows" and "malformed" rows written and their
+        total size in "bytes".
+    """
+    os.makedirs(folder_path, exist_ok=True)
+    rng = random.Random(seed)
+    stats = {"files": files, "rows": 0, "malformed": 0, "bytes": 0}
+    for index in range(files):
+        page_rows = []
+        for number in range(1, rows + 1):
+            malformation = rng.choice(MALFORMATIONS) if rng.random() < malformed else None
+            page_rows.append(render_row(number, random_row(rng), malformation))
+            stats["malformed"] += malformation is not None
+        content = render_page(page_rows).encode("utf-8")
+        with open(os.path.join(folder_path, f"page_{index + 1:05d}.html"), "wb") as file:
+            file.write(content)
+        stats["rows"] += rows
+        stats["bytes"] += len(content)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic Amozeshyar pages.")
+    parser.add_argument("folder", help="folder to write the pages to")
+    parser.add_argument("--files", type=int, default=10, help="number of pages (default: 10)")
+    parser.add_argument("--rows", type=int, default=50, help="courses per page (default: 50)")
+    parser.add_argument("--malformed", type=float, default=0.0,
+                        help="fraction of malformed rows, between 0 and 1 (default: 0)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random values (default: 0)")
+    args = parser.parse_args()
+
+    stats = generate_pages(args.folder, args.files, args.rows, args.malformed, args.seed)
+    print(f"Wrote {stats['files']} pages with {stats['rows']} rows "
+          f"({stats['malformed']} malformed, {stats['bytes']} bytes) to {args.folder}")
@@ -0,0 +1,245 @@
+"""
+Export of the parsed course catalog to a SQLite database.
+
+write_database stores the weekly schedule returned by parse_html_files in a
+normalized schema, to be joined with other data (enrollments, rooms, ...):
+
+    courses(id, course_code, course_name, total_units)
+    professors(id, name), places(id, name), educational_groups(id, name)
+    classes(id, class_code, course_id, group_id, professor_id, place_id,
+            class_name, section, capacity, day_time, exam)
+    sessions(class_id, weekday, start_minute, end_minute)    class times
+    exams(class_id, date, gregorian_date, start_minute, end_minute)
+    weekdays(weekday, name)
+
+and a catalog view joining them back into one row per class. Times are in
+minutes since midnight, weekdays are numbered from Saturday (see
+timeslots.WEEKDAY_NAMES) and exam dates are Jalali "YYYY/MM/DD" dates, with
+their Gregorian ISO date for other systems. The capacity is an integer when
+it is a number and the original text otherwise.
+
+A class is identified by its educational group, course code and class code
+(see RowMerger.KEY_FIELDS), as class codes alone are shared by the classes
+of different courses. Writing to an existing database updates it in place:
+new classes are inserted, changed ones are upserted with their times and
+exams rewritten, the ones no longer offered are removed and unchanged ones
+are not touched, so the id of a class does not change from one export to
+the next. Everything is written with executemany in one transaction, in
+WAL mode so readers are not blocked meanwhile.
+
+Usage:
+    sqlite3 catalog.db "SELECT * FROM catalog WHERE professor = 'نوید هاشمی طبا'"
+"""
+import sqlite3
+
+from timeslots import WEEKDAY_NAMES, parse_day_time, parse_exam
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS courses (
+    id INTEGER PRIMARY KEY,
+    course_code TEXT NOT NULL UNIQUE,
+    course_name TEXT NOT NULL,
+    total_units REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS professors (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS places (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS educational_groups (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS weekdays (weekday INTEGER PRIMARY KEY, name TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS classes (
+    id INTEGER PRIMARY KEY,
+    class_code TEXT NOT NULL,
+    course_id INTEGER NOT NULL REFERENCES courses(id),
+    group_id INTEGER NOT NULL REFERENCES educational_groups(id),
+    professor_id INTEGER NOT NULL REFERENCES professors(id),
+    place_id INTEGER NOT NULL REFERENCES places(id),
+    class_name TEXT NOT NULL,
+    section TEXT NOT NULL,
+    capacity INTEGER,
+    day_time TEXT NOT NULL,
+    exam TEXT NOT NULL,
+    UNIQUE (class_code, course_id, group_id)
+);
+CREATE INDEX IF NOT EXISTS classes_course ON classes(course_id);
+CREATE INDEX IF NOT EXISTS classes_group ON classes(group_id);
+CREATE INDEX IF NOT EXISTS classes_professor ON classes(professor_id);
+CREATE INDEX IF NOT EXISTS classes_place ON classes(place_id);
+CREATE TABLE IF NOT EXISTS sessions (
+    class_id INTEGER NOT NULL REFERENCES classes(id) ON DELETE CASCADE,
+    weekday INTEGER NOT NULL REFERENCES weekdays(weekday),
+    start_minute INTEGER NOT NULL,
+    end_minute INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_class ON sessions(class_id);
+CREATE INDEX IF NOT EXISTS sessions_time ON sessions(weekday, start_minute, end_minute);
+CREATE TABLE IF NOT EXISTS exams (
+    class_id INTEGER NOT NULL REFERENCES classes(id) ON DELETE CASCADE,
+    date TEXT NOT NULL,
+    gregorian_date TEXT NOT NULL,
+    start_minute INTEGER NOT NULL,
+    end_minute INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS exams_class ON exams(class_id);
+CREATE INDEX IF NOT EXISTS exams_time ON exams(date, start_minute, end_minute);
+CREATE VIEW IF NOT EXISTS catalog AS
+    SELECT classes.id, classes.class_code, courses.course_code, courses.course_name, courses.total_units,
+           professors.name AS professor, places.name AS place, educational_groups.name AS group_code,
+           classes.class_name, classes.section, classes.capacity, classes.day_time, classes.exam
+    FROM classes
+    JOIN courses ON courses.id = classes.course_id
+    JOIN professors ON professors.id = classes.professor_id
+    JOIN places ON places.id = classes.place_id
+    JOIN educational_groups ON educational_groups.id = classes.group_id;
+"""
+
+# Columns of the classes table written for each class, after its key
+CLASS_COLUMNS = ("professor_id", "place_id", "class_name", "section", "capacity", "day_time", "exam")
+
+
+def connect(path):
+    """
+    Open a catalog database, creating its tables if needed.
+
+    Args:
+        path (str): Path of the database file.
+
+    Returns:
+        sqlite3.Connection: In autocommit mode, with foreign keys enforced.
+
+    Raises:
+        ValueError: If the file is a database of another version of the schema.
+        sqlite3.Error: If the file is not a SQLite database.
+    """
+    connection = sqlite3.connect(path, isolation_level=None)
+    try:
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise ValueError(f"{path} has version {version} of the schema, not {SCHEMA_VERSION}")
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")  # Safe in WAL mode, only the last commits can be lost
+        connection.execute("PRAGMA foreign_keys = ON")
+        connection.executescript(SCHEMA)
+        connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        connection.executemany("INSERT OR IGNORE INTO weekdays VALUES (?, ?)", enumerate(WEEKDAY_NAMES))
+    except BaseException:
+        connection.close()
+        raise
+    return connection
+
+
+def _ids(connection, table, names):
+    """Insert the names missing from a table of names, and return the id of each name."""
+    connection.executemany(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", ((name,) for name in names))
+    return dict((name, id) for id, name in connection.execute(f"SELECT id, name FROM {table}"))
+
+
+def _capacity(capacity):
+    return int(capacity) if capacity.isdigit() and str(int(capacity)) == capacity else capacity
+
+
+def write_database(path, weekly_schedule, table=None):
+    """
+    Write a weekly schedule to a catalog database, updating a previous export.
+
+    Args:
+        path (str): Path of the database file, created if needed.
+        weekly_schedule (dict): Courses of each day, as returned by
+            parse_html_files (or row indexes of table).
+        table (CourseTable): Table the rows of weekly_schedule refer to, if any.
+
+    Returns:
+        dict: Number of classes "added", "changed", "removed" and
+        "unchanged". A class found more than once is stored once, with the
+        values of its last row.
+
+    Raises:
+        ValueError: If the file is a database of another version of the schema.
+        sqlite3.Error: If the file is not a SQLite database or cannot be written.
+    """
+    classes = {}
+    for courses in weekly_schedule.values():
+        for course in courses if table is None else map(table.__getitem__, courses):
+            classes[course.group_code, course.course_code, course.class_code] = course
+
+    connection = connect(path)
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        professors = _ids(connection, "professors", {course.professor for course in classes.values()})
+        places = _ids(connection, "places", {course.place for course in classes.values()})
+        groups = _ids(connection, "educational_groups", {course.group_code for course in classes.values()})
+        course_values = {course.course_code: (course.course_name, course.total_units) for course in classes.values()}
+        connection.executemany(
+            "INSERT INTO courses (course_code, course_name, total_units) VALUES (?, ?, ?) "
+            "ON CONFLICT (course_code) DO UPDATE SET course_name = excluded.course_name, "
+            "total_units = excluded.total_units "
+            "WHERE course_name IS NOT excluded.course_name OR total_units IS NOT excluded.total_units",
+            ((code, name, units) for code, (name, units) in course_values.items()),
+        )
+        course_ids = dict((code, id) for id, code in connection.execute("SELECT id, course_code FROM courses"))
+
+        # Values of the classes of the previous export, by key
+        existing = {}
+        for id, class_code, course_id, group_id, *values in connection.execute(
+                f"SELECT id, class_code, course_id, group_id, {', '.join(CLASS_COLUMNS)} FROM classes"):
+            existing[class_code, course_id, group_id] = id, tuple(values)
+
+        rows = []  # Key and values of the new and changed classes
+        updated = {}  # Key -> course of each new or changed class
+        unchanged = 0
+        for course in classes.values():
+            key = (course.class_code, course_ids[course.course_code], groups[course.group_code])
+            values = (professors[course.professor], places[course.place], course.class_name, course.section,
+                      _capacity(course.capacity), course.day_time, course.exam)
+            previous = existing.pop(key, None)
+            if previous is not None and previous[1] == values:
+                unchanged += 1
+                continue
+            rows.append(key + values)
+            updated[key] = course, previous is not None
+
+        columns = ("class_code", "course_id", "group_id") + CLASS_COLUMNS
+        connection.executemany(
+            f"INSERT INTO classes ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            "ON CONFLICT (class_code, course_id, group_id) DO UPDATE SET "
+            + ", ".join(f"{column} = excluded.{column}" for column in CLASS_COLUMNS),
+            rows,
+        )
+        # Classes no longer offered, with their times and exams
+        connection.executemany("DELETE FROM classes WHERE id = ?", ((id,) for id, _ in existing.values()))
+
+        # The times and exams of the new and changed classes are written again
+        ids = {}
+        if updated:
+            ids = dict(((class_code, course_id, group_id), id) for id, class_code, course_id, group_id
+                       in connection.execute("SELECT id, class_code, course_id, group_id FROM classes"))
+        changed_ids = [(ids[key],) for key, (_, was_there) in updated.items() if was_there]
+        connection.executemany("DELETE FROM sessions WHERE class_id = ?", changed_ids)
+        connection.executemany("DELETE FROM exams WHERE class_id = ?", changed_ids)
+
+        sessions = []
+        exams = []
+        for key, (course, _) in updated.items():
+            id = ids[key]
+            sessions += ((id, weekday, start, end) for weekday, start, end in parse_day_time(course.day_time))
+            exam = parse_exam(course.exam)
+            if exam:
+                date, start, end = exam
+                exams.append((id, date.strftime("%Y/%m/%d"), date.togregorian().isoformat(), start, end))
+        connection.executemany("INSERT INTO sessions VALUES (?, ?, ?, ?)", sessions)
+        connection.executemany("INSERT INTO exams VALUES (?, ?, ?, ?, ?)", exams)
+
+        # Names no class refers to any more
+        for table_name, column in (("professors", "professor_id"), ("places", "place_id"),
+                                   ("educational_groups", "group_id"), ("courses", "course_id")):
+            connection.execute(f"DELETE FROM {table_name} WHERE id NOT IN (SELECT {column} FROM classes)")
+        connection.execute("COMMIT")
+    except BaseException:
+        if connection.in_transaction:
+            connection.execute("ROLLBACK")
+        raise
+    finally:
+        connection.close()
+
+    changed = sum(was_there for _, was_there in updated.values())
+    return {"added": len(updated) - changed, "changed": changed, "removed": len(existing), "unchanged": unchanged}
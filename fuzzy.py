@@ -0,0 +1,143 @@
+"""
+Typo-tolerant search of the course names and professors.
+
+TrigramIndex splits each distinct value, normalized with
+persian.normalize_search_text, into the trigrams of its words (each word
+padded with two spaces before and one after, like PostgreSQL's pg_trgm)
+and keeps the values of each trigram. A query is scored against the values
+sharing trigrams with it: the share of its trigrams they contain, then their
+similarity (shared trigrams over the trigrams of both) to rank the values
+that contain it all. A misspelled letter only breaks the three trigrams
+around it, so "رياضي عمومی" or "ریاضی عمومي 1" still find "ریاضی عمومی 1".
+
+Values repeated across classes are indexed once, so the index follows the
+number of distinct names and professors rather than the number of classes.
+to_json gives the values and their keys in a compact form embedded in the
+generated page, which builds the trigrams again on its first search (see
+FUZZY_SEARCH_SCRIPT in script.py).
+
+Usage:
+    index = TrigramIndex.from_courses(courses)
+    index.search("احمد خیالی", limit=5)  # [((group_code, course_code, class_code), score), ...] best first
+"""
+from collections import Counter
+from itertools import chain
+
+from persian import normalize_search_text
+from timeslots import class_key
+
+# Fields searched by default
+FUZZY_FIELDS = ("course_name", "professor")
+
+# Smallest share of the trigrams of a query a value must contain to match it
+MIN_SCORE = 0.5
+
+
+def trigrams(text):
+    """Return the set of trigrams of the words of a normalized text."""
+    grams = set()
+    for word in text.split(" "):
+        if word:
+            padded = f"  {word} "
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """
+    Trigram index of the values of keys (like timeslots.class_key), for fuzzy search.
+
+    Args:
+        items (iterable): (key, value) pairs; a key may have several values,
+            like the name and the professor of a class.
+    """
+
+    def __init__(self, items=()):
+        self.texts = []  # Distinct normalized values
+        self.keys = []  # Keys of each value, in the order they were added
+        self._text_ids = {}
+        self._postings = {}  # Trigram -> ids of the values that have it
+        self._sizes = []  # Number of trigrams of each value
+        for key, value in items:
+            self.add(key, value)
+
+    @classmethod
+    def from_courses(cls, courses, fields=FUZZY_FIELDS, key=class_key):
+        """Index the fields of courses, under the key of each course."""
+        return cls((key(course), getattr(course, field)) for course in courses for field in fields)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, key, value):
+        """Index a value of a key. Empty values are ignored."""
+        text = normalize_search_text(value)
+        if not text:
+            return
+        text_id = self._text_ids.get(text)
+        if text_id is None:
+            text_id = self._text_ids[text] = len(self.texts)
+            self.texts.append(text)
+            self.keys.append([])
+            grams = trigrams(text)
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(text_id)
+            self._sizes.append(len(grams))
+        if key not in self.keys[text_id][-1:]:
+            self.keys[text_id].append(key)
+
+    def matches(self, query, min_score=MIN_SCORE):
+        """
+        Return the values matching a query, best first.
+
+        Args:
+            query (str): Text searched, in any spelling.
+            min_score (float): Smallest share of the trigrams of the query a
+                value must contain, from 0 to 1.
+
+        Returns:
+            list: (score, similarity, text) of each matching value, the score
+            being the share of the trigrams of the query it contains and the
+            similarity the share of the trigrams of both they have in common.
+        """
+        grams = trigrams(normalize_search_text(query))
+        if not grams:
+            return []
+        shared = Counter(chain.from_iterable(self._postings.get(gram, ()) for gram in grams))
+        needed = min_score * len(grams)
+        ranked = sorted(
+            ((count / len(grams), count / (len(grams) + self._sizes[text_id] - count), -text_id)
+             for text_id, count in shared.items() if count >= needed),
+            reverse=True,
+        )
+        return [(score, similarity, self.texts[-text_id]) for score, similarity, text_id in ranked]
+
+    def search(self, query, limit=10, min_score=MIN_SCORE):
+        """
+        Return the keys whose values best match a query.
+
+        Args:
+            query (str): Text searched, in any spelling.
+            limit (int): Most keys returned.
+            min_score (float): See matches.
+
+        Returns:
+            list: (key, score) of the best matching keys, best first. A key
+            matched by several of its values gets the score of the best one.
+        """
+        results = {}
+        for score, _, text in self.matches(query, min_score):
+            for key in self.keys[self._text_ids[text]]:
+                if key not in results:
+                    results[key] = score
+                    if len(results) >= limit:
+                        return list(results.items())
+        return list(results.items())
+
+    def to_json(self):
+        """
+        Return the index as a dict to embed as JSON: the normalized values
+        ("texts"), the keys of each value ("keys") and "min_score". The
+        trigrams are left out, as they are built again from the values.
+        """
+        return {"texts": self.texts, "keys": self.keys, "min_score": MIN_SCORE}
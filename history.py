@@ -0,0 +1,312 @@
+"""
+Append-only history of the parsed course catalog.
+
+Each scraper run replaces html-pages/, so script.py --history appends a
+snapshot of the parsed catalog to a history file, keeping the capacity
+changes, added or cancelled classes and professor swaps of every run.
+
+The file holds a header line, then one JSON line per snapshot. Strings are
+dictionary-encoded: a line only lists the strings not seen before, and rows
+refer to strings by their index in the dictionary of the whole file. A
+snapshot only holds its delta to the previous one: the rows that were added
+or changed and the keys of the removed ones. Lines are only ever appended
+(a line left incomplete by an interrupted run is ignored, and dropped by
+the next append).
+
+A class is identified by its educational group, course code and class code
+(see RowMerger.KEY_FIELDS), as class codes alone are shared by the classes
+of different courses. Diffing two snapshots only looks at the classes
+changed by the snapshots between them.
+
+Usage:
+    python history.py history.jsonl               # List the snapshots
+    python history.py history.jsonl --diff 3 7    # Changes from snapshot 3 to snapshot 7
+"""
+import argparse
+import html
+import json
+import os
+import sys
+import time
+from bisect import bisect_right
+
+from script import COURSE_FIELDS, Course, RowMerger
+
+FORMAT = "amozeshyar-history"
+FORMAT_VERSION = 1
+
+KEY_FIELDS = RowMerger.KEY_FIELDS
+VALUE_FIELDS = tuple(field for field in COURSE_FIELDS if field not in KEY_FIELDS)
+
+# Fields shown for each class in the changes view
+CHANGE_COLUMNS = ("course_name", "course_code", "class_code", "group_code")
+
+# Background of the rows of the changes view
+CHANGE_COLORS = {"added": "#d4edda", "removed": "#f8d7da", "changed": "#fff3cd"}
+
+
+class History:
+    """
+    History file of the catalog, loaded in memory.
+
+    Snapshots are numbered from 1 in the order they were appended; snapshot 0
+    stands for the empty catalog before the first one.
+
+    Args:
+        path (str): Path of the history file, created by the first append.
+
+    Raises:
+        ValueError: If the file is not a history file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.strings = []
+        self.snapshots = []  # Number, time, label and changed keys of each snapshot
+        self._string_ids = {}
+        self._versions = {}  # Key -> snapshots that changed its row
+        self._values = {}  # Key -> its row after each of these snapshots (None once removed)
+        self._latest = {}  # Key -> its row in the last snapshot
+        self._size = 0  # End of the last complete line of the file
+        if os.path.exists(path):
+            self._load()
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def _load(self):
+        with open(self.path, "rb") as file:
+            header = file.readline()
+            try:
+                fields = json.loads(header)
+            except ValueError:
+                fields = None
+            if not isinstance(fields, dict) or fields.get("format") != FORMAT or not header.endswith(b"\n"):
+                raise ValueError(f"{self.path} is not a history file")
+            if fields.get("version") != FORMAT_VERSION:
+                raise ValueError(f"unsupported history version in {self.path}")
+            self._size = len(header)
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break  # Left incomplete by an interrupted run
+                self._apply(json.loads(line))
+                self._size += len(line)
+
+    def _string_id(self, value):
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = self._string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def _apply(self, record):
+        """Apply the delta of one snapshot to the in-memory indexes."""
+        number = len(self.snapshots) + 1
+        for value in record["strings"]:
+            self._string_id(value)
+        changes = [(tuple(key), None) for key in record["removed"]]
+        changes += [(tuple(row[:len(KEY_FIELDS) + 1]), tuple(row[len(KEY_FIELDS) + 1:])) for row in record["rows"]]
+        for key, values in changes:
+            self._versions.setdefault(key, []).append(number)
+            self._values.setdefault(key, []).append(values)
+            if values is None:
+                self._latest.pop(key, None)
+            else:
+                self._latest[key] = values
+        self.snapshots.append({
+            "snapshot": number,
+            "time": record["time"],
+            "label": record["label"],
+            "keys": [key for key, _ in changes],
+        })
+
+    def _encode(self, courses):
+        """Return the encoded row of each course, by key."""
+        rows = {}
+        for course in courses:
+            key = tuple(self._string_id(getattr(course, field)) for field in KEY_FIELDS)
+            occurrence = 0  # Rows kept twice by the dedup policy are told apart by their order
+            while key + (occurrence,) in rows:
+                occurrence += 1
+            rows[key + (occurrence,)] = tuple(self._string_id(str(getattr(course, field))) for field in VALUE_FIELDS)
+        return rows
+
+    def append(self, courses, label=None):
+        """
+        Append a snapshot of the catalog to the history file.
+
+        Args:
+            courses (iterable): Every course of the catalog.
+            label (str): Label of the snapshot, like the term or the date.
+
+        Returns:
+            int: Number of the new snapshot.
+        """
+        known_strings = len(self.strings)
+        rows = self._encode(courses)
+        record = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "label": label,
+            "strings": self.strings[known_strings:],
+            "removed": [list(key) for key in self._latest if key not in rows],
+            "rows": [list(key + values) for key, values in rows.items() if self._latest.get(key) != values],
+        }
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+        new_file = not os.path.exists(self.path)
+        with open(self.path, "wb" if new_file else "r+b") as file:
+            if new_file:
+                header = json.dumps({"format": FORMAT, "version": FORMAT_VERSION}) + "\n"
+                self._size = file.write(header.encode("utf-8"))
+            file.truncate(self._size)  # Drop a line left incomplete by an interrupted run
+            file.seek(self._size)
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+        self._size += len(line)
+        self._apply(record)
+        return len(self.snapshots)
+
+    def _row_at(self, key, number):
+        """Return the row of a key after a snapshot, or None if it had none."""
+        versions = self._versions.get(key)
+        position = bisect_right(versions, number) if versions else 0
+        return self._values[key][position - 1] if position else None
+
+    def _course(self, key, values):
+        fields = dict(zip(KEY_FIELDS, (self.strings[string_id] for string_id in key)))
+        fields.update(zip(VALUE_FIELDS, (self.strings[string_id] for string_id in values)))
+        fields["total_units"] = float(fields["total_units"])
+        return Course(**fields)
+
+    def _check(self, number):
+        if not 0 <= number <= len(self.snapshots):
+            raise ValueError(f"no snapshot {number}, the history has {len(self.snapshots)}")
+
+    def courses(self, number=None):
+        """
+        Return the courses of a snapshot (by default the last one).
+
+        Raises:
+            ValueError: If there is no such snapshot.
+        """
+        if number is None:
+            number = len(self.snapshots)
+        self._check(number)
+        courses = []
+        for key in self._versions:
+            values = self._row_at(key, number)
+            if values is not None:
+                courses.append(self._course(key, values))
+        return courses
+
+    def diff(self, old, new):
+        """
+        Compare two snapshots.
+
+        Only the classes changed by the snapshots between old and new are
+        looked at, so the cost follows the number of changes rather than the
+        size of the catalog.
+
+        Args:
+            old (int): Number of the earlier snapshot (0 for the empty catalog).
+            new (int): Number of the later snapshot (may be before old, to undo).
+
+        Returns:
+            dict: Ready to be written as JSON: the "old" and "new" snapshot
+            numbers, the "added" and "removed" classes (dicts of their
+            fields) and the "changed" ones, each with its "course" (its
+            fields in the new snapshot) and the changed "fields" with their
+            [old, new] values, all in the order of their keys.
+
+        Raises:
+            ValueError: If there is no such snapshot.
+        """
+        self._check(old)
+        self._check(new)
+        keys = set()
+        for number in range(min(old, new), max(old, new)):
+            keys.update(self.snapshots[number]["keys"])
+
+        added, removed, changed = [], [], []
+        for key in sorted(keys, key=lambda key: tuple(self.strings[string_id] for string_id in key[:-1]) + key[-1:]):
+            before, after = self._row_at(key, old), self._row_at(key, new)
+            if before == after:
+                continue  # Changed and then changed back
+            if before is None:
+                added.append(self._course(key, after).to_dict())
+            elif after is None:
+                removed.append(self._course(key, before).to_dict())
+            else:
+                changed.append({
+                    "course": self._course(key, after).to_dict(),
+                    "fields": {
+                        field: [self.strings[old_id], self.strings[new_id]]
+                        for field, old_id, new_id in zip(VALUE_FIELDS, before, after) if old_id != new_id
+                    },
+                })
+        return {"old": old, "new": new, "added": added, "removed": removed, "changed": changed}
+
+
+def render_changes_view(changes):
+    """
+    Return the changes view of the page: the classes added, removed or
+    changed between two snapshots, with the old values of the changed fields
+    struck through.
+
+    Args:
+        changes (dict): As returned by History.diff.
+    """
+    def cells(course, fields=None):
+        for field in CHANGE_COLUMNS:
+            yield f"<td>{html.escape(str(course[field]))}</td>"
+        details = " - ".join(
+            f"{field}: <del>{html.escape(old)}</del> {html.escape(new)}" for field, (old, new) in (fields or {}).items()
+        )
+        yield f"<td>{details}</td>"
+
+    rows = [("added", "جدید", course, None) for course in changes["added"]]
+    rows += [("removed", "حذف شده", course, None) for course in changes["removed"]]
+    rows += [("changed", "تغییر", change["course"], change["fields"]) for change in changes["changed"]]
+    since = f"نسخه {changes['old']}" if changes["old"] else "ابتدا"
+    parts = [f"""
+        <div id="changesView" class="view">
+            <div class="help-text">
+                کلاس‌هایی که از {since} تا نسخه {changes['new']} اضافه، حذف یا تغییر کرده‌اند ({len(rows)} مورد).
+            </div>
+            <table>
+                <thead>
+                    <tr><th>وضعیت</th><th>نام درس</th><th>کد درس</th><th>کد ارائه</th><th>گروه آموزشي</th><th>تغییرات</th></tr>
+                </thead>
+                <tbody>
+"""]
+    for status, title, course, fields in rows:
+        parts.append(f'<tr style="background-color: {CHANGE_COLORS[status]}"><td>{title}</td>'
+                     f'{"".join(cells(course, fields))}</tr>\n')
+    parts.append("""
+                </tbody>
+            </table>
+        </div>
+    """)
+    return "".join(parts)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List the snapshots of a history file, or compare two of them.")
+    parser.add_argument("path", help="history file written by script.py --history")
+    parser.add_argument("--diff", type=int, nargs=2, metavar=("OLD", "NEW"),
+                        help="write the changes from snapshot OLD to snapshot NEW as JSON (0 is the empty catalog)")
+    args = parser.parse_args()
+
+    try:
+        history = History(args.path)
+        if args.diff:
+            json.dump(history.diff(*args.diff), sys.stdout, ensure_ascii=False, indent=2)
+            print()
+        else:
+            for snapshot in history.snapshots:
+                print(f"{snapshot['snapshot']:>4}  {snapshot['time']}  {len(snapshot['keys']):>6} changes  "
+                      f"{snapshot['label'] or ''}")
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,68 @@
+"""
+Normalization of the Persian text of the pages.
+
+Amozeshyar mixes the Arabic and Persian forms of some letters (ي/ی, ك/ک),
+so the same professor or course can be written in two ways, sometimes with
+invisible characters (tatweel, zero-width spaces, soft hyphens) in the
+middle. normalize_text replaces them with the Persian forms once, when the
+courses are built from the parsed rows, so the page and every export show one
+spelling.
+
+normalize_search_text folds the text further for searching: the half-space
+(ZWNJ) becomes a space, Persian and Arabic digits become ASCII digits, the
+diacritics and hamza forms are dropped, the text is lowercased and runs of
+whitespace are collapsed. The pages apply the same steps to what is typed in
+the filter box, from SEARCH_CHARS.
+"""
+from functools import lru_cache
+
+# Arabic forms of letters and invisible characters, replaced in the parsed text
+TEXT_CHARS = {
+    "ي": "ی", "ى": "ی", "ك": "ک",
+    "\u0640": "",  # Tatweel, only stretches the letters around it
+    "\u200b": "", "\ufeff": "", "\u00ad": "",  # Zero-width space, byte order mark, soft hyphen
+    "\u00a0": " ", "\u202f": " ",  # No-break spaces
+}
+TEXT_TRANSLATION = str.maketrans(TEXT_CHARS)
+
+# Characters folded together by the searches: the ones above, ZWNJ to a space,
+# Persian and Arabic digits to ASCII digits, hamza forms to the plain letters
+# and the diacritics dropped
+SEARCH_CHARS = dict(TEXT_CHARS, **{"\u200c": " ", "أ": "ا", "إ": "ا", "ٱ": "ا", "ؤ": "و", "ۀ": "ه", "ة": "ه"})
+SEARCH_CHARS.update((digit, str(value)) for value, digit in enumerate("۰۱۲۳۴۵۶۷۸۹"))
+SEARCH_CHARS.update((digit, str(value)) for value, digit in enumerate("٠١٢٣٤٥٦٧٨٩"))
+SEARCH_CHARS.update((chr(mark), "") for mark in range(0x064B, 0x0653))  # Fathatan to sukun, shadda, maddah
+SEARCH_CHARS["\u0670"] = ""  # Superscript alef
+SEARCH_TRANSLATION = str.maketrans(SEARCH_CHARS)
+
+
+@lru_cache(maxsize=None)
+def normalize_text(text):
+    """
+    Replace the Arabic forms of letters and the invisible characters of a text
+    (see TEXT_CHARS). Values repeated across the courses are only translated once.
+
+    Args:
+        text (str): Text of a cell.
+
+    Returns:
+        str: The normalized text.
+    """
+    return text.translate(TEXT_TRANSLATION)
+
+
+def normalize_search_text(text):
+    """
+    Normalize text for searching.
+
+    Letter variants are folded (see SEARCH_CHARS), the text is lowercased and
+    runs of whitespace are collapsed to single spaces. The page applies the
+    same steps to what is typed in the filter box.
+
+    Args:
+        text (str): Text to normalize.
+
+    Returns:
+        str: The normalized text.
+    """
+    return " ".join(text.translate(SEARCH_TRANSLATION).lower().split())
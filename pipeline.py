@@ -0,0 +1,192 @@
+"""
+Asynchronous pipeline parsing the pages while they are still arriving.
+
+Instead of waiting for the scraper to write every page to html-pages/ and
+reading them all back, load_page_rows takes the bodies of the pages from an
+async source and hands each one to a pool of processes as soon as it lands,
+so the pages are parsed while the next ones are fetched. Once the source is
+exhausted and the last page is parsed, the rows are merged like
+load_table_rows does, in the order of the page names so that the schedule
+does not depend on the order the pages arrived in.
+
+A source is an async iterable of (name, body) pairs, name being used in the
+messages and body the raw bytes of the page:
+
+    folder_source(path)     the HTML files of a folder (a stand-in for the scraper)
+    http_source(urls)       pages downloaded over HTTP, a few at a time
+    queue_source(queue)     pages put on an asyncio.Queue by a producer (None ends it)
+
+At most max_pending pages are held between the source and the parsers: the
+source is not read further until one of them is parsed, which bounds the
+memory when pages arrive faster than they are parsed. A page that cannot be
+fetched or parsed is reported and left out, without stopping the others.
+
+Usage:
+    schedule = parse_pages(http_source(urls), workers=4)
+"""
+import asyncio
+import http.client
+import os
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from profiler import NULL_PROFILER
+from script import extract_page_rows, merge_page_rows, schedule_from_rows
+
+# Pages fetched at the same time by http_source
+HTTP_CONCURRENCY = 4
+HTTP_TIMEOUT = 30
+
+
+async def folder_source(folder_path):
+    """Yield the (path, body) of each HTML file of a folder, read in a thread."""
+    for file_name in sorted(os.listdir(folder_path)):
+        if file_name.endswith(".html"):
+            file_path = os.path.join(folder_path, file_name)
+            try:
+                body = await asyncio.to_thread(_read_file, file_path)
+            except OSError as e:
+                print(f"Error reading {file_path}: {e}")
+                continue
+            yield file_path, body
+
+
+def _read_file(file_path):
+    with open(file_path, "rb") as file:
+        return file.read()
+
+
+async def http_source(urls, concurrency=HTTP_CONCURRENCY, timeout=HTTP_TIMEOUT):
+    """
+    Yield the (url, body) of each page as soon as it is downloaded.
+
+    Downloads stop while concurrency downloaded pages wait to be consumed,
+    so a slow consumer holds back the source.
+
+    Args:
+        urls (iterable): URLs of the pages.
+        concurrency (int): Number of pages downloaded at the same time.
+        timeout (float): Time allowed to each download, in seconds.
+    """
+    urls = iter(urls)
+    downloaded = asyncio.Queue(maxsize=concurrency)
+
+    async def fetch():
+        for url in urls:  # Shared by the fetchers, each URL is taken once
+            try:
+                body = await asyncio.to_thread(_download, url, timeout)
+            except (OSError, ValueError, http.client.HTTPException) as e:  # URLError is an OSError
+                print(f"Error fetching {url}: {e}")
+                continue
+            await downloaded.put((url, body))
+        await downloaded.put(None)
+
+    fetchers = [asyncio.create_task(fetch()) for _ in range(concurrency)]
+    try:
+        finished = 0
+        while finished < len(fetchers):
+            item = await downloaded.get()
+            if item is None:
+                finished += 1
+            else:
+                yield item
+    finally:
+        for fetcher in fetchers:
+            fetcher.cancel()
+
+
+def _download(url, timeout):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read()
+
+
+async def queue_source(queue):
+    """Yield the (name, body) pairs put on an asyncio.Queue, until None is put."""
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+        yield item
+
+
+async def load_page_rows(source, workers=1, parser="stream", merger=None, max_pending=None,
+                         page_timeout=None, profiler=NULL_PROFILER):
+    """
+    Extract the table rows of the pages of a source, parsing each one as it arrives.
+
+    Args:
+        source (AsyncIterable): (name, body) of each page, see the sources above.
+        workers (int): Number of processes parsing the pages. With 1, pages are
+            parsed in a thread of the current process.
+        parser (str): Parser used to extract the course table, one of script.PARSERS.
+        merger (RowMerger): Merges the rows of a class found in several pages,
+            the last page to arrive being the most recent.
+        max_pending (int): Most pages read from the source but not parsed yet
+            (default: twice the workers).
+        page_timeout (float): Time allowed to parse a page, in seconds; a page
+            taking longer is reported and left out.
+        profiler (Profiler): Receives the timings and counters, see profiler.py.
+
+    Returns:
+        tuple: (headers, data_rows), see script.load_table_rows.
+    """
+    workers = max(workers or 1, 1)
+    pending = asyncio.Semaphore(max_pending or 2 * workers)
+    loop = asyncio.get_running_loop()
+    names = []
+    results = []  # (rows, error) of each page, in arrival order
+    start = time.perf_counter()
+
+    async def parse(index, name, body):
+        try:
+            future = loop.run_in_executor(executor, extract_page_rows, body, name, parser)
+            results[index] = await asyncio.wait_for(future, page_timeout)
+        except asyncio.TimeoutError:
+            results[index] = [], f"Error processing {name}: not parsed within {page_timeout} seconds"
+        except Exception as e:  # Like a worker process that died, the page is left out
+            results[index] = [], f"Error processing {name}: {e}"
+        finally:
+            pending.release()
+        if results[index][1]:
+            print(results[index][1])
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else ThreadPoolExecutor(max_workers=1)
+    tasks = []
+    try:
+        async for name, body in source:
+            await pending.acquire()  # Wait for a parser to free up before reading on
+            profiler.count("pages received")
+            profiler.count("bytes read", len(body))
+            names.append(name)
+            results.append(None)
+            tasks.append(asyncio.create_task(parse(len(results) - 1, name, body)))
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Do not wait for a page stuck past its timeout
+        executor.shutdown(wait=page_timeout is None, cancel_futures=True)
+    profiler.add("extract", time.perf_counter() - start, start=start)
+
+    # The later a page arrived, the more recent its rows are for the merger
+    order = sorted(range(len(results)), key=names.__getitem__)
+    return merge_page_rows(((results[index][0], index) for index in order), merger=merger, profiler=profiler)
+
+
+def parse_pages(source, workers=1, parser="stream", merger=None, max_pending=None, page_timeout=None,
+                profiler=NULL_PROFILER):
+    """
+    Build the weekly schedule of the pages of a source, like script.parse_html_files.
+
+    Takes the same arguments as load_page_rows, and runs the pipeline in its
+    own event loop.
+
+    Returns:
+        dict: The weekly schedule, see script.parse_html_files.
+    """
+    headers, data_rows = asyncio.run(load_page_rows(
+        source, workers=workers, parser=parser, merger=merger, max_pending=max_pending,
+        page_timeout=page_timeout, profiler=profiler,
+    ))
+    return schedule_from_rows(headers, data_rows, profiler=profiler)
@@ -0,0 +1,190 @@
+"""
+Timings and counters of the stages of the timetable pipeline.
+
+The functions of script.py take an optional Profiler and report to it the
+duration of each stage (extracting the tables, merging, building the
+courses, rendering, ...), the timings of each parsed file and counters like
+the rows and bytes read. Without one they report to NULL_PROFILER, whose
+methods do nothing, so the hooks cost a few attribute lookups per stage.
+
+A profiler reports the peak resident memory of the process and, on request,
+the peak memory allocated by Python (with tracemalloc, which slows the run
+down). It can write its measurements as JSON, with the stages and files as
+trace events that chrome://tracing and Perfetto can display.
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Files listed in the summary, slowest first
+SLOWEST_FILES = 5
+
+
+class Profiler:
+    """
+    Collect the duration of the stages of a run.
+
+    Args:
+        trace_memory (bool): Follow the peak memory allocated by Python with
+            tracemalloc (which slows down memory allocations while it runs).
+    """
+
+    enabled = True
+
+    def __init__(self, trace_memory=False):
+        self.stages = {}  # Name -> [calls, seconds], in the order they first ran
+        self.counters = {}
+        self.files = []  # Timings of each parsed file
+        self.events = []  # Trace events of the stages and files
+        self.trace_memory = trace_memory
+        self.peak_memory = None
+        self._start = time.perf_counter()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        else:
+            self.trace_memory = False  # Already traced by someone else, leave it alone
+
+    @contextmanager
+    def stage(self, name):
+        """Time the code of a with block as one call of a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, start=start)
+
+    def add(self, name, seconds, calls=1, start=None):
+        """Add the duration of calls of a stage timed elsewhere."""
+        stage = self.stages.setdefault(name, [0, 0.0])
+        stage[0] += calls
+        stage[1] += seconds
+        if start is not None:
+            self._event(name, start, seconds, os.getpid())
+
+    def count(self, name, value=1):
+        """Add value to a counter."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_file(self, file_path, stats):
+        """
+        Record the timings of one parsed file.
+
+        Args:
+            file_path (str): Path of the file.
+            stats (dict): As filled by script.extract_table_rows, with the
+                "start" and "total" duration of the extraction and the "pid"
+                of the process that ran it.
+        """
+        self.files.append(dict(stats, file=file_path))
+        self.count("files parsed")
+        self.count("bytes read", stats.get("bytes", 0))
+        self.count("rows extracted", stats.get("rows", 0))
+        for step in ("read", "parse", "cells"):
+            if step in stats:
+                self.add(f"file {step}", stats[step])
+        self._event(os.path.basename(file_path), stats["start"], stats["total"], stats["pid"])
+
+    def _event(self, name, start, seconds, pid):
+        self.events.append({
+            "name": name,
+            "ph": "X",
+            "ts": round((start - self._start) * 1e6, 1),
+            "dur": round(seconds * 1e6, 1),
+            "pid": pid,
+            "tid": pid,
+        })
+
+    def stop(self):
+        """Stop following the memory, keeping its peak."""
+        if self.trace_memory and tracemalloc.is_tracing():
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        self.trace_memory = False
+
+    @staticmethod
+    def max_resident_memory():
+        """Return the peak resident memory of the process in bytes, or None if unknown."""
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # Kilobytes elsewhere
+
+    def rows_per_second(self):
+        """Return the rows extracted per second of extraction, or None."""
+        seconds = self.stages.get("extract", (0, 0.0))[1]
+        rows = self.counters.get("rows extracted", 0)
+        return rows / seconds if seconds and rows else None
+
+    def summary(self):
+        """Return the measurements as a table, for printing."""
+        self.stop()
+        total = time.perf_counter() - self._start
+        lines = [f"{'Stage':<22}{'Calls':>7}{'Time (s)':>11}{'Share':>8}"]
+        for name, (calls, seconds) in self.stages.items():
+            share = f"{seconds / total:7.1%}" if total and not name.startswith("file ") else ""
+            lines.append(f"{name:<22}{calls:>7}{seconds:>11.4f}{share:>8}")
+        lines.append(f"{'total':<22}{'':>7}{total:>11.4f}")
+        for name, value in self.counters.items():
+            lines.append(f"{name}: {value}")
+        rate = self.rows_per_second()
+        if rate:
+            lines.append(f"rows per second: {rate:.0f}")
+        if self.files:
+            slowest = sorted(self.files, key=lambda stats: stats["total"], reverse=True)[:SLOWEST_FILES]
+            lines.append("slowest files: " + ", ".join(
+                f"{os.path.basename(stats['file'])} ({stats['total'] * 1000:.1f} ms)" for stats in slowest
+            ))
+        resident = self.max_resident_memory()
+        if resident is not None:
+            lines.append(f"peak resident memory: {resident / 1024 / 1024:.1f} MB")
+        if self.peak_memory is not None:
+            lines.append(f"peak memory allocated by Python: {self.peak_memory / 1024 / 1024:.1f} MB")
+        return "\n".join(lines)
+
+    def to_json(self):
+        """Return the measurements as a dict that can be written as JSON."""
+        self.stop()
+        return {
+            "stages": {name: {"calls": calls, "seconds": seconds} for name, (calls, seconds) in self.stages.items()},
+            "counters": self.counters,
+            "rows_per_second": self.rows_per_second(),
+            "peak_memory": self.peak_memory,
+            "max_resident_memory": self.max_resident_memory(),
+            "files": self.files,
+            "traceEvents": self.events,
+        }
+
+    def write_json(self, path):
+        """Write the measurements to a JSON file."""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_json(), file, ensure_ascii=False, indent=1)
+
+
+class NullProfiler:
+    """Profiler that ignores everything, used when profiling is off."""
+
+    enabled = False
+    _null_stage = nullcontext()
+
+    def stage(self, name):
+        return self._null_stage
+
+    def add(self, name, seconds, calls=1, start=None):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+    def record_file(self, file_path, stats):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
@@ -1,7 +1,29 @@
+import argparse
+import codecs
+import contextlib
+import hashlib
+import html
+import importlib.util
+import io
+import itertools
+import json
+import mmap
 import os
-from bs4 import BeautifulSoup
-from collections import defaultdict
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from bs4 import BeautifulSoup, SoupStrainer
+from array import array
+from collections import defaultdict, deque
 import jdatetime
+from artifacts import available_compressions, compress_files, manifest_summary, minify_html, remove_compressed
+from fuzzy import FUZZY_FIELDS, TrigramIndex
+from persian import SEARCH_CHARS, normalize_search_text, normalize_text
+from profiler import NULL_PROFILER, Profiler
+from timeslots import WEEKDAY_NAMES, ExamIndex, format_time, parse_exam
+from watcher import FolderWatcher, folder_state
 
 # Mapping of abbreviated day names to full names for "سه" and "پنج"
 day_mapping = {
@@ -9,6 +31,27 @@ day_mapping = {
     "پنج": "پنج شنبه"
 }
 
+# Days of the week, in the order they are shown
+WEEKDAYS = ("شنبه", "يكشنبه", "دوشنبه", "سه شنبه", "چهارشنبه", "پنج شنبه", "جمعه", "نامشخص")
+
+# Fields of a course, in the order they are shown
+COURSE_FIELDS = (
+    "course_code", "course_name", "day_time", "professor", "total_units", "capacity",
+    "class_name", "section", "class_code", "exam", "place", "group_code",
+)
+
+# Fields of a course, in the order of the columns of the generated tables
+DISPLAY_FIELDS = (
+    "course_name", "course_code", "day_time", "professor", "total_units", "capacity",
+    "class_name", "section", "class_code", "exam", "place", "group_code",
+)
+
+# Delay between the last keystroke and filtering the page, in milliseconds
+SEARCH_DEBOUNCE_MS = 150
+
+# Most courses the page finds for a filter by fuzzy search (see FUZZY_SEARCH_SCRIPT)
+FUZZY_PAGE_LIMIT = 50
+
 
 def get_jalali_date():
     # Get today's Jalali date
@@ -21,83 +64,868 @@ def get_jalali_date():
     formatted_date = f"{jalali_date.day} {months[jalali_date.month - 1]} {jalali_date.year}"
     return formatted_date
 
-def parse_html_files(folder_path):
+
+# Size of the write buffer of the output file
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+# How the page is rendered: every row as HTML, the courses as data rendered by
+# the page, or an index page loading the courses of each group or day (shards)
+RENDER_MODES = ("static", "data", "shards")
+
+# How the rows of a class found in several files are merged, see RowMerger
+DEDUP_POLICIES = ("flag", "latest", "off")
+
+# Parsers that can be used to extract the course table from a page
+PARSERS = ("stream", "strainer", "lxml", "bs4")
+
+# The encoding of a page is declared by a BOM or a <meta charset> in its first bytes. Pages
+# without one are UTF-8, or windows-1256 (older Amozeshyar exports) when they are not valid UTF-8
+ENCODING_SNIFF_BYTES = 4096
+FALLBACK_ENCODING = "cp1256"
+BOM_ENCODINGS = (
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+META_CHARSET_RE = re.compile(rb"""<meta\b[^>]*?charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE)
+
+# Opening tag of the course table, and any table tag (to find where it ends)
+SCROLLABLE_TABLE_RE = re.compile(rb"""<table\b[^>]*?\sid\s*=\s*["']?scrollable["'\s/>]""", re.IGNORECASE)
+TABLE_TAG_RE = re.compile(rb"<(/?)table\b", re.IGNORECASE)
+
+# Elements without content, which are never left open
+VOID_TAGS = {
+    b"area", b"base", b"br", b"col", b"embed", b"hr", b"img", b"input", b"link",
+    b"meta", b"param", b"source", b"track", b"wbr",
+}
+
+# A comment, a declaration or a start/end tag (group 1: "/" for end tags, group 2: tag name)
+HTML_TOKEN_RE = re.compile(
+    rb"""<!--.*?(?:-->|$)|<[!?][^>]*>|<(/?)([a-zA-Z][^\s/>]*)(?:"[^"]*"|'[^']*'|[^'">])*>""",
+    re.DOTALL,
+)
+
+
+def sniff_encoding(data):
     """
-    Parse all HTML files in the specified folder to extract course data.
+    Find the encoding declared by the BOM or <meta charset> of a page.
 
     Args:
-        folder_path (str): Path to the folder containing HTML files.
-        course_codes (set): Set of course codes to filter data. If empty, include all courses.
+        data (bytes): Raw page content (bytes, memoryview or mmap); only its
+            first ENCODING_SNIFF_BYTES are looked at.
 
     Returns:
-        dict: A dictionary representing the weekly schedule.
+        str: Normalized codec name, or None if no known encoding is declared.
     """
-    headers = None  # Initialize headers as None
-    data_rows = []  # Store all data rows
+    head = data[:ENCODING_SNIFF_BYTES]
+    for bom, encoding in BOM_ENCODINGS:
+        if head.startswith(bom):
+            return encoding
+    match = META_CHARSET_RE.search(head)
+    if match is None:
+        return None
+    try:
+        encoding = codecs.lookup(match.group(1).decode("ascii")).name
+    except LookupError:
+        return None
+    # A page read as ASCII to find its <meta> is not UTF-16, whatever it says
+    return "utf-8" if encoding.startswith("utf-16") else encoding
+
+
+def decode_page_bytes(data, declared):
+    """
+    Decode bytes of a page: with the declared encoding if any, otherwise as
+    UTF-8, or FALLBACK_ENCODING if they are not valid UTF-8.
+
+    Args:
+        data (bytes): Bytes to decode (bytes or memoryview).
+        declared (str): Encoding returned by sniff_encoding.
+
+    Returns:
+        tuple: (text, encoding, valid), valid being False if bytes that are
+        not valid in the declared encoding were replaced with U+FFFD.
+    """
+    encoding = declared or "utf-8"
+    try:
+        return str(data, encoding), encoding, True
+    except UnicodeDecodeError:
+        if declared:
+            return str(data, encoding, "replace"), encoding, False
+    return str(data, FALLBACK_ENCODING, "replace"), FALLBACK_ENCODING, True
 
-    file_paths = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.endswith(".html")]
 
-    # Process each file
-    for file_path in file_paths:
-        with open(file_path, "rb") as file:  # Open in binary mode
+def encoding_error(file_path, declared, encoding, bad_offsets=()):
+    """
+    Return the message reporting how a page with encoding problems was decoded,
+    or None if it was decoded as declared (or as UTF-8) without problems.
+
+    Args:
+        file_path (str): Path of the page.
+        declared (str): Encoding returned by sniff_encoding.
+        encoding (str): Encoding the page was decoded with.
+        bad_offsets (list): Offsets of the text that is not valid in the
+            encoding (None if their positions are unknown).
+    """
+    if bad_offsets is None or bad_offsets:
+        where = f" (first at byte {bad_offsets[0]}, {len(bad_offsets)} cells)" if bad_offsets else ""
+        return f"Encoding errors in {file_path}: bytes that are not valid {encoding}{where} were replaced"
+    if not declared and encoding != "utf-8":
+        return f"{file_path} declares no encoding and is not valid UTF-8, it was decoded as {encoding}"
+    return None
+
+
+def find_table_bytes(data):
+    """
+    Locate the course table (<table id="scrollable">) in the raw bytes of a page.
+
+    Args:
+        data (bytes): Raw content of the HTML file.
+
+    Returns:
+        tuple: (start, end) byte offsets of the table, or None if there is none.
+    """
+    match = SCROLLABLE_TABLE_RE.search(data)
+    if not match:
+        return None
+
+    depth = 0
+    for tag in TABLE_TAG_RE.finditer(data, match.start()):
+        if tag.group(1):
+            depth -= 1
+            if depth == 0:
+                end = data.find(b">", tag.end())
+                return match.start(), len(data) if end == -1 else end + 1
+        else:
+            depth += 1
+
+    return match.start(), len(data)  # Unclosed table runs to the end of the file
+
+
+def decode_cell_text(raw, encoding="utf-8", errors="replace"):
+    """Decode and strip one raw text node of a cell ("" for whitespace only)."""
+    if not raw.strip():
+        return ""
+    text = raw.decode(encoding, errors)
+    if "&" in text:
+        text = html.unescape(text)
+    return text.strip()
+
+
+def iter_table_rows(data, start=0, end=None, encoding="utf-8", bad_offsets=None):
+    """
+    Stream the rows of a table as lists of stripped cell texts.
+
+    The raw bytes are tokenized with regular expressions instead of building a
+    tree, and only the text inside cells is decoded. Tags are nested and closed
+    the way BeautifulSoup's html.parser builder does, so rows and cells are the
+    same as table.find_all("tr") and row.find_all(["td", "th"]) with their
+    get_text(strip=True).
+
+    Args:
+        data (bytes): Raw page content (bytes, memoryview or mmap).
+        start (int): Offset of the table, as located by find_table_bytes.
+        end (int): End offset of the table, defaults to the end of data.
+        encoding (str): Encoding of the page, which must be ASCII-compatible.
+        bad_offsets (list): If given, text that is not valid in the encoding is
+            decoded with U+FFFD replacements and its offset appended to this
+            list; otherwise it raises UnicodeDecodeError.
+
+    Yields:
+        list: The cell values of each row, in document order.
+    """
+    end = len(data) if end is None else end
+    stack = []  # Open elements as (tag, row or cell)
+    open_rows = []  # Rows are [cells, finished], cells are lists of text parts
+    open_cells = []
+    pending = deque()  # Rows in document order, yielded once finished
+    pos = start
+
+    while True:
+        match = HTML_TOKEN_RE.search(data, pos, end)
+        token_start = end if match is None else match.start()
+        if open_cells and token_start > pos:
+            raw = data[pos:token_start]
             try:
-                content = file.read().decode("utf-8", errors="replace")
-                soup = BeautifulSoup(content, "html.parser")
+                text = decode_cell_text(raw, encoding, "strict")
+            except UnicodeDecodeError:
+                if bad_offsets is None:
+                    raise
+                bad_offsets.append(pos)
+                text = decode_cell_text(raw, encoding)
+            if text:
+                for cell in open_cells:
+                    cell.append(text)
+        if match is None:
+            break
+        pos = match.end()
 
+        tag = match.group(2)
+        if tag is None:  # Comment or declaration
+            continue
+        tag = tag.lower()
 
-                table = soup.find("table", id="scrollable")
-                if not table:
-                    print(f"No table found in {file_path}")
-                    continue
+        if not match.group(1):
+            if tag in VOID_TAGS:
+                continue
+            if tag == b"tr":
+                row = [[], False]
+                pending.append(row)
+                open_rows.append(row)
+                stack.append((tag, row))
+            elif tag in (b"td", b"th"):
+                cell = []
+                for row in open_rows:
+                    row[0].append(cell)
+                open_cells.append(cell)
+                stack.append((tag, cell))
+            else:
+                stack.append((tag, None))
 
-                # Extract data from the table
-                rows = table.find_all("tr")
-                for i, row in enumerate(rows):
-                    cells = row.find_all(["td", "th"])
-                    cell_values = [cell.get_text(strip=True) for cell in cells]
-                    
-                    if i == 0:  # First row contains headers
-                        if headers is None:  # Only set headers if not already set
-                            headers = cell_values
-                    else:
-                        if len(cell_values) == len(headers):  # Only add rows with correct number of columns
-                            data_rows.append(cell_values)
-
-            except Exception as e:
-                print(f"Error processing {file_path}: {e}")
+            if tag in (b"script", b"style"):
+                # Their content is not text; skip to the closing tag
+                close_tag = re.compile(rb"</" + tag + rb"\s*>", re.IGNORECASE).search(data, pos, end)
+                pos = end if close_tag is None else close_tag.start()
+            if not match.group(0).endswith(b"/>"):
                 continue
 
-    if not headers or not data_rows:
-        print("No course data found.")
-        return {}
+        # End tag (or self-closing tag): close it and everything opened inside it
+        for index in range(len(stack) - 1, -1, -1):
+            if stack[index][0] == tag:
+                closed = stack[index:]
+                for closed_tag, item in closed:
+                    if closed_tag == b"tr":
+                        item[1] = True
+                # Removed by identity, as open cells or rows can have equal contents
+                closed_ids = {id(item) for _, item in closed}
+                open_rows[:] = [row for row in open_rows if id(row) not in closed_ids]
+                open_cells[:] = [cell for cell in open_cells if id(cell) not in closed_ids]
+                del stack[index:]
+                break
 
-    # Create column index mapping
+        while pending and pending[0][1]:
+            yield ["".join(cell) for cell in pending.popleft()[0]]
+
+    # Elements left open at the end of the table are closed there
+    for cells, _ in pending:
+        yield ["".join(cell) for cell in cells]
+
+
+def iter_table_rows_lxml(table_text):
+    """Stream the rows of a table (decoded text) like iter_table_rows, using lxml's iterparse."""
+    from lxml import etree  # Optional dependency, only needed for --parser lxml
+
+    content = table_text.encode("utf-8")
+    for _, row in etree.iterparse(io.BytesIO(content), events=("end",), tag="tr", html=True, encoding="utf-8"):
+        yield ["".join(text.strip() for text in cell.itertext()) for cell in row.iter("td", "th")]
+        row.clear()
+
+
+def extract_rows_from_bytes(data, source, parser="stream", rows=None, steps=None):
+    """
+    Extract the cell texts of every row of the course table in the raw bytes of a page.
+
+    The encoding is the one declared by the page (see sniff_encoding),
+    otherwise UTF-8, or windows-1256 for the pages that are not valid UTF-8.
+    Pages with encoding problems keep their rows and get an error message.
+
+    Args:
+        data (bytes): Raw page content (bytes, memoryview or mmap).
+        source (str): Name of the page (file path or URL) used in messages.
+        parser (str): One of PARSERS, see extract_table_rows.
+        rows (list): List the rows are appended to, so the rows extracted
+            before an exception are kept.
+        steps (list): If given, the time at the end of each step is appended
+            to it, see extract_table_rows.
+
+    Returns:
+        tuple: (rows, error, encoding), rows being a list of cell value lists
+        (the first one being the header row), error a message or None and
+        encoding the one the cells were decoded with (None without a table).
+
+    Raises:
+        Exception: Whatever the parser raises on a malformed page.
+    """
+    rows = [] if rows is None else rows
+    steps = [] if steps is None else steps
+    declared = sniff_encoding(data)
+    if parser in ("stream", "lxml"):
+        if declared and declared.startswith("utf-16"):
+            # Not ASCII-compatible, so the tags cannot be found in the raw bytes
+            data = str(data, declared, "replace").encode("utf-8")
+            declared = "utf-8"
+        span = find_table_bytes(data)
+        steps.append(time.perf_counter())
+        if span is None:
+            return rows, f"No table found in {source}", None
+
+        if parser == "stream":
+            # Only the cell texts are decoded; retry with the fallback when they are not UTF-8
+            encoding = declared or "utf-8"
+            bad_offsets = [] if declared else None
+            try:
+                rows.extend(iter_table_rows(data, *span, encoding=encoding, bad_offsets=bad_offsets))
+            except UnicodeDecodeError:
+                rows.clear()
+                encoding, bad_offsets = FALLBACK_ENCODING, []
+                rows.extend(iter_table_rows(data, *span, encoding=encoding))
+            bad_offsets = bad_offsets or []
+        else:
+            # Only the table is decoded, straight from the page bytes
+            with memoryview(data) as view:
+                text, encoding, valid = decode_page_bytes(view[span[0]:span[1]], declared)
+            bad_offsets = [] if valid else None
+            rows.extend(iter_table_rows_lxml(text))
+        return rows, encoding_error(source, declared, encoding, bad_offsets), encoding
+
+    content, encoding, valid = decode_page_bytes(data, declared)
+    parse_only = SoupStrainer("table", id="scrollable") if parser == "strainer" else None
+    soup = BeautifulSoup(content, "html.parser", parse_only=parse_only)
+
+    table = soup.find("table", id="scrollable")
+    steps.append(time.perf_counter())
+    if not table:
+        return rows, f"No table found in {source}", None
+
+    for row in table.find_all("tr"):
+        cells = row.find_all(["td", "th"])
+        rows.append([cell.get_text(strip=True) for cell in cells])
+    return rows, encoding_error(source, declared, encoding, [] if valid else None), encoding
+
+
+def extract_page_rows(data, source, parser="stream"):
+    """
+    Extract the rows of the course table of a page like extract_table_rows,
+    from its raw bytes instead of a file.
+
+    Returns:
+        tuple: (rows, error), see extract_table_rows.
+    """
+    rows = []
     try:
-        columns = {
-            "course_code": headers.index("كد درس"),
-            "course_name": headers.index("نام درس"),
-            "day_time": headers.index("زمانبندي تشکيل کلاس"),
-            "professor": headers.index("استاد"),
-            "theory_units": headers.index("تعداد واحد نظري"),
-            "practical_units": headers.index("تعداد واحد عملي"),
-            "capacity": headers.index("حداكثر ظرفيت"),
-            "class_name": headers.index("نام كلاس درس"),
-            "section": headers.index("مقطع ارائه درس"),
-            "class_code": headers.index("كد ارائه کلاس درس"),
-            "exam": headers.index("زمان امتحان"),
-            "place": headers.index("مكان برگزاري"),
-            "group_code": headers.index("گروه آموزشی"),
-            "faculty_code": headers.index("دانشکده"),
-            "branch_code": headers.index("واحد"),
-            "province_code": headers.index("استان"),
+        return extract_rows_from_bytes(data, source, parser=parser, rows=rows)[:2]
+    except Exception as e:
+        return rows, f"Error processing {source}: {e}"
+
+
+def extract_table_rows(file_path, parser="stream", stats=None):
+    """
+    Extract the cell texts of every row of the course table in one HTML file.
+
+    Args:
+        file_path (str): Path to the HTML file.
+        parser (str): One of PARSERS. "stream" and "lxml" only parse the bytes of
+            the course table, "strainer" builds a BeautifulSoup tree of the table
+            only and "bs4" builds a tree of the whole page.
+        stats (dict): If given, the size of the file ("bytes"), the number of
+            data "rows", its "encoding" and the duration in seconds of each step
+            are stored in it:
+            "read" (mapping, or reading the file), "parse" (locating the
+            table, or decoding the page and building the BeautifulSoup tree)
+            and "cells" (extracting the text of the cells).
+
+    Returns:
+        tuple: (rows, error) where rows is a list of cell value lists (the first
+        one being the header row) and error is a message or None (see
+        extract_rows_from_bytes).
+    """
+    rows = []
+    encoding = error = None
+    steps = [time.perf_counter()]  # Time at the end of each step
+    with open(file_path, "rb") as file:  # Open in binary mode
+        size = os.fstat(file.fileno()).st_size
+        try:
+            if parser in ("stream", "lxml"):
+                # Map the file instead of reading it, only the table is ever touched
+                if size == 0:
+                    return rows, f"No table found in {file_path}"
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    steps.append(time.perf_counter())
+                    _, error, encoding = extract_rows_from_bytes(data, file_path, parser, rows, steps)
+            else:
+                data = file.read()
+                steps.append(time.perf_counter())
+                _, error, encoding = extract_rows_from_bytes(data, file_path, parser, rows, steps)
+
+        except Exception as e:
+            return rows, f"Error processing {file_path}: {e}"
+
+        finally:
+            if stats is not None:
+                steps.append(time.perf_counter())
+                stats.update(bytes=size, rows=max(len(rows) - 1, 0), encoding=encoding)  # Without the header row
+                stats.update(zip(("read", "parse", "cells"), (end - start for start, end in zip(steps, steps[1:]))))
+
+    return rows, error
+
+
+def extract_table_rows_profiled(file_path, parser="stream"):
+    """
+    Extract the rows of a file like extract_table_rows, and time it.
+
+    Returns:
+        tuple: ((rows, error), stats), stats being filled by
+        extract_table_rows, with the "start" and "total" duration of the
+        extraction and the "pid" of the process that ran it.
+    """
+    stats = {"start": time.perf_counter(), "pid": os.getpid()}
+    result = extract_table_rows(file_path, parser=parser, stats=stats)
+    stats["total"] = time.perf_counter() - stats["start"]
+    return result, stats
+
+
+class ParseCache:
+    """
+    Persistent cache of the rows extracted from each HTML file.
+
+    Entries are keyed by the absolute file path and store the file size,
+    modification time and SHA-256 of its content. A file whose size and
+    modification time are unchanged is not read at all; otherwise its content
+    hash decides whether the cached rows can still be used.
+    """
+
+    VERSION = 3  # Bump when the extracted rows change for the same content
+    FILE_NAME = "parse-cache.json"
+
+    def __init__(self, cache_dir=".timetable-cache"):
+        self.path = os.path.join(cache_dir, self.FILE_NAME)
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.removed = 0
+        self._dirty = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            if data.get("version") == self.VERSION:
+                self.entries = data["entries"]
+        except (OSError, ValueError, KeyError):
+            pass  # Missing or unreadable cache starts empty
+
+    def lookup(self, file_path):
+        """
+        Return the cached (rows, error) of a file, or None if it must be parsed.
+        """
+        key = os.path.abspath(file_path)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        stat = os.stat(file_path)
+        if entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            if entry["sha256"] != self._hash_file(file_path):
+                return None
+            # Touched but not changed: remember the new stat to skip hashing next time
+            entry["size"], entry["mtime_ns"] = stat.st_size, stat.st_mtime_ns
+            self._dirty = True
+
+        self.hits += 1
+        return entry["rows"], entry["error"]
+
+    def store(self, file_path, rows, error):
+        """Store the rows extracted from a file."""
+        stat = os.stat(file_path)
+        self.entries[os.path.abspath(file_path)] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": self._hash_file(file_path),
+            "rows": rows,
+            "error": error,
         }
-    except ValueError as e:
-        print(f"Required column not found in headers: {e}")
-        return {}
+        self.misses += 1
+        self._dirty = True
+
+    def prune(self):
+        """Drop the entries of files that no longer exist."""
+        for key in [key for key in self.entries if not os.path.exists(key)]:
+            del self.entries[key]
+            self.removed += 1
+            self._dirty = True
+
+    def save(self):
+        """Write the cache to disk if it changed."""
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"version": self.VERSION, "entries": self.entries}, file, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+        self._dirty = False
+
+    def stats(self):
+        """Return a one-line summary of the cache usage."""
+        return f"Cache: {self.hits} files reused, {self.misses} parsed, {self.removed} removed"
+
+    @staticmethod
+    def _hash_file(file_path):
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
 
-    filtered_courses = []
+class Course:
+    """
+    One offered class of a course.
+
+    Values repeated across many classes (course, professor, place, section,
+    ...) are interned, so each distinct string is stored only once. A class is
+    identified by its group_code, course_code and class_code together (see
+    RowMerger.KEY_FIELDS): class codes alone repeat across courses.
+    """
+
+    __slots__ = COURSE_FIELDS
+
+    def __init__(self, course_code, course_name, day_time, professor, total_units, capacity,
+                 class_name, section, class_code, exam, place, group_code):
+        self.course_code = sys.intern(course_code)
+        self.course_name = sys.intern(course_name)
+        self.day_time = sys.intern(day_time)
+        self.professor = sys.intern(professor)
+        self.total_units = total_units
+        self.capacity = sys.intern(capacity)
+        self.class_name = sys.intern(class_name)
+        self.section = sys.intern(section)
+        self.class_code = class_code  # Only shared by a few classes, not worth interning
+        self.exam = sys.intern(exam)
+        self.place = sys.intern(place)
+        self.group_code = sys.intern(group_code)
+
+    def __eq__(self, other):
+        if not isinstance(other, Course):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in COURSE_FIELDS)
+
+    def __repr__(self):
+        return f"Course({self.course_code!r}, {self.course_name!r}, class_code={self.class_code!r})"
+
+    def to_dict(self):
+        """Return the fields of the course as a dict."""
+        return {field: getattr(self, field) for field in COURSE_FIELDS}
+
+
+class CourseTable:
+    """
+    Columnar store of courses.
+
+    Each field is stored in its own column. Fields with repeated values hold
+    integer codes into the list of distinct values of the column (`values`),
+    total_units is an array of doubles and class_code a plain list. Rows are
+    referred to by their index, and table[index] builds the Course of a row
+    on demand.
+    """
+
+    CATEGORICAL_FIELDS = tuple(field for field in COURSE_FIELDS if field not in ("total_units", "class_code"))
+
+    def __init__(self):
+        self.columns = {field: array("I") for field in self.CATEGORICAL_FIELDS}
+        self.columns["total_units"] = array("d")
+        self.columns["class_code"] = []
+        self.values = {field: [] for field in self.CATEGORICAL_FIELDS}
+        self._codes = {field: {} for field in self.CATEGORICAL_FIELDS}
+
+    def __len__(self):
+        return len(self.columns["class_code"])
+
+    def __getitem__(self, index):
+        return Course(**{field: self.get(index, field) for field in COURSE_FIELDS})
+
+    def append(self, course):
+        """Append a course and return its row index."""
+        for field in self.CATEGORICAL_FIELDS:
+            value = getattr(course, field)
+            codes = self._codes[field]
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(self.values[field])
+                self.values[field].append(value)
+            self.columns[field].append(code)
+        self.columns["total_units"].append(course.total_units)
+        self.columns["class_code"].append(course.class_code)
+        return len(self) - 1
+
+    def extend(self, courses):
+        """Append each course of an iterable."""
+        for course in courses:
+            self.append(course)
+
+    def get(self, index, field):
+        """Return the value of one field of a row."""
+        if field in self._codes:
+            return self.values[field][self.columns[field][index]]
+        return self.columns[field][index]
+
+    def column(self, field):
+        """Return the decoded values of a field for every row."""
+        if field in self._codes:
+            values = self.values[field]
+            return [values[code] for code in self.columns[field]]
+        return list(self.columns[field])
+
+    def group_by_weekday(self):
+        """
+        Organize the rows by weekdays, like group_by_weekday.
+
+        Returns:
+            dict: Array of row indexes for each day of WEEKDAYS.
+        """
+        # The weekday only depends on day_time, so resolve it once per distinct value
+        weekdays = [course_weekday(day_time) for day_time in self.values["day_time"]]
+        weekly_schedule = defaultdict(lambda: array("I"))
+        for index, code in enumerate(self.columns["day_time"]):
+            weekly_schedule[weekdays[code]].append(index)
+
+        return {day: weekly_schedule.get(day, array("I")) for day in WEEKDAYS}
+
+
+class RowMerger:
+    """
+    Merge the rows of a class found in several files.
+
+    Overlapping searches export the same class more than once. Rows are
+    identified by their group, course code and class code (see KEY_FIELDS):
+    a repeated row with the same normalized values (its fingerprint) is
+    dropped, and one with different values is handled by the policy:
+
+        latest  merge the rows, the values of the most recently modified
+                file replacing the others (empty values are not used)
+        flag    keep both rows and report the fields that differ
+
+    Rows without a class code are only dropped when their fingerprint repeats.
+
+    Args:
+        policy (str): "latest" or "flag" (see DEDUP_POLICIES).
+    """
+
+    # Fields identifying a class; class codes alone are shared by the classes of a cohort
+    KEY_FIELDS = ("group_code", "course_code", "class_code")
+
+    def __init__(self, policy="flag"):
+        self.policy = policy
+        self.rows = 0
+        self.duplicates = 0
+        self.merged = 0
+        self.conflicts = 0
+
+    def merge(self, headers, file_rows):
+        """
+        Merge the data rows of the files of a folder.
+
+        Args:
+            headers (list): Table headers the rows are read through.
+            file_rows (iterable): (data rows, modification time) of each file,
+                in file order.
+
+        Returns:
+            list: The rows with the repeated classes merged, each at the
+            place of its first occurrence.
+        """
+        self.rows = self.duplicates = self.merged = self.conflicts = 0
+        try:
+            columns = find_columns(headers)
+        except ValueError:
+            return [row for rows, _ in file_rows for row in rows]  # Reported when the courses are built
+        key_columns = [columns[field] for field in self.KEY_FIELDS]
+        class_column = columns["class_code"]
+        value_columns = sorted(set(columns.values()))
+
+        def fingerprint(row):
+            return tuple(normalize_search_text(row[column]) for column in value_columns)
+
+        merged_rows = []
+        positions = {}  # Key -> index in merged_rows of its (first) row
+        fingerprints = {}  # Key -> fingerprints of its rows, computed on the first repeat
+        mtimes = {}  # Key -> modification time of the file of its values
+        for rows, mtime in file_rows:
+            for row in rows:
+                self.rows += 1
+                key = tuple(row[column] for column in key_columns)
+                if not row[class_column].strip():
+                    key = fingerprint(row)
+                position = positions.get(key)
+                if position is None:
+                    positions[key] = len(merged_rows)
+                    mtimes[key] = mtime
+                    merged_rows.append(row)
+                    continue
+
+                # Fast path: the same values as a row already kept
+                known = fingerprints.get(key)
+                if known is None:
+                    known = fingerprints[key] = {fingerprint(merged_rows[position])}
+                row_fingerprint = fingerprint(row)
+                if row_fingerprint in known:
+                    self.duplicates += 1
+                    continue
+
+                if self.policy == "latest":
+                    old = merged_rows[position]
+                    newer = mtime >= mtimes[key]
+                    merged_rows[position] = [
+                        new if new.strip() and (newer or not current.strip()) else current
+                        for current, new in zip(old, row)
+                    ]
+                    mtimes[key] = max(mtime, mtimes[key])
+                    fingerprints[key] = {fingerprint(merged_rows[position])}
+                    self.merged += 1
+                else:
+                    old = merged_rows[position]
+                    fields = [headers[column] for column in value_columns
+                              if normalize_search_text(old[column]) != normalize_search_text(row[column])]
+                    print(f"Conflicting rows for class {row[class_column]} of course "
+                          f"{row[columns['course_code']]}: {', '.join(fields)}")
+                    known.add(row_fingerprint)
+                    merged_rows.append(row)
+                    self.conflicts += 1
+        return merged_rows
+
+    def stats(self):
+        """Return a one-line summary of the last merge."""
+        return (f"Dedup: {self.rows} rows, {self.duplicates} duplicates removed, "
+                f"{self.merged} merged, {self.conflicts} conflicts flagged")
+
+
+def load_table_rows(folder_path, workers=1, parser="stream", cache=None, merger=None, profiler=NULL_PROFILER):
+    """
+    Extract the table rows of all HTML files in the specified folder.
+
+    Takes the same arguments as parse_html_files.
+
+    Returns:
+        tuple: (headers, data_rows). The headers are those of the first file
+        with a table (None if there is none) and only the rows with the same
+        number of columns are kept.
+    """
+    start = time.perf_counter()
+    file_paths = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.endswith(".html")]
+
+    # Reuse the cached rows of unchanged files
+    results = [cache.lookup(file_path) for file_path in file_paths] if cache else [None] * len(file_paths)
+    to_parse = [file_path for file_path, result in zip(file_paths, results) if result is None]
+
+    profiler.count("files cached", len(file_paths) - len(to_parse))
+
+    # Extract the table of the other files, in parallel if requested
+    extract = partial(extract_table_rows_profiled if profiler.enabled else extract_table_rows, parser=parser)
+    if workers and workers > 1 and len(to_parse) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(extract, to_parse))
+    else:
+        parsed = map(extract, to_parse)
+
+    parsed = iter(parsed)
+    for index, result in enumerate(results):
+        if result is None:
+            result = next(parsed)
+            if profiler.enabled:
+                result, stats = result
+                profiler.record_file(file_paths[index], stats)
+            results[index] = result
+            if cache:
+                cache.store(file_paths[index], *result)
+
+    if cache:
+        cache.prune()
+        cache.save()
+
+    def file_mtime(file_path):
+        try:
+            return os.stat(file_path).st_mtime_ns
+        except OSError:  # Removed since it was read
+            return 0
+
+    for _, error in results:
+        if error:
+            print(error)
+    profiler.add("extract", time.perf_counter() - start, start=start)
+
+    return merge_page_rows(
+        ((rows, file_mtime(file_path) if merger else 0) for file_path, (rows, _) in zip(file_paths, results)),
+        merger=merger, profiler=profiler,
+    )
+
+
+def merge_page_rows(pages, merger=None, profiler=NULL_PROFILER):
+    """
+    Merge the rows extracted from the pages, in order.
+
+    Args:
+        pages (iterable): (rows, mtime) of each page, rows being as returned
+            by extract_table_rows and mtime telling which page is the most
+            recent, for the merger.
+        merger (RowMerger): Merges the rows of a class found in several
+            pages, if given.
+        profiler (Profiler): Receives the timings of the stages, see profiler.py.
+
+    Returns:
+        tuple: (headers, data_rows), see load_table_rows.
+    """
+    headers = None  # Initialize headers as None
+    data_rows = []  # Store all data rows
+    page_rows = []
+    for rows, mtime in pages:
+        page_data_rows = []
+        for i, cell_values in enumerate(rows):
+            if i == 0:  # First row contains headers
+                if headers is None:  # Only set headers if not already set
+                    headers = cell_values
+            else:
+                if len(cell_values) == len(headers):  # Only add rows with correct number of columns
+                    page_data_rows.append(cell_values)
+        if merger:
+            page_rows.append((page_data_rows, mtime))
+        else:
+            data_rows += page_data_rows
+
+    if merger and headers:
+        with profiler.stage("dedup"):
+            data_rows = merger.merge(headers, page_rows)
+
+    return headers, data_rows
+
+
+def find_columns(headers):
+    """
+    Map the course fields to their column index in the table headers.
+
+    Raises:
+        ValueError: If a required column is missing.
+    """
+    return {
+        "course_code": headers.index("كد درس"),
+        "course_name": headers.index("نام درس"),
+        "day_time": headers.index("زمانبندي تشکيل کلاس"),
+        "professor": headers.index("استاد"),
+        "theory_units": headers.index("تعداد واحد نظري"),
+        "practical_units": headers.index("تعداد واحد عملي"),
+        "capacity": headers.index("حداكثر ظرفيت"),
+        "class_name": headers.index("نام كلاس درس"),
+        "section": headers.index("مقطع ارائه درس"),
+        "class_code": headers.index("كد ارائه کلاس درس"),
+        "exam": headers.index("زمان امتحان"),
+        "place": headers.index("مكان برگزاري"),
+        "group_code": headers.index("گروه آموزشی"),
+        "faculty_code": headers.index("دانشکده"),
+        "branch_code": headers.index("واحد"),
+        "province_code": headers.index("استان"),
+    }
+
+
+def iter_courses(columns, data_rows):
+    """
+    Build a Course for each valid data row.
+
+    Args:
+        columns (dict): Column index of each field, as returned by find_columns.
+        data_rows (list): Cell values of each row.
+
+    Yields:
+        Course: The course of each row with valid unit data.
+    """
+    max_column = max(columns.values())
     for row in data_rows:
-        if len(row) > max(columns.values()):
+        if len(row) > max_column:
             course_code = row[columns["course_code"]]
             try:
                 theory_units = float(row[columns["theory_units"]] or 0)
@@ -106,199 +934,640 @@ def parse_html_files(folder_path):
             except ValueError:
                 print(f"Invalid unit data for course {course_code}")
                 continue
-            
-
-            filtered_courses.append({
-                    "course_code": course_code,
-                    "course_name": row[columns["course_name"]],
-                    "day_time": row[columns["day_time"]] or "زمان نامشخص",
-                    "professor": row[columns["professor"]] or "  ",
-                    "total_units": total_units,
-                    "capacity": row[columns["capacity"]] or "  ",
-                    "class_name": row[columns["class_name"]] or "  ",
-                    "section": row[columns["section"]] or "  ",
-                    "class_code": row[columns["class_code"]] or "  ",
-                    "exam": row[columns["exam"]] or "  ",
-                    "place": row[columns["place"]] or "  ",
-                    "group_code": row[columns["group_code"]] or "  ",
-                })
-
-    # Organize courses by weekdays
+
+            # Names are written in one spelling (see persian.normalize_text), times and codes as they are
+            yield Course(
+                course_code=course_code,
+                course_name=normalize_text(row[columns["course_name"]]),
+                day_time=row[columns["day_time"]] or "زمان نامشخص",
+                professor=normalize_text(row[columns["professor"]]) or "  ",
+                total_units=total_units,
+                capacity=row[columns["capacity"]] or "  ",
+                class_name=normalize_text(row[columns["class_name"]]) or "  ",
+                section=normalize_text(row[columns["section"]]) or "  ",
+                class_code=row[columns["class_code"]] or "  ",
+                exam=row[columns["exam"]] or "  ",
+                place=normalize_text(row[columns["place"]]) or "  ",
+                group_code=normalize_text(row[columns["group_code"]]) or "  ",
+            )
+
+
+@lru_cache(maxsize=None)
+def course_weekday(day_time):
+    """Return the full name of the weekday a class is held on, from its day_time."""
+    if day_time == "زمان نامشخص":
+        return "نامشخص"
+    weekday = day_time.split(" ")[0]  # Get the first part (day name)
+    return day_mapping.get(weekday, weekday)
+
+
+def group_by_weekday(courses):
+    """
+    Organize courses by weekdays.
+
+    Returns:
+        dict: Courses of each day of WEEKDAYS, in that order. Courses held on
+        any other day are left out.
+    """
     weekly_schedule = defaultdict(list)
-    for course in filtered_courses:
-        day_time = course["day_time"]
-        if day_time == "زمان نامشخص":
-            weekly_schedule["نامشخص"].append(course)
-        else:
-            try:
-                weekday = day_time.split(" ")[0]  # Get the first part (day name)
-                full_day_name = day_mapping.get(weekday, weekday)
-                weekly_schedule[full_day_name].append(course)
-            except IndexError:
-                weekly_schedule["نامشخص"].append(course)
+    for course in courses:
+        weekly_schedule[course_weekday(course.day_time)].append(course)
 
     # Ensure the order of days in the schedule
-    ordered_schedule = {
-        "شنبه": [],
-        "يكشنبه": [],
-        "دوشنبه": [],
-        "سه شنبه": [],
-        "چهارشنبه": [],
-        "پنج شنبه": [],
-        "جمعه": [],
-        "نامشخص": [],
-    }
+    return {day: weekly_schedule.get(day, []) for day in WEEKDAYS}
 
-    # Sort courses into the correct day order
-    for day in ordered_schedule:
-        ordered_schedule[day] = weekly_schedule.get(day, [])
 
-    return ordered_schedule
+def parse_html_files(folder_path, workers=1, parser="stream", cache=None, merger=None,
+                     profiler=NULL_PROFILER):
+    """
+    Parse all HTML files in the specified folder to extract course data.
 
+    Args:
+        folder_path (str): Path to the folder containing HTML files.
+        workers (int): Number of processes used to parse the files. With 1 (or
+            a single file) the files are parsed in the current process.
+        parser (str): Parser used to extract the course table, one of PARSERS.
+        cache (ParseCache): Cache of previously extracted rows. Only files that
+            are new or changed are parsed, and the cache is saved afterwards.
+        merger (RowMerger): Merges the rows of a class found in several
+            files, if given.
+        profiler (Profiler): Receives the timings of the stages, see profiler.py.
 
-def write_schedule_to_file(weekly_schedule, output_file):
+    Returns:
+        dict: A dictionary representing the weekly schedule.
     """
-    Write the weekly schedule to HTML file with advanced features.
+    headers, data_rows = load_table_rows(folder_path, workers=workers, parser=parser, cache=cache, merger=merger,
+                                         profiler=profiler)
+    return schedule_from_rows(headers, data_rows, profiler=profiler)
+
+
+def schedule_from_rows(headers, data_rows, profiler=NULL_PROFILER):
     """
+    Build the weekly schedule of the rows returned by load_table_rows (or merge_page_rows).
 
-    # Create all-courses view (sorted by name)
-    all_courses = []
-    for courses in weekly_schedule.values():
-        all_courses.extend(courses)
-    
-    # Sort all courses by name
-    all_courses.sort(key=lambda x: x['course_name'])
+    Returns:
+        dict: The weekly schedule, see parse_html_files (empty without courses).
+    """
+    if not headers or not data_rows:
+        print("No course data found.")
+        return {}
 
-    date=get_jalali_date()
+    # Create column index mapping
+    try:
+        columns = find_columns(headers)
+    except ValueError as e:
+        print(f"Required column not found in headers: {e}")
+        return {}
 
-    # HTML content
-    html_content = """
-    <!DOCTYPE html>
-    <html dir="rtl" lang="fa">
-    <head>
-        <meta charset="UTF-8">
-        <title>برنامه کلاس‌ها</title>
-        <style>
-            body {
-                font-family: Arial, sans-serif;
-                margin: 20px;
-                background-color: #f5f5f5;
-            }
-            .container {
-                max-width: 1200px;
-                margin: 0 auto;
-                background-color: white;
-                padding: 20px;
-                border-radius: 8px;
-                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            }
-            .controls {
-                margin-bottom: 20px;
-                padding: 15px;
-                background-color: #f8f9fa;
-                border-radius: 5px;
-            }
-            .view-controls {
-                margin-bottom: 15px;
-            }
-            .filter-controls {
-                margin-bottom: 15px;
-            }
-            input[type="text"] {
-                width: 100%;
-                padding: 8px;
-                margin-bottom: 10px;
-                border: 1px solid #ddd;
-                border-radius: 4px;
-            }
-            .button {
-                padding: 8px 15px;
-                margin-right: 10px;
-                border: none;
-                border-radius: 4px;
-                cursor: pointer;
-                background-color: #007bff;
-                color: white;
-            }
-            .button:hover {
-                background-color: #0056b3;
-            }
-            .button.active {
-                background-color: #0056b3;
-            }
-            table {
-                border-collapse: collapse;
-                width: 100%;
-                margin: 20px 0;
-                background-color: white;
-            }
-            th, td {
-                border: 1px solid #ddd;
-                padding: 12px 8px;
-                text-align: right;
-            }
-            th {
-                background-color: #f2f2f2;
-                position: sticky;
-                top: 0;
-            }
-            tr:nth-child(even) {
-                background-color: #f9f9f9;
-            }
-            .view {
-                display: none;
-            }
-            .view.active {
-                display: block;
-            }
-            h2 {
-                color: #333;
-                margin-top: 20px;
-                border-bottom: 2px solid #007bff;
-                padding-bottom: 5px;
-            }
-            .help-text {
-                color: #666;
-                font-size: 0.9em;
-                margin-bottom: 10px;
+    courses = iter_courses(columns, data_rows)
+    if profiler.enabled:  # Build the courses apart, to time them separately from grouping
+        with profiler.stage("courses"):
+            courses = list(courses)
+    with profiler.stage("group"):
+        return group_by_weekday(courses)
+
+
+def parse_course_table(folder_path, workers=1, parser="stream", cache=None, merger=None,
+                       profiler=NULL_PROFILER):
+    """
+    Parse all HTML files in the specified folder into a columnar CourseTable.
+
+    Takes the same arguments as parse_html_files. The courses are appended to
+    the table as they are built, without keeping a Course object per row.
+
+    Returns:
+        CourseTable: The courses, or None if no course data was found.
+    """
+    headers, data_rows = load_table_rows(folder_path, workers=workers, parser=parser, cache=cache, merger=merger,
+                                         profiler=profiler)
+    return table_from_rows(headers, data_rows, profiler=profiler)
+
+
+def table_from_rows(headers, data_rows, profiler=NULL_PROFILER):
+    """
+    Build the CourseTable of the rows returned by load_table_rows (or merge_page_rows).
+
+    Returns:
+        CourseTable: The courses, or None if no course data was found.
+    """
+    if not headers or not data_rows:
+        print("No course data found.")
+        return None
+
+    try:
+        columns = find_columns(headers)
+    except ValueError as e:
+        print(f"Required column not found in headers: {e}")
+        return None
+
+    table = CourseTable()
+    with profiler.stage("courses"):
+        table.extend(iter_courses(columns, data_rows))
+    return table
+
+
+class CourseFolder:
+    """
+    Courses of the HTML files of a folder, kept up to date file by file.
+
+    Each refresh compares the files with their size and modification time at
+    the previous one, and only extracts the tables of the files that were
+    added or changed; the courses of the other files are kept as they are.
+
+    Takes the same arguments as parse_html_files (files are parsed in the
+    current process). With a merger, the rows of all the files are merged
+    again at each change, as a class can be repeated across files.
+    """
+
+    def __init__(self, folder_path, parser="stream", cache=None, merger=None):
+        self.folder_path = folder_path
+        self.parser = parser
+        self.cache = cache
+        self.merger = merger
+        self.state = {}  # File path -> (size, modification time), in directory order
+        self.results = {}  # File path -> (rows, error) extracted from it
+        self.courses = {}  # File path -> courses of its rows
+        self.headers = None
+
+    def refresh(self):
+        """
+        Extract the tables of the added and changed files and forget the removed ones.
+
+        Returns:
+            tuple: Lists of the (added, changed, removed) file paths.
+        """
+        state = folder_state(self.folder_path)
+        added = [path for path in state if path not in self.state]
+        changed = [path for path in state if path in self.state and state[path] != self.state[path]]
+        removed = [path for path in self.state if path not in state]
+
+        for file_path in removed:
+            del self.results[file_path]
+            self.courses.pop(file_path, None)
+        for file_path in added + changed:
+            try:
+                result = self.cache.lookup(file_path) if self.cache else None
+                if result is None:
+                    result = extract_table_rows(file_path, parser=self.parser)
+                    if self.cache:
+                        self.cache.store(file_path, *result)
+            except OSError:  # Removed while being read, it is picked up at the next refresh
+                del state[file_path]
+                self.results.pop(file_path, None)
+                self.courses.pop(file_path, None)
+                continue
+            self.results[file_path] = result
+            self.courses.pop(file_path, None)
+            if result[1]:
+                print(result[1])
+        self.state = state
+
+        if self.cache and (added or changed or removed):
+            self.cache.prune()
+            self.cache.save()
+
+        # The headers are those of the first file with a table, rows are read through them
+        headers = next((self.results[path][0][0] for path in state if self.results[path][0]), None)
+        if headers != self.headers:
+            self.headers = headers
+            self.courses.clear()
+        return added, changed, removed
+
+    def schedule(self):
+        """Return the weekly schedule of the current files, like parse_html_files."""
+        if not self.headers:
+            print("No course data found.")
+            return {}
+        try:
+            columns = find_columns(self.headers)
+        except ValueError as e:
+            print(f"Required column not found in headers: {e}")
+            return {}
+
+        if self.merger:
+            data_rows = self.merger.merge(self.headers, (
+                ([row for row in self.results[file_path][0][1:] if len(row) == len(self.headers)], mtime)
+                for file_path, (_, mtime) in self.state.items()
+            ))
+            if not data_rows:
+                print("No course data found.")
+                return {}
+            return group_by_weekday(iter_courses(columns, data_rows))
+
+        for file_path in self.state:
+            if file_path not in self.courses:
+                rows, _ = self.results[file_path]
+                data_rows = [row for row in rows[1:] if len(row) == len(self.headers)]
+                self.courses[file_path] = list(iter_courses(columns, data_rows))
+        if not any(self.courses.values()):
+            print("No course data found.")
+            return {}
+        return group_by_weekday(course for file_path in self.state for course in self.courses[file_path])
+
+
+def watch_schedule(folder_path, output_file, parser="stream", cache=None, render="static", interval=0.5,
+                   merger=None, minify=False, compress=False):
+    """
+    Write the schedule, then write it again whenever the HTML files change.
+
+    Only the added, changed or removed files are parsed again (see
+    CourseFolder). Runs until interrupted with Ctrl+C.
+
+    Args:
+        folder_path (str): Folder of the HTML files.
+        output_file (str): Output file name, see write_schedule_to_file.
+        parser (str): Parser used to extract the course table, one of PARSERS.
+        cache (ParseCache): Cache of previously extracted rows, if any.
+        render (str): How the page is rendered, one of RENDER_MODES.
+        interval (float): Longest time between two checks of the folder, in seconds.
+        merger (RowMerger): Merges the rows of a class found in several files, if given.
+        minify (bool): Minify the page, see write_schedule_to_file.
+        compress (bool): Also write the compressed copies of the page, see
+            write_schedule_to_file.
+    """
+    folder = CourseFolder(folder_path, parser=parser, cache=cache, merger=merger)
+    with FolderWatcher(folder_path, interval) as watcher:
+        print(f"Watching {folder_path} ({watcher.method}), press Ctrl+C to stop")
+        first = True
+        try:
+            while True:
+                added, changed, removed = folder.refresh()
+                if first or added or changed or removed:
+                    write_schedule_to_file(folder.schedule(), output_file, render=render, minify=minify,
+                                           compress=compress)
+                    if not first:
+                        print(f"Schedule written to {output_file} "
+                              f"({len(added)} added, {len(changed)} changed, {len(removed)} removed)")
+                    first = False
+                watcher.wait()
+        except KeyboardInterrupt:
+            pass
+
+
+def sort_by_name(weekly_schedule, table=None):
+    """
+    Order the courses of the weekly schedule by name, for the all-courses view.
+
+    Args:
+        weekly_schedule (dict): Courses (or row indexes of table) of each weekday.
+        table (CourseTable): Table the rows of weekly_schedule refer to, if any.
+
+    Returns:
+        tuple: (all_courses, order), the courses sorted by name (stable) and,
+        for each of them, its position in weekly_schedule with the days
+        flattened in order.
+    """
+    weekly_courses = [course for courses in weekly_schedule.values() for course in courses]
+    if table is None:
+        order = sorted(range(len(weekly_courses)), key=lambda k: weekly_courses[k].course_name)
+    else:
+        order = sorted(range(len(weekly_courses)), key=lambda k: table.get(weekly_courses[k], "course_name"))
+    return [weekly_courses[k] for k in order], order
+
+
+def weekly_positions(weekly_schedule, order):
+    """
+    Return, for each weekday with courses, the positions of its courses in the
+    all-courses view (order being as returned by sort_by_name).
+    """
+    position = [0] * len(order)
+    for index, k in enumerate(order):
+        position[k] = index
+    days = []
+    k = 0
+    for courses in weekly_schedule.values():
+        if courses:
+            days.append(position[k:k + len(courses)])
+        k += len(courses)
+    return days
+
+
+def course_search_text(course):
+    """Normalized text of a course searched by the page filter."""
+    return " | ".join(normalize_search_text(str(getattr(course, field))) for field in DISPLAY_FIELDS)
+
+
+def build_search_index(weekly_schedule, all_courses, order):
+    """
+    Build the search index embedded in the generated page.
+
+    The text of each course is normalized once here (see course_search_text),
+    so the page only has to normalize the filter and look up the matching rows.
+
+    Args:
+        weekly_schedule (dict): Courses (or row indexes) of each weekday.
+        all_courses (iterable): Courses in the order of the all-courses view.
+        order (list): For each row of the all-courses view, the position of the
+            same course in weekly_schedule (its days flattened in order).
+
+    Returns:
+        str: JSON object with the normalized text of each course ("text", in
+        all-courses order), the courses in the table of each shown weekday
+        ("days", as positions in "text"), the folded characters ("chars") and
+        the filter delay in milliseconds ("delay"). Safe to embed in a <script>.
+    """
+    index = {
+        "text": [course_search_text(course) for course in all_courses],
+        "days": weekly_positions(weekly_schedule, order),
+        "chars": SEARCH_CHARS,
+        "delay": SEARCH_DEBOUNCE_MS,
+    }
+    return json.dumps(index, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+
+
+def build_fuzzy_index(all_courses):
+    """
+    Build the fuzzy search index embedded in the generated page.
+
+    Args:
+        all_courses (iterable): Courses in the order of the all-courses view.
+
+    Returns:
+        str: JSON object of fuzzy.TrigramIndex.to_json, the keys being
+        positions in the all-courses view, with the most courses a filter
+        finds this way ("limit"). Safe to embed in a <script>.
+    """
+    index = TrigramIndex((i, getattr(course, field)) for i, course in enumerate(all_courses) for field in FUZZY_FIELDS)
+    data = dict(index.to_json(), limit=FUZZY_PAGE_LIMIT)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+
+
+def build_exam_calendar(all_courses):
+    """
+    List the exams of the courses, for the exam calendar view.
+
+    Args:
+        all_courses (iterable): Courses in the order of the all-courses view.
+
+    Returns:
+        list: (date, start, end, course_code, course_name, positions) of each
+        distinct exam of each course, sorted by date and time (see
+        ExamIndex.entries), positions being those of its classes in
+        all_courses. Courses without a valid exam time are left out.
+    """
+    index = ExamIndex()
+    names = {}
+    positions = defaultdict(list)  # (course_code, exam) -> positions of its classes
+    for position, course in enumerate(all_courses):
+        exam = parse_exam(course.exam)
+        if exam:
+            index.add(course.course_code, exam)
+            names.setdefault(course.course_code, course.course_name)
+            positions[course.course_code, exam].append(position)
+    return [
+        (date, start, end, code, names[code], positions[code, (date, start, end)])
+        for date, start, end, code in index.entries()
+    ]
+
+
+def exam_date_title(date):
+    """Return the weekday name and Jalali date of an exam, like "پنج شنبه 1404/03/29"."""
+    return f"{WEEKDAY_NAMES[date.weekday()]} {date.strftime('%Y/%m/%d')}"
+
+
+def render_exam_view(calendar):
+    """
+    Yield the exam calendar view: a table of the exams of each date.
+
+    Args:
+        calendar (list): Exams as returned by build_exam_calendar.
+    """
+    yield """
+        <div id="examView" class="view">
+            <div class="help-text">
+                امتحانات دروسی که با فیلتر نمایش داده می‌شوند. با فیلتر کردن، امتحان‌های هم‌زمان با رنگ قرمز مشخص می‌شوند.
+            </div>
+    """
+    for date, exams in itertools.groupby(calendar, key=lambda exam: exam[0]):
+        yield f"""
+            <h2>{exam_date_title(date)}</h2>
+            <table>
+                <thead>
+                    <tr>
+                        <th>زمان امتحان</th>
+                        <th>کد درس</th>
+                        <th>نام درس</th>
+                        <th>تعداد کلاس</th>
+                    </tr>
+                </thead>
+                <tbody>
+        """
+        for _, start, end, code, name, positions in exams:
+            yield (f"<tr><td>{format_time(start)} تا {format_time(end)}</td><td>{html.escape(code)}</td>"
+                   f"<td>{html.escape(name)}</td><td>{len(positions)}</td></tr>\n")
+        yield """
+                </tbody>
+            </table>
+        """
+    yield """
+        </div>
+    """
+
+
+def build_exam_index(calendar):
+    """
+    Build the exam data used by the page to filter the exam calendar view.
+
+    Args:
+        calendar (list): Exams as returned by build_exam_calendar.
+
+    Returns:
+        str: JSON object with the date (as its index in the view), start and
+        end of each exam ("exams", in the order of the view), the positions
+        of its classes in the all-courses view ("courses") and the number of
+        dates ("dates"). Safe to embed in a <script>.
+    """
+    dates = {}
+    exams = []
+    for date, start, end, _, _, _ in calendar:
+        exams.append([dates.setdefault(date, len(dates)), start, end])
+    index = {
+        "exams": exams,
+        "courses": [positions for _, _, _, _, _, positions in calendar],
+        "dates": len(dates),
+    }
+    return json.dumps(index, separators=(",", ":"))
+
+
+# Show the exams of the courses matched by the filter, and mark the overlapping ones
+EXAM_FILTER_SCRIPT = """
+    const examIndex = JSON.parse(document.getElementById('examIndex').textContent);
+    let examRows = null;
+    let examDates = null;
+
+    // Exams are sorted by date and start, so an exam overlaps an earlier one
+    // exactly when it starts before the latest end of the earlier exams of its date
+    function filterExams(filtered, matched) {
+        if (examRows === null) {
+            examRows = Array.from(document.querySelectorAll('#examView tbody tr'));
+            examDates = Array.from(document.querySelectorAll('#examView h2'), header =>
+                [header, header.nextElementSibling]);
+        }
+        const visible = new Array(examIndex.dates).fill(0);
+        let date = -1, end = -1, latest = -1;
+        examIndex.exams.forEach(([day, start, stop], i) => {
+            const shown = examIndex.courses[i].some(k => matched[k]);
+            examRows[i].classList.toggle('hidden', !shown);
+            examRows[i].classList.remove('clash');
+            if (!shown) return;
+            visible[day]++;
+            if (filtered && day === date && start < end) {
+                examRows[i].classList.add('clash');
+                examRows[latest].classList.add('clash');
             }
-            .course-group {
-                margin-bottom: 30px;
+            if (day !== date || stop > end) {
+                date = day;
+                end = stop;
+                latest = i;
             }
-            .hidden {
-                display: none !important;
+        });
+        examDates.forEach((elements, day) =>
+            elements.forEach(element => element.style.display = visible[day] ? '' : 'none'));
+    }
+"""
+
+# Find the courses of a filter found nowhere as typed by the trigrams of their
+# name or professor, like fuzzy.TrigramIndex.search
+FUZZY_SEARCH_SCRIPT = """
+    const fuzzyIndex = JSON.parse(document.getElementById('fuzzyIndex').textContent);
+    let fuzzyPostings = null;
+    let fuzzySizes = null;
+
+    // Same trigrams as fuzzy.trigrams
+    function trigrams(text) {
+        const grams = new Set();
+        text.split(' ').forEach(word => {
+            if (!word) return;
+            const padded = '  ' + word + ' ';
+            for (let i = 0; i + 3 <= padded.length; i++) grams.add(padded.slice(i, i + 3));
+        });
+        return grams;
+    }
+
+    // Courses (positions in the all-courses view) whose values best match a normalized filter
+    function fuzzySearch(filter) {
+        if (fuzzyPostings === null) {
+            fuzzyPostings = new Map();
+            fuzzySizes = fuzzyIndex.texts.map((text, id) => {
+                const grams = trigrams(text);
+                grams.forEach(gram => {
+                    if (!fuzzyPostings.has(gram)) fuzzyPostings.set(gram, []);
+                    fuzzyPostings.get(gram).push(id);
+                });
+                return grams.size;
+            });
+        }
+        const grams = trigrams(filter);
+        const shared = new Map();
+        grams.forEach(gram => (fuzzyPostings.get(gram) || []).forEach(id => shared.set(id, (shared.get(id) || 0) + 1)));
+        const ranked = [];
+        shared.forEach((count, id) => {
+            if (count >= fuzzyIndex.min_score * grams.size) {
+                ranked.push([count / grams.size, count / (grams.size + fuzzySizes[id] - count), id]);
             }
-        </style>
-    </head>
-    <body>
-    <h1>لیست دروس ارائه شده</h1>
-    <h3>اخرین بروزرسانی: {date}</h3>
-    <div class="container">
-        <div class="controls">
-            <div class="view-controls">
-                <button class="button active" onclick="switchView('weekly')">نمایش هفتگی</button>
-                <button class="button" onclick="switchView('all')">نمایش همه دروس</button>
-            </div>
-            <div class="filter-controls">
-                <div class="help-text">
-                    برای فیلتر کردن، کد درس یا نام درس یا نام استاد یا کد گروه آموزشي را وارد کنید. برای چندین مورد از خط تیره (-) استفاده کنید.
-                    <br>
-                    مثال: احمدی - 4628101485 - 2110130 - ریاضی
-                </div>
-                <input type="text" id="filterInput" placeholder="فیلتر بر اساس کد یا نام درس یا نام استاد یا کد گروه آموزشی..." oninput="filterCourses()">
-            </div>
-        </div>
+        });
+        ranked.sort((a, b) => b[0] - a[0] || b[1] - a[1] || a[2] - b[2]);
+        const courses = new Set();
+        for (const [, , id] of ranked) {
+            if (courses.size >= fuzzyIndex.limit) break;
+            fuzzyIndex.keys[id].forEach(course => courses.add(course));
+        }
+        return courses;
+    }
 
-        <div id="weeklyView" class="view active">
+    // Courses found by fuzzy search for the filters no course text contains
+    function fuzzyMatches(filters, texts) {
+        const courses = new Set();
+        filters.filter(f => !texts.some(text => text.includes(f)))
+            .forEach(f => fuzzySearch(f).forEach(course => courses.add(course)));
+        return courses;
+    }
+"""
+
+
+def find_exam_clashes(weekly_schedule, table=None, course_codes=None):
     """
-     # HTML content
-    html_content = """
-    <!DOCTYPE html>
-    <html dir="rtl" lang="fa">
-    <head>
-        <meta charset="UTF-8">
-        <title>برنامه کلاس‌ها</title>
-        <style>
+    Find the courses whose exams overlap.
+
+    Args:
+        weekly_schedule (dict): Courses of each weekday, as returned by parse_html_files.
+        table (CourseTable): Table the rows of weekly_schedule refer to, if any.
+        course_codes (iterable): Only check these courses (like the courses a
+            student registers for), instead of every course.
+
+    Returns:
+        dict: Ready to be written as JSON: the checked "courses" (None for
+        all of them), the requested courses that have no exam time or are
+        not offered ("without_exam") and the "clashes", each with the two
+        "courses", their "names" and the "date", "weekday", "start" and
+        "end" of the period both exams share, sorted by date and time.
+    """
+    wanted = None if course_codes is None else set(course_codes)
+    index = ExamIndex()
+    names = {}
+    for courses in weekly_schedule.values():
+        for course in courses if table is None else map(table.__getitem__, courses):
+            if wanted is None or course.course_code in wanted:
+                index.add(course.course_code, course.exam)
+                names.setdefault(course.course_code, course.course_name)
+
+    clashes = []
+    for code, other, date, start, end in index.collisions():
+        first, second = sorted((code, other))
+        clashes.append({
+            "courses": [first, second],
+            "names": [names[first], names[second]],
+            "date": date.strftime("%Y/%m/%d"),
+            "weekday": WEEKDAY_NAMES[date.weekday()],
+            "start": format_time(start),
+            "end": format_time(end),
+        })
+    return {
+        "courses": None if wanted is None else sorted(wanted),
+        "without_exam": [] if wanted is None else sorted(code for code in wanted if code not in index),
+        "clashes": clashes,
+    }
+
+
+# All-courses view of the pages that render their tables with JavaScript
+EMPTY_ALL_VIEW = """
+        </div>
+        <div id="allView" class="view">
+            <h2>تمام دروس</h2>
+            <table>
+                <thead>
+                    <tr>
+                        <th>نام درس</th>
+                        <th>کد درس</th>
+                        <th>زمان کلاس</th>
+                        <th>استاد</th>
+                        <th>تعداد واحد</th>
+                        <th>حداکثر ظرفیت</th>
+                        <th>نام کلاس</th>
+                        <th>مقطع</th>
+                        <th>کد ارائه</th>
+                        <th>زمان امتحان</th>
+                        <th>مکان برگزاری</th>
+                        <th>گروه آموزشي</th>
+                        <th>شماره</th>
+                    </tr>
+                </thead>
+            </table>
+        </div>
+    """
+
+# End of the views and link to the repository, closing the page content
+PAGE_END = """
+        </div>
+    </div>
+    <p dir="ltr" style="text-align: center;">
+    <a href="https://github.com/abolfazlvahed1/AmozeshyarTimetable">View the Repository on GitHub</a>
+    </p>
+
+"""
+
+# Stylesheet of the pages, shared by every render mode
+PAGE_STYLE = """        <style>
             body {
                 font-family: Arial, sans-serif;
                 margin: 20px;
@@ -385,15 +1654,65 @@ def write_schedule_to_file(weekly_schedule, output_file):
             .course-group {
                 margin-bottom: 30px;
             }
+            tr.clash {
+                background-color: #f8d7da;
+            }
             .hidden {
                 display: none !important;
             }
         </style>
-    </head>
+"""
+
+# Switch between the weekly and all-courses views, then reapply the filter
+SWITCH_VIEW_SCRIPT = """    function switchView(viewName) {
+        // Update buttons
+        document.querySelectorAll('.view-controls .button').forEach(btn => {
+            btn.classList.remove('active');
+        });
+        event.target.classList.add('active');
+        
+        // Update views
+        document.querySelectorAll('.view').forEach(view => {
+            view.classList.remove('active');
+        });
+        document.getElementById(viewName + 'View').classList.add('active');
+        
+        // Reapply current filter
+        filterCourses();
+    }
+"""
+
+
+def render_page_start(extra_controls="", exam_view=True, extra_views=()):
+    """
+    Yield the start of the page, up to the content of the weekly view.
+
+    Args:
+        extra_controls (str): HTML added at the end of the controls.
+        exam_view (bool): Add the button of the exam calendar view.
+        extra_views (iterable): (name, title, html) of the views added after
+            the others, whose buttons are added here.
+    """
+    exam_button = """
+                <button class="button" onclick="switchView('exam')">تقویم امتحانات</button>""" if exam_view else ""
+    exam_button += "".join(f"""
+                <button class="button" onclick="switchView('{name}')">{title}</button>""" for name, title, _ in extra_views)
+    date=get_jalali_date()
+
+    # HTML content
+    yield """
+    <!DOCTYPE html>
+    <html dir="rtl" lang="fa">
+    <head>
+        <meta charset="UTF-8">
+        <title>برنامه کلاس‌ها</title>
+"""
+    yield PAGE_STYLE
+    yield """    </head>
     <body>
     <h1>لیست دروس ارائه شده</h1>
     """
-    body_html=f"""
+    yield f"""
 <a href="https://abolfazlvahed1.github.io/" style="
     position: fixed; 
     top: 20px; 
@@ -411,7 +1730,7 @@ def write_schedule_to_file(weekly_schedule, output_file):
         <div class="controls">
             <div class="view-controls">
                 <button class="button active" onclick="switchView('weekly')">نمایش هفتگی</button>
-                <button class="button" onclick="switchView('all')">نمایش همه دروس</button>
+                <button class="button" onclick="switchView('all')">نمایش همه دروس</button>{exam_button}
             </div>
             <div class="filter-controls">
                 <div class="help-text">
@@ -419,22 +1738,50 @@ def write_schedule_to_file(weekly_schedule, output_file):
                     <br>
                     مثال: احمدی - 4628101485 - 2110130 - ریاضی
                 </div>
-                <input type="text" id="filterInput" placeholder="فیلتر بر اساس کد یا نام درس یا نام استاد یا کد گروه آموزشی..." oninput="filterCourses()">
-            </div>
+                <input type="text" id="filterInput" placeholder="فیلتر بر اساس کد یا نام درس یا نام استاد یا کد گروه آموزشی..." oninput="scheduleFilter()">
+            </div>{extra_controls}
         </div>
 
         <div id="weeklyView" class="view active">
     """
-    html_content = html_content+body_html
+
+
+def render_schedule(weekly_schedule, table=None, extra_views=()):
+    """
+    Render the weekly schedule as an HTML document, chunk by chunk.
+
+    Each view is rendered in a single pass over the courses and the document
+    is never held in memory as a whole.
+
+    Args:
+        weekly_schedule (dict): Courses of each weekday, as returned by parse_html_files.
+        table (CourseTable): If given, weekly_schedule holds row indexes of this
+            table (as returned by CourseTable.group_by_weekday) and each row is
+            only turned into a Course while it is rendered.
+        extra_views (list): (name, title, html) of views added after the
+            others, like the occupancy view of analytics.py.
+
+    Yields:
+        str: Consecutive chunks of the HTML document.
+    """
+    def courses_of(rows):
+        return rows if table is None else map(table.__getitem__, rows)
+
+    # Create all-courses view (sorted by name)
+    all_courses, order = sort_by_name(weekly_schedule, table)
+    search_index = build_search_index(weekly_schedule, courses_of(all_courses), order)
+    exam_calendar = build_exam_calendar(courses_of(all_courses))
+
+    yield from render_page_start(extra_views=extra_views)
 
     # Add weekly view content
     for day, courses in weekly_schedule.items():
         if courses:
-            html_content += f"<h2>{day}</h2>\n"
-            html_content += create_table(courses)
+            yield f"<h2>{day}</h2>\n"
+            yield from create_table(courses_of(courses))
 
     # Add all courses view
-    html_content += """
+    yield """
         </div>
         <div id="allView" class="view">
             <h2>تمام دروس</h2>
@@ -461,111 +1808,745 @@ def write_schedule_to_file(weekly_schedule, output_file):
     """
 
     # Add all courses in one table
-    i=1
-    for course in all_courses:
-        html_content += f"""
+    for i, course in enumerate(courses_of(all_courses), 1):
+        yield f"""
             <tr>
-                <td>{course['course_name']}</td>
-                <td>{course['course_code']}</td>
-                <td>{course['day_time']}</td>
-                <td>{course['professor']}</td>
-                <td>{course['total_units']}</td>
-                <td>{course['capacity']}</td>
-                <td>{course['class_name']}</td>
-                <td>{course['section']}</td>
-                <td>{course['class_code']}</td>
-                <td>{course['exam']}</td>
-                <td>{course['place']}</td>
-                <td>{course['group_code']}</td>
+                <td>{course.course_name}</td>
+                <td>{course.course_code}</td>
+                <td>{course.day_time}</td>
+                <td>{course.professor}</td>
+                <td>{course.total_units}</td>
+                <td>{course.capacity}</td>
+                <td>{course.class_name}</td>
+                <td>{course.section}</td>
+                <td>{course.class_code}</td>
+                <td>{course.exam}</td>
+                <td>{course.place}</td>
+                <td>{course.group_code}</td>
                 <td>{i}</td>
             </tr>
         """
-        i+=1
 
-    html_content += """
+    yield """
                 </tbody>
             </table>
         </div>
     """
+    yield from render_exam_view(exam_calendar)
+    for _, _, view in extra_views:
+        yield view
+
+    # Add the search index and JavaScript for functionality
+    yield PAGE_END
+    yield '<script type="application/json" id="searchIndex">'
+    yield search_index
+    yield '</script>\n<script type="application/json" id="examIndex">'
+    yield build_exam_index(exam_calendar)
+    yield '</script>\n<script type="application/json" id="fuzzyIndex">'
+    yield build_fuzzy_index(courses_of(all_courses))
+    yield "</script>\n<script>\n"
+    yield SWITCH_VIEW_SCRIPT
+    yield EXAM_FILTER_SCRIPT
+    yield FUZZY_SEARCH_SCRIPT
+    yield """
+    // Normalized text of each course, built with the page
+    const searchIndex = JSON.parse(document.getElementById('searchIndex').textContent);
+    const searchChars = new RegExp('[' + Object.keys(searchIndex.chars).join('') + ']', 'g');
+    let searchState = null;
+    let filterTimer = null;
 
+    // Same steps as normalize_search_text in script.py
+    function normalizeSearchText(text) {
+        return text.replace(searchChars, c => searchIndex.chars[c])
+            .toLowerCase().replace(/\\s+/g, ' ').trim();
+    }
 
+    // Look up the rows of each course once, on the first filter
+    function getSearchState() {
+        if (searchState === null) {
+            const allRows = document.querySelectorAll('#allView table tbody tr');
+            const rows = searchIndex.text.map((text, i) => [allRows[i]]);
+            const days = [];
+            document.querySelectorAll('#weeklyView h2').forEach((header, day) => {
+                const table = header.nextElementSibling;
+                const courses = searchIndex.days[day];
+                table.querySelectorAll('tr:not(:first-child)').forEach((row, i) => {
+                    rows[courses[i]].push(row);
+                    rows[courses[i]].day = day;
+                });
+                days.push({header: header, table: table, visible: courses.length});
+            });
+            searchState = {
+                filter: '',
+                rows: rows,
+                days: days,
+                matched: new Array(searchIndex.text.length).fill(true),
+            };
+        }
+        return searchState;
+    }
 
+    function scheduleFilter() {
+        clearTimeout(filterTimer);
+        filterTimer = setTimeout(filterCourses, searchIndex.delay);
+    }
 
-    # Add JavaScript for functionality
-    html_content += """
-        </div>
-    </div>
-    <p dir="ltr" style="text-align: center;">
-    <a href="https://github.com/abolfazlvahed1/AmozeshyarTimetable">View the Repository on GitHub</a>
-    </p>
+    function filterCourses() {
+        clearTimeout(filterTimer);
+        const filters = document.getElementById('filterInput').value.split('-')
+            .map(normalizeSearchText).filter(f => f);
+        const state = getSearchState();
+        const filter = filters.join('-');
+        if (filter === state.filter) return;
+        state.filter = filter;
 
-<script>
-    function switchView(viewName) {
-        // Update buttons
-        document.querySelectorAll('.view-controls .button').forEach(btn => {
-            btn.classList.remove('active');
+        // Toggle only the rows of the courses whose state changes
+        const changedDays = new Set();
+        const fuzzy = fuzzyMatches(filters, searchIndex.text);
+        searchIndex.text.forEach((text, i) => {
+            const matched = filters.length === 0 || filters.some(f => text.includes(f)) || fuzzy.has(i);
+            if (matched === state.matched[i]) return;
+            state.matched[i] = matched;
+            const rows = state.rows[i];
+            rows.forEach(row => row.classList.toggle('hidden', !matched));
+            if (rows.day !== undefined) {
+                state.days[rows.day].visible += matched ? 1 : -1;
+                changedDays.add(rows.day);
+            }
         });
-        event.target.classList.add('active');
-        
-        // Update views
-        document.querySelectorAll('.view').forEach(view => {
-            view.classList.remove('active');
+
+        // Hide empty day sections
+        changedDays.forEach(day => {
+            const {header, table, visible} = state.days[day];
+            header.style.display = visible > 0 ? '' : 'none';
+            table.style.display = visible > 0 ? '' : 'none';
         });
-        document.getElementById(viewName + 'View').classList.add('active');
-        
-        // Reapply current filter
-        filterCourses();
+        filterExams(filters.length > 0, state.matched);
+    }
+</script>
+
+    </body>
+    </html>
+    """
+
+
+def build_course_data(weekly_schedule, all_courses, order):
+    """
+    Build the course data of a page rendered by render_schedule_data.
+
+    Each course is written once, as indexes into a table of the distinct cell
+    values, instead of as table rows in both views.
+
+    Args:
+        weekly_schedule (dict): Courses (or row indexes) of each weekday.
+        all_courses (iterable): Courses in the order of the all-courses view.
+        order (list): Positions of all_courses in weekly_schedule, see sort_by_name.
+
+    Returns:
+        str: JSON object with the HTML-escaped distinct values ("strings"), the
+        value of each cell of the all-courses view, row after row ("cells",
+        "fields" per row), the normalized search text of the values that
+        differ from it ("search"), the courses of each shown weekday ("days",
+        as row numbers) and the filter settings ("chars", "delay"). Safe to
+        embed in a <script>.
+    """
+    strings = {}  # Value -> index in the string table
+    cells = []
+    for course in all_courses:
+        for field in DISPLAY_FIELDS:
+            value = str(getattr(course, field))
+            code = strings.get(value)
+            if code is None:
+                code = strings[value] = len(strings)
+            cells.append(code)
+
+    escaped = [html.escape(value, quote=False) for value in strings]
+    search = {}
+    for value, code in strings.items():
+        text = normalize_search_text(value)
+        if text != escaped[code]:
+            search[code] = text
+
+    data = {
+        "strings": escaped,
+        "fields": len(DISPLAY_FIELDS),
+        "cells": cells,
+        "search": search,
+        "days": weekly_positions(weekly_schedule, order),
+        "chars": SEARCH_CHARS,
+        "delay": SEARCH_DEBOUNCE_MS,
+    }
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+
+
+def render_schedule_data(weekly_schedule, table=None, extra_views=()):
+    """
+    Render the weekly schedule as a page that builds its tables from data.
+
+    The courses are embedded once as compact JSON (see build_course_data) and
+    the page renders both views from it, keeping only the rows around the
+    visible part of each table in the DOM. The page looks and filters like
+    the one from render_schedule.
+
+    Args:
+        weekly_schedule (dict): Courses of each weekday, as returned by parse_html_files.
+        table (CourseTable): Table the rows of weekly_schedule refer to, see
+            render_schedule.
+        extra_views (list): Views added after the others, see render_schedule.
+
+    Yields:
+        str: Consecutive chunks of the HTML document.
+    """
+    def courses_of(rows):
+        return rows if table is None else map(table.__getitem__, rows)
+
+    all_courses, order = sort_by_name(weekly_schedule, table)
+    course_data = build_course_data(weekly_schedule, courses_of(all_courses), order)
+    exam_calendar = build_exam_calendar(courses_of(all_courses))
+
+    yield from render_page_start(extra_views=extra_views)
+
+    # Empty tables, filled by the page
+    for day, courses in weekly_schedule.items():
+        if courses:
+            yield f"<h2>{day}</h2>\n"
+            yield from create_table(())
+
+    yield EMPTY_ALL_VIEW
+    yield from render_exam_view(exam_calendar)
+    for _, _, view in extra_views:
+        yield view
+
+    # Add the course data and JavaScript for functionality
+    yield PAGE_END
+    yield '<script type="application/json" id="courseData">'
+    yield course_data
+    yield '</script>\n<script type="application/json" id="examIndex">'
+    yield build_exam_index(exam_calendar)
+    yield '</script>\n<script type="application/json" id="fuzzyIndex">'
+    yield build_fuzzy_index(courses_of(all_courses))
+    yield "</script>\n<script>\n"
+    yield SWITCH_VIEW_SCRIPT
+    yield EXAM_FILTER_SCRIPT
+    yield FUZZY_SEARCH_SCRIPT
+    yield """
+    const courseData = JSON.parse(document.getElementById('courseData').textContent);
+    const fieldCount = courseData.fields;
+    const courseCount = courseData.cells.length / fieldCount;
+    const searchChars = new RegExp('[' + Object.keys(courseData.chars).join('') + ']', 'g');
+    const OVERSCAN = 10;  // Rows rendered above and below the visible ones
+    let rowHeight = 45;  // Estimated height of a row, measured on the first render
+    let rowHeightMeasured = false;
+    let currentFilter = null;
+    let filterTimer = null;
+    let updatePending = false;
+
+    // Same steps as normalize_search_text in script.py
+    function normalizeSearchText(text) {
+        return text.replace(searchChars, c => courseData.chars[c])
+            .toLowerCase().replace(/\\s+/g, ' ').trim();
+    }
+
+    // Search text of each course, joined from the normalized values
+    const searchText = [];
+    for (let i = 0; i < courseCount; i++) {
+        const parts = [];
+        for (let j = i * fieldCount; j < (i + 1) * fieldCount; j++) {
+            const code = courseData.cells[j];
+            parts.push(code in courseData.search ? courseData.search[code] : courseData.strings[code]);
+        }
+        searchText.push(parts.join(' | '));
+    }
+
+    function courseCells(i) {
+        let cells = '';
+        for (let j = i * fieldCount; j < (i + 1) * fieldCount; j++) {
+            cells += '<td>' + courseData.strings[courseData.cells[j]] + '</td>';
+        }
+        return cells;
+    }
+
+    function spacerRow(height) {
+        return '<tr><td colspan="13" style="height: ' + height + 'px; padding: 0; border: none;"></td></tr>';
+    }
+
+    // Table body holding only the rows around the visible part of the table
+    class WindowedTable {
+        constructor(table, renderRow, section) {
+            this.body = table.createTBody();
+            this.renderRow = renderRow;
+            this.section = section;  // Elements hidden when no course matches
+            this.rows = [];
+            this.first = this.last = -1;
+        }
+
+        setRows(rows) {
+            this.rows = rows;
+            this.first = this.last = -1;
+            this.section.forEach(element => element.style.display = rows.length ? '' : 'none');
+        }
+
+        update() {
+            const count = this.rows.length;
+            let first = 0, last = 0;
+            if (count && this.body.offsetParent !== null) {
+                const top = this.body.getBoundingClientRect().top;
+                // Start on an even row so the striping does not move while scrolling
+                first = Math.min(count, Math.max(0, Math.floor(-top / rowHeight) - OVERSCAN)) & ~1;
+                last = Math.min(count, Math.max(first, Math.ceil((window.innerHeight - top) / rowHeight) + OVERSCAN));
+            }
+            if (first === this.first && last === this.last) return;
+            this.first = first;
+            this.last = last;
+
+            let html = spacerRow(first * rowHeight);
+            for (let k = first; k < last; k++) {
+                html += this.renderRow(this.rows[k]);
+            }
+            this.body.innerHTML = html + spacerRow((count - last) * rowHeight);
+
+            if (!rowHeightMeasured && last - first >= OVERSCAN) {
+                rowHeightMeasured = true;
+                rowHeight = (this.body.offsetHeight - (count - last + first) * rowHeight) / (last - first);
+                tables.forEach(table => table.first = table.last = -1);
+                updateWindows();
+            }
+        }
+    }
+
+    const allCourses = Array.from({length: courseCount}, (_, i) => i);
+    const weeklyTables = Array.from(document.querySelectorAll('#weeklyView table'), table =>
+        new WindowedTable(table, i => '<tr>' + courseCells(i) + '</tr>', [table.previousElementSibling, table]));
+    const allTable = new WindowedTable(document.querySelector('#allView table'),
+        i => '<tr>' + courseCells(i) + '<td>' + (i + 1) + '</td></tr>', []);
+    const tables = [...weeklyTables, allTable];
+
+    // Tables are updated in document order, as each one moves the next ones
+    function updateWindows() {
+        tables.forEach(table => table.update());
+    }
+
+    function scheduleUpdate() {
+        if (updatePending) return;
+        updatePending = true;
+        requestAnimationFrame(() => {
+            updatePending = false;
+            updateWindows();
+        });
+    }
+
+    function scheduleFilter() {
+        clearTimeout(filterTimer);
+        filterTimer = setTimeout(filterCourses, courseData.delay);
     }
 
     function filterCourses() {
-        const filterValue = document.getElementById('filterInput').value.trim();
-        const filters = filterValue.split('-').map(f => f.trim()).filter(f => f);
-        
-        // Function to check if course matches any filter
-        const matchesCourse = (courseRow) => {
-            if (filters.length === 0) return true;
-            const text = courseRow.textContent.toLowerCase();
-            return filters.some(filter => 
-                text.includes(filter.toLowerCase())
-            );
-        };
-
-        // Apply filter to active view
-        const activeView = document.querySelector('.view.active');
-        
-        if (activeView.id === 'weeklyView') {
-            // Filter weekly view
-            activeView.querySelectorAll('tr:not(:first-child)').forEach(row => {
-                row.classList.toggle('hidden', !matchesCourse(row));
-            });
-            
-            // Hide empty day sections
-            activeView.querySelectorAll('h2').forEach(header => {
-                const table = header.nextElementSibling;
-                const visibleRows = table.querySelectorAll('tr:not(.hidden)').length - 1; // -1 for header row
-                header.style.display = visibleRows > 0 ? '' : 'none';
-                table.style.display = visibleRows > 0 ? '' : 'none';
+        clearTimeout(filterTimer);
+        const filters = document.getElementById('filterInput').value.split('-')
+            .map(normalizeSearchText).filter(f => f);
+        const filter = filters.join('-');
+        if (filter !== currentFilter) {
+            currentFilter = filter;
+            const fuzzy = fuzzyMatches(filters, searchText);
+            const matched = searchText.map((text, i) =>
+                filters.length === 0 || filters.some(f => text.includes(f)) || fuzzy.has(i));
+            const keep = rows => rows.filter(i => matched[i]);
+            weeklyTables.forEach((table, day) => table.setRows(keep(courseData.days[day])));
+            allTable.setRows(keep(allCourses));
+            filterExams(filters.length > 0, matched);
+        }
+        updateWindows();
+    }
+
+    window.addEventListener('scroll', scheduleUpdate, {passive: true});
+    window.addEventListener('resize', scheduleUpdate);
+    filterCourses();
+</script>
+
+    </body>
+    </html>
+    """
+
+
+# Folder of the shards, inside the output folder of the sharded mode
+SHARDS_FOLDER = "shards"
+
+
+def shard_schedules(weekly_schedule, table=None):
+    """
+    Split the weekly schedule into the schedules of each group and each weekday.
+
+    Args:
+        weekly_schedule (dict): Courses of each weekday, as returned by parse_html_files.
+        table (CourseTable): Table the rows of weekly_schedule refer to, if any.
+
+    Returns:
+        list: (kind, name, schedule) for each shard, kind being "group" or
+        "day", with the groups in the order they first appear. Each schedule
+        holds the courses (not row indexes) of each of its weekdays.
+    """
+    groups = {}
+    shards = []
+    for day, courses in weekly_schedule.items():
+        if not courses:
+            continue
+        if table is not None:
+            courses = [table[index] for index in courses]
+        shards.append(("day", day, {day: courses}))
+        for course in courses:
+            groups.setdefault(course.group_code, {}).setdefault(day, []).append(course)
+    return [("group", group, schedule) for group, schedule in groups.items()] + shards
+
+
+def write_shard(folder_path, kind, weekly_schedule):
+    """
+    Write the course data of a shard, named after its content.
+
+    The data is that of a page rendered by render_schedule_data (see
+    build_course_data). A shard whose content did not change keeps its file
+    name and is not written again.
+
+    Args:
+        folder_path (str): Folder of the shards.
+        kind (str): "group" or "day", the start of the file name.
+        weekly_schedule (dict): Courses of each weekday of the shard.
+
+    Returns:
+        str: File name of the shard.
+    """
+    data = build_course_data(weekly_schedule, *sort_by_name(weekly_schedule)).encode("utf-8")
+    file_name = f"{kind}-{hashlib.sha256(data).hexdigest()[:16]}.json"
+    file_path = os.path.join(folder_path, file_name)
+    if not os.path.exists(file_path):
+        temp_path = f"{file_path}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, file_path)
+    return file_name
+
+
+def render_schedule_shards(manifest, extra_views=()):
+    """
+    Render the index page of a sharded schedule.
+
+    The page only holds the list of the shards: it loads the shard of the
+    selected group or day when it is chosen (or every day when the filter is
+    used with none selected), and renders its tables like the page from
+    render_schedule_data.
+
+    Args:
+        manifest (dict): "groups" and "days", each a list of shards with
+            their "name", course "count", non-empty weekdays ("days") and
+            "file" path, relative to the page.
+        extra_views (list): Views added after the others, see render_schedule.
+
+    Yields:
+        str: Consecutive chunks of the HTML document.
+    """
+    def options(shards, label):
+        yield f'<option value="">{label}</option>'
+        for index, shard in enumerate(shards):
+            yield f'<option value="{index}">{html.escape(shard["name"])} ({shard["count"]})</option>'
+
+    group_options = "".join(options(manifest["groups"], "همه گروه‌های آموزشی"))
+    day_options = "".join(options(manifest["days"], "همه روزها"))
+    yield from render_page_start(exam_view=False, extra_views=extra_views, extra_controls=f"""
+            <div class="filter-controls">
+                <select id="groupSelect" onchange="showCourses()">{group_options}</select>
+                <select id="daySelect" onchange="showCourses()">{day_options}</select>
+                <div class="help-text" id="shardStatus"></div>
+            </div>""")
+
+    # Empty tables, filled by the page
+    for shard in manifest["days"]:
+        yield f"<h2>{html.escape(shard['name'])}</h2>\n"
+        yield from create_table(())
+
+    yield EMPTY_ALL_VIEW
+    for _, _, view in extra_views:
+        yield view
+
+    index = dict(manifest, chars=SEARCH_CHARS, delay=SEARCH_DEBOUNCE_MS)
+    yield PAGE_END
+    yield '<script type="application/json" id="shardIndex">'
+    yield json.dumps(index, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+    yield "</script>\n<script>\n"
+    yield SWITCH_VIEW_SCRIPT
+    yield """
+    const shardIndex = JSON.parse(document.getElementById('shardIndex').textContent);
+    const searchChars = new RegExp('[' + Object.keys(shardIndex.chars).join('') + ']', 'g');
+    const shardCache = new Map();  // File -> promise of the loaded shard
+    let filterTimer = null;
+    let showCount = 0;
+
+    // Same steps as normalize_search_text in script.py
+    function normalizeSearchText(text) {
+        return text.replace(searchChars, c => shardIndex.chars[c])
+            .toLowerCase().replace(/\\s+/g, ' ').trim();
+    }
+
+    // Course data of a shard (see build_course_data), with the search text of each course
+    function loadShard(shard) {
+        if (!shardCache.has(shard.file)) {
+            const loading = fetch(shard.file).then(response => {
+                if (!response.ok) throw new Error(response.status);
+                return response.json();
+            }).then(data => {
+                const count = data.cells.length / data.fields;
+                const searchText = [];
+                for (let i = 0; i < count; i++) {
+                    const parts = [];
+                    for (let j = i * data.fields; j < (i + 1) * data.fields; j++) {
+                        const code = data.cells[j];
+                        parts.push(code in data.search ? data.search[code] : data.strings[code]);
+                    }
+                    searchText.push(parts.join(' | '));
+                }
+                const days = {};
+                shard.days.forEach((name, k) => days[name] = data.days[k]);
+                return {data, count, searchText, days};
             });
-        } else if (activeView.id === 'allView') {
-            // Filter all courses view
-            const rows = activeView.querySelectorAll('table tbody tr');
-            rows.forEach(row => {
-                row.classList.toggle('hidden', !matchesCourse(row));
+            loading.catch(() => shardCache.delete(shard.file));  // Try again next time
+            shardCache.set(shard.file, loading);
+        }
+        return shardCache.get(shard.file);
+    }
+
+    function courseCells(shard, i) {
+        const data = shard.data;
+        let cells = '';
+        for (let j = i * data.fields; j < (i + 1) * data.fields; j++) {
+            cells += '<td>' + data.strings[data.cells[j]] + '</td>';
+        }
+        return cells;
+    }
+
+    function courseName(shard, i) {
+        return shard.data.strings[shard.data.cells[i * shard.data.fields]];
+    }
+
+    const weeklyTables = Array.from(document.querySelectorAll('#weeklyView table'), (table, k) =>
+        ({name: shardIndex.days[k].name, body: table.createTBody(), section: [table.previousElementSibling, table]}));
+    const allBody = document.querySelector('#allView table').createTBody();
+
+    function scheduleFilter() {
+        clearTimeout(filterTimer);
+        filterTimer = setTimeout(showCourses, shardIndex.delay);
+    }
+
+    async function showCourses() {
+        clearTimeout(filterTimer);
+        const id = ++showCount;
+        const group = document.getElementById('groupSelect').value;
+        const day = document.getElementById('daySelect').value;
+        const filters = document.getElementById('filterInput').value.split('-')
+            .map(normalizeSearchText).filter(f => f);
+        const status = document.getElementById('shardStatus');
+
+        // The shard of the group, or of the day, or every day to search all the courses
+        let needed = [];
+        if (group !== '') needed = [shardIndex.groups[group]];
+        else if (day !== '') needed = [shardIndex.days[day]];
+        else if (filters.length) needed = shardIndex.days;
+        status.textContent = needed.length ? 'در حال بارگذاری...'
+            : 'برای نمایش دروس، یک گروه آموزشی یا روز را انتخاب کنید یا عبارتی را جستجو کنید.';
+        let shards;
+        try {
+            shards = await Promise.all(needed.map(loadShard));
+        } catch (error) {
+            if (id === showCount) status.textContent = 'بارگذاری دروس ممکن نشد.';
+            return;
+        }
+        if (id !== showCount) return;  // Replaced by a newer selection
+
+        const dayName = day === '' ? null : shardIndex.days[day].name;
+        const matches = (shard, i) => filters.length === 0 || filters.some(f => shard.searchText[i].includes(f));
+        weeklyTables.forEach(table => {
+            let rows = '';
+            if (dayName === null || dayName === table.name) {
+                shards.forEach(shard => (shard.days[table.name] || []).forEach(i => {
+                    if (matches(shard, i)) rows += '<tr>' + courseCells(shard, i) + '</tr>';
+                }));
+            }
+            table.body.innerHTML = rows;
+            table.section.forEach(element => element.style.display = rows ? '' : 'none');
+        });
+
+        // Courses of the all-courses view, sorted by name as in the shards
+        const courses = [];
+        shards.forEach(shard => {
+            const rows = dayName === null ? Array.from({length: shard.count}, (_, i) => i) : shard.days[dayName] || [];
+            rows.forEach(i => { if (matches(shard, i)) courses.push([shard, i]); });
+        });
+        if (shards.length > 1) {
+            courses.sort((a, b) => {
+                const nameA = courseName(...a), nameB = courseName(...b);
+                return nameA < nameB ? -1 : nameA > nameB ? 1 : 0;
             });
         }
+        allBody.innerHTML = courses.map(([shard, i], k) =>
+            '<tr>' + courseCells(shard, i) + '<td>' + (k + 1) + '</td></tr>').join('');
+        if (needed.length) status.textContent = courses.length + ' درس';
     }
+
+    showCourses();
 </script>
 
     </body>
     </html>
     """
 
-    with open(f"{output_file}.html", "w", encoding="utf-8") as file:
-        file.write(html_content)
+
+def write_schedule_shards(weekly_schedule, folder_path, table=None, workers=1, extra_views=(), minify=False,
+                          compress=False):
+    """
+    Write the weekly schedule as an index page and one shard per group and weekday.
+
+    The shards are written in parallel to folder_path/shards/ (see
+    write_shard), then the index page replaces folder_path/index.html and the
+    shards it no longer lists are removed. Shards that did not change keep
+    their file name, so they stay cached by browsers and static hosts.
+
+    Args:
+        weekly_schedule (dict): Courses of each weekday, as returned by parse_html_files.
+        folder_path (str): Output folder, created if needed.
+        table (CourseTable): Table the rows of weekly_schedule refer to, if any.
+        workers (int): Number of processes writing the shards.
+        extra_views (list): Views added to the index page, see render_schedule.
+        minify (bool): Minify the index page, see artifacts.minify_html.
+        compress (bool): Also write the compressed copies of the index page and
+            the shards, and folder_path/manifest.json (see artifacts.compress_files).
+
+    Returns:
+        dict: The manifest of the files, if compress is set.
+    """
+    shards_path = os.path.join(folder_path, SHARDS_FOLDER)
+    os.makedirs(shards_path, exist_ok=True)
+    shards = shard_schedules(weekly_schedule, table)
+
+    write = partial(write_shard, shards_path)
+    kinds, names, schedules = zip(*shards) if shards else ((), (), ())
+    if workers and workers > 1 and len(shards) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            file_names = list(executor.map(write, kinds, schedules))
+    else:
+        file_names = list(map(write, kinds, schedules))
+
+    manifest = {"groups": [], "days": []}
+    for kind, name, schedule, file_name in zip(kinds, names, schedules, file_names):
+        manifest[f"{kind}s"].append({
+            "name": name,
+            "count": sum(map(len, schedule.values())),
+            "days": list(schedule),
+            "file": f"{SHARDS_FOLDER}/{file_name}",
+        })
+
+    index_path = os.path.join(folder_path, "index.html")
+    chunks = render_schedule_shards(manifest, extra_views)
+    with open(f"{index_path}.tmp", "w", encoding="utf-8", buffering=OUTPUT_BUFFER_SIZE) as file:
+        file.writelines(minify_html(chunks) if minify else chunks)
+    os.replace(f"{index_path}.tmp", index_path)
+
+    # Remove the shards of the previous runs and their compressed copies, once the new index no longer refers to them
+    for file_name in os.listdir(shards_path):
+        shard_name, extension, _ = file_name.partition(".json")
+        if extension and shard_name + extension not in file_names:
+            os.remove(os.path.join(shards_path, file_name))
+
+    shard_paths = [os.path.join(shards_path, file_name) for file_name in file_names]
+    manifest_path = os.path.join(folder_path, "manifest.json")
+    if compress:
+        return compress_files([index_path] + shard_paths, folder_path, workers=workers,
+                              manifest_path=manifest_path, immutable=shard_paths)
+    for path in [index_path] + shard_paths:
+        remove_compressed(path)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(manifest_path)
+    return None
+
+
+def write_schedule_to_file(weekly_schedule, output_file, table=None, render="static", workers=1,
+                           profiler=NULL_PROFILER, extra_views=(), minify=False, compress=False):
+    """
+    Write the weekly schedule to HTML file with advanced features.
+
+    The document is streamed from render_schedule (or render_schedule_data)
+    through a buffered file handle, to a temporary file that then replaces
+    the output file.
+
+    Args:
+        weekly_schedule (dict): Courses of each weekday, as returned by parse_html_files.
+        output_file (str): Output file name without the .html extension, or "-"
+            to write the document to stdout. With render="shards", the output folder.
+        table (CourseTable): Table the rows of weekly_schedule refer to, see
+            render_schedule.
+        render (str): "static" to write every row as HTML, "data" to write
+            the courses once as data rendered by the page, or "shards" to
+            write them to files loaded by an index page, see
+            write_schedule_shards (see RENDER_MODES).
+        workers (int): Number of processes writing the shards and compressing the files.
+        profiler (Profiler): Receives the timings of the stages, see profiler.py.
+            When profiling, the document is rendered in memory before it is
+            written, to time both separately.
+        extra_views (list): Views added after the others, see render_schedule.
+        minify (bool): Remove the whitespace browsers do not show, see
+            artifacts.minify_html.
+        compress (bool): Also write the .gz and .br copies of the output files
+            and a manifest of their sizes and hashes, output_file.manifest.json
+            (manifest.json in the folder of the shards). Without it, the copies
+            left by a previous run are removed, so they are not served
+            instead of the new page.
+
+    Returns:
+        dict: The manifest of the files, see artifacts.compress_files, if
+        compress is set.
+
+    Raises:
+        ValueError: If shards or compressed copies are written to stdout.
+    """
+    if output_file == "-" and (render == "shards" or compress):
+        raise ValueError("shards and compressed copies cannot be written to stdout")
+    if render == "shards":
+        with profiler.stage("render shards"):
+            return write_schedule_shards(weekly_schedule, output_file, table=table, workers=workers,
+                                         extra_views=extra_views, minify=minify, compress=compress)
+
+    renderer = render_schedule_data if render == "data" else render_schedule
+    chunks = renderer(weekly_schedule, table, extra_views)
+    if minify:
+        chunks = minify_html(chunks)
+    if profiler.enabled:
+        with profiler.stage("render"):
+            chunks = list(chunks)
+        profiler.count("output bytes", sum(len(chunk.encode("utf-8")) for chunk in chunks))
+
+    with profiler.stage("write"):
+        if output_file == "-":
+            sys.stdout.flush()
+            stream = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+            stream.writelines(chunks)
+            stream.flush()
+            stream.detach()  # Leave sys.stdout usable
+            return
+
+        # Write next to the page and rename it over, so it is never seen half-written
+        temp_path = f"{output_file}.html.tmp"
+        with open(temp_path, "w", encoding="utf-8", buffering=OUTPUT_BUFFER_SIZE) as file:
+            file.writelines(chunks)
+        os.replace(temp_path, f"{output_file}.html")
+
+    if not compress:
+        remove_compressed(f"{output_file}.html")
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(f"{output_file}.manifest.json")
+        return None
+    with profiler.stage("compress"):
+        return compress_files([f"{output_file}.html"], os.path.dirname(os.path.abspath(output_file)),
+                              workers=workers, manifest_path=f"{output_file}.manifest.json")
 
 def create_table(courses):
-    """Helper function to create HTML table for courses."""
-    return f"""
+    """Helper generator yielding the HTML table for courses in chunks."""
+    yield """
     <table>
         <tr>
             <th>نام درس</th>
@@ -581,33 +2562,248 @@ def create_table(courses):
             <th>مکان برگزاری</th>
             <th>گروه آموزشي</th>
         </tr>
-        {''.join(f"""
+        """
+    for course in courses:
+        yield f"""
         <tr>
-            <td>{course['course_name']}</td>
-            <td>{course['course_code']}</td>
-            <td>{course['day_time']}</td>
-            <td>{course['professor']}</td>
-            <td>{course['total_units']}</td>
-            <td>{course['capacity']}</td>
-            <td>{course['class_name']}</td>
-            <td>{course['section']}</td>
-            <td>{course['class_code']}</td>
-            <td>{course['exam']}</td>
-            <td>{course['place']}</td>
-            <td>{course['group_code']}</td>
+            <td>{course.course_name}</td>
+            <td>{course.course_code}</td>
+            <td>{course.day_time}</td>
+            <td>{course.professor}</td>
+            <td>{course.total_units}</td>
+            <td>{course.capacity}</td>
+            <td>{course.class_name}</td>
+            <td>{course.section}</td>
+            <td>{course.class_code}</td>
+            <td>{course.exam}</td>
+            <td>{course.place}</td>
+            <td>{course.group_code}</td>
         </tr>
-        """ for course in courses)}
+        """
+    yield """
     </table>
     """
 
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the course timetable from Amozeshyar HTML pages.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of processes used to parse the HTML files (default: number of cores)")
+    parser.add_argument("--parser", choices=PARSERS, default="stream",
+                        help="how the course table is extracted from each page (default: stream)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="parse every file instead of reusing the rows cached in .timetable-cache/")
+    parser.add_argument("--columnar", action="store_true",
+                        help="keep the courses in a columnar table instead of one object per course")
+    parser.add_argument("--render", choices=RENDER_MODES, default="static",
+                        help="write every row as HTML (static), the courses once as data "
+                             "that the page renders as it is scrolled (data), or an index.html in the "
+                             "output folder loading one file per group or weekday (shards) (default: static)")
+    parser.add_argument("--dedup", choices=DEDUP_POLICIES, default="flag",
+                        help="how a class found in several files is handled: report the rows that differ "
+                             "and keep them (flag), merge them with the values of the newest file "
+                             "(latest), or keep every row (off) (default: flag)")
+    parser.add_argument("--snapshot", metavar="PATH",
+                        help="also write the parsed courses to a binary snapshot file")
+    parser.add_argument("--from-snapshot", metavar="PATH",
+                        help="read the courses from a snapshot file instead of parsing the HTML files")
+    parser.add_argument("--urls", metavar="FILE",
+                        help="download the pages listed in FILE (one URL per line) and parse each one as it "
+                             "arrives, instead of reading the HTML files")
+    parser.add_argument("--max-pending", type=int, metavar="N",
+                        help="with --urls, most pages downloaded but not parsed yet (default: twice the workers)")
+    parser.add_argument("--sqlite", metavar="PATH",
+                        help="also export the courses, class times, exams, professors and places to a SQLite "
+                             "database, updating the classes of a previous export")
+    parser.add_argument("--exam-clashes", metavar="PATH",
+                        help="also write the courses whose exams overlap to a JSON file")
+    parser.add_argument("--exam-courses", metavar="CODE", nargs="+",
+                        help="with --exam-clashes, only check these course codes")
+    parser.add_argument("--history", metavar="PATH",
+                        help="also append the parsed courses to a history file and add the classes changed "
+                             "since the previous run to the page")
+    parser.add_argument("--analytics", metavar="FOLDER",
+                        help="also write the occupancy of the places, classes and professors to FOLDER "
+                             "(JSON and CSV) and add its heatmaps to the page (requires NumPy)")
+    parser.add_argument("--minify", action="store_true",
+                        help="remove the indentation and the other whitespace browsers do not show from the page")
+    parser.add_argument("--compress", action="store_true",
+                        help="also write .gz and .br (requires brotli) copies of the output files, for web servers "
+                             "serving precompressed files, and a manifest of their sizes and hashes")
+    parser.add_argument("--output", default="schedule_output",
+                        help="output file name without the .html extension (folder with --render shards), "
+                             "or - for stdout (default: schedule_output)")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and write the schedule again whenever the HTML files change")
+    parser.add_argument("--watch-interval", type=float, default=0.5,
+                        help="with --watch, longest time between two checks of the HTML files, in seconds "
+                             "(how often they are checked where inotify is not available) (default: 0.5)")
+    parser.add_argument("--profile", action="store_true",
+                        help="print the time taken by each stage, the rows and bytes read and the peak memory")
+    parser.add_argument("--profile-output", metavar="PATH",
+                        help="with --profile, also write the measurements to PATH: as JSON (with trace events "
+                             "for chrome://tracing) if it ends with .json, otherwise as cProfile statistics")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="with --profile, follow the peak memory with tracemalloc (makes the run much slower)")
+    args = parser.parse_args()
+    if args.parser == "lxml" and importlib.util.find_spec("lxml") is None:
+        parser.error("--parser lxml requires lxml (pip install lxml)")
+    if args.analytics and importlib.util.find_spec("numpy") is None:
+        parser.error("--analytics requires NumPy (pip install numpy)")
+
+    if args.snapshot or args.from_snapshot:
+        from snapshot import Snapshot, write_snapshot  # snapshot.py imports this module
+
     html_folder_path = "html-pages"
-    
-    # Parse HTML files and generate the schedule
-    schedule = parse_html_files(html_folder_path)
+    output_file = args.output
+
+    if args.exam_courses and not args.exam_clashes:
+        parser.error("--exam-courses requires --exam-clashes")
+    if args.max_pending and not args.urls:
+        parser.error("--max-pending requires --urls")
+    if args.urls and args.from_snapshot:
+        parser.error("--urls cannot be used with --from-snapshot")
+    if args.render == "shards" and output_file == "-":
+        parser.error("--render shards writes a folder, it cannot be used with --output -")
+    if args.compress and output_file == "-":
+        parser.error("--compress writes files, it cannot be used with --output -")
+    if args.compress and "br" not in available_compressions():
+        print("brotli is not installed (pip install brotli), only the .gz copies will be written")
+
+    if args.watch:
+        if (args.from_snapshot or args.snapshot or args.columnar or args.exam_clashes or args.analytics
+                or args.history or args.urls or args.sqlite or output_file == "-"):
+            parser.error("--watch cannot be used with --from-snapshot, --snapshot, --columnar, "
+                         "--exam-clashes, --analytics, --history, --urls, --sqlite or --output -")
+        if args.profile or args.profile_output or args.profile_memory:
+            parser.error("--profile cannot be used with --watch")
+        cache = None if args.no_cache else ParseCache()
+        merger = None if args.dedup == "off" else RowMerger(args.dedup)
+        watch_schedule(html_folder_path, output_file, parser=args.parser, cache=cache,
+                       render=args.render, interval=args.watch_interval, merger=merger, minify=args.minify,
+                       compress=args.compress)
+        sys.exit()
+
+    profiling = args.profile or args.profile_output or args.profile_memory
+    profiler = Profiler(trace_memory=args.profile_memory) if profiling else NULL_PROFILER
+    if args.profile_output and not args.profile_output.endswith(".json"):
+        import cProfile  # Only loaded when its statistics are requested
+
+        function_profile = cProfile.Profile()
+        function_profile.enable()
+
+    # Keep stdout for the HTML document when it is piped
+    log_file = sys.stderr if output_file == "-" else sys.stdout
+    with contextlib.redirect_stdout(log_file):
+        # Parse HTML files (or load a snapshot) and generate the schedule
+        cache = None if args.no_cache or args.from_snapshot or args.urls else ParseCache()
+        merger = None if args.dedup == "off" or args.from_snapshot else RowMerger(args.dedup)
+        if args.from_snapshot:
+            try:
+                with profiler.stage("load snapshot"):
+                    table = Snapshot(args.from_snapshot)
+                    schedule = table.group_by_weekday()
+            except (OSError, ValueError) as e:
+                parser.error(f"cannot read the snapshot: {e}")
+        elif args.urls:
+            import asyncio
+            from pipeline import http_source, load_page_rows  # pipeline.py imports this module
+
+            try:
+                with open(args.urls, encoding="utf-8") as file:
+                    urls = [line.strip() for line in file if line.strip() and not line.startswith("#")]
+            except OSError as e:
+                parser.error(f"cannot read the URLs: {e}")
+            headers, data_rows = asyncio.run(load_page_rows(
+                http_source(urls), workers=args.workers, parser=args.parser, merger=merger,
+                max_pending=args.max_pending, profiler=profiler,
+            ))
+            if args.columnar:
+                table = table_from_rows(headers, data_rows, profiler=profiler)
+                with profiler.stage("group"):
+                    schedule = table.group_by_weekday() if table else {}
+            else:
+                table = None
+                schedule = schedule_from_rows(headers, data_rows, profiler=profiler)
+        elif args.columnar:
+            table = parse_course_table(html_folder_path, workers=args.workers, parser=args.parser, cache=cache,
+                                       merger=merger, profiler=profiler)
+            with profiler.stage("group"):
+                schedule = table.group_by_weekday() if table else {}
+        else:
+            table = None
+            schedule = parse_html_files(html_folder_path, workers=args.workers, parser=args.parser, cache=cache,
+                                        merger=merger, profiler=profiler)
+
+        if args.snapshot:
+            with profiler.stage("write snapshot"):
+                count = write_snapshot(args.snapshot, schedule, table=table)
+            print(f"Snapshot of {count} courses written to {args.snapshot}")
+
+        if args.sqlite:
+            import sqlite3
+            from database import write_database  # Only loaded when requested
+
+            try:
+                with profiler.stage("write database"):
+                    counts = write_database(args.sqlite, schedule, table=table)
+            except (sqlite3.Error, ValueError) as e:
+                parser.error(f"cannot write the database: {e}")
+            print(f"Database {args.sqlite} updated: {counts['added']} classes added, {counts['changed']} changed, "
+                  f"{counts['removed']} removed and {counts['unchanged']} unchanged")
+
+        if args.exam_clashes:
+            with profiler.stage("exam clashes"):
+                clashes = find_exam_clashes(schedule, table=table, course_codes=args.exam_courses)
+                with open(args.exam_clashes, "w", encoding="utf-8") as file:
+                    json.dump(clashes, file, ensure_ascii=False, indent=2)
+            print(f"{len(clashes['clashes'])} exam clashes written to {args.exam_clashes}")
+
+        extra_views = []
+        if args.analytics:
+            from analytics import OccupancyReport, Sessions  # Only loaded when requested, needs NumPy
+
+            with profiler.stage("analytics"):
+                report = OccupancyReport(Sessions.from_schedule(schedule, table))
+                report.write(args.analytics)
+                extra_views.append(("occupancy", "نقشه اشغال", report.render_view()))
+            conflicts = len(report.fields["place"]["conflicts"])
+            print(f"Occupancy written to {args.analytics} ({conflicts} double-booked periods of places)")
+
+        if args.history:
+            from history import History, render_changes_view  # history.py imports this module
+
+            try:
+                with profiler.stage("history"):
+                    history = History(args.history)
+                    rows = (row for rows in schedule.values() for row in rows)
+                    number = history.append(rows if table is None else map(table.__getitem__, rows),
+                                            label=get_jalali_date())
+                    changes = history.diff(number - 1, number)
+                    extra_views.append(("changes", "تغییرات", render_changes_view(changes)))
+            except (OSError, ValueError) as e:
+                parser.error(f"cannot update the history: {e}")
+            print(f"Snapshot {number} appended to {args.history}: {len(changes['added'])} classes added, "
+                  f"{len(changes['removed'])} removed and {len(changes['changed'])} changed since the previous run")
 
     # Write the schedule to a file
-    output_file = "schedule_output"
-    write_schedule_to_file(schedule, output_file)
+    manifest = write_schedule_to_file(schedule, output_file, table=table, render=args.render,
+                                      workers=args.workers, profiler=profiler, extra_views=extra_views,
+                                      minify=args.minify, compress=args.compress)
 
-    print(f"Schedule written to {output_file}")
\ No newline at end of file
+    print(f"Schedule written to {output_file}", file=log_file)
+    if manifest:
+        print(f"Compressed copies written ({manifest_summary(manifest)})", file=log_file)
+    if cache:
+        print(cache.stats(), file=log_file)
+    if merger:
+        print(merger.stats(), file=log_file)
+    if profiler.enabled:
+        print(profiler.summary(), file=log_file)
+        if args.profile_output and args.profile_output.endswith(".json"):
+            profiler.write_json(args.profile_output)
+        elif args.profile_output:
+            function_profile.disable()
+            function_profile.dump_stats(args.profile_output)
+        if args.profile_output:
+            print(f"Profile written to {args.profile_output}", file=log_file)
@@ -0,0 +1,443 @@
+"""
+Local HTTP server answering queries on the course schedule.
+
+The schedule is parsed once and indexed in memory: a hash index on
+course_code, professor, place, group_code (also by the number in
+parentheses, like 2110130) and class_code, a TimeSlotIndex of the class
+times and a TrigramIndex of the course names and professors, for
+typo-tolerant search. Queries are answered with JSON:
+
+    GET /courses?professor=...&group_code=2110130&min_capacity=31
+    GET /courses?day=دوشنبه&time=10:35&end=12:15
+    GET /free-places?day=دوشنبه&time=10:35
+    GET /conflicts?class_code=...&course_code=...
+    GET /search?q=...&limit=10
+    GET /status
+
+/ serves a small page to run these queries from a browser. The HTML folder
+is checked for changes every few seconds and the schedule is reloaded in the
+background; requests keep using the previous index until the new one is
+ready.
+
+Usage:
+    python server.py --port 8000
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from fuzzy import FUZZY_FIELDS, TrigramIndex
+from persian import normalize_search_text
+from script import ParseCache, parse_html_files
+from timeslots import TimeSlotIndex, class_key, parse_day_time, parse_time, weekday_number
+from watcher import folder_state
+
+# Fields with a hash index, and the query parameters filtering on them
+INDEXED_FIELDS = ("course_code", "professor", "place", "group_code", "class_code")
+
+# Number of a group in its name, like "گروه آموزشي رياضي(2110140)"
+GROUP_NUMBER_RE = re.compile(r"\((\d+)\)\s*$")
+
+# Values used by the pages when a field is empty
+EMPTY_VALUES = ("", "  ")
+
+# Most courses returned by one query, unless a limit is given
+DEFAULT_LIMIT = 200
+
+
+class ScheduleIndex:
+    """
+    Courses of the schedule with the indexes used to answer queries.
+
+    Courses are referred to by their position in `courses`. Index keys are
+    normalized with normalize_search_text, so queries match whatever spelling
+    of ي/ی, ك/ک or half-spaces they use.
+
+    Args:
+        courses (iterable): The courses to index.
+    """
+
+    def __init__(self, courses):
+        self.courses = list(courses)
+        self.indexes = {field: defaultdict(list) for field in INDEXED_FIELDS}
+        self.capacities = []
+        place_names = {}  # Normalized place -> name as first written
+        for row, course in enumerate(self.courses):
+            for field in INDEXED_FIELDS:
+                value = getattr(course, field)
+                if value not in EMPTY_VALUES:
+                    self.indexes[field][normalize_search_text(value)].append(row)
+            match = GROUP_NUMBER_RE.search(course.group_code)
+            if match:
+                self.indexes["group_code"][match.group(1)].append(row)
+            place_names.setdefault(normalize_search_text(course.place), course.place)
+            capacity = course.capacity
+            self.capacities.append(int(capacity) if capacity.isdigit() else None)
+        self.times = TimeSlotIndex((row, course.day_time) for row, course in enumerate(self.courses))
+        self.fuzzy = TrigramIndex(
+            (row, getattr(course, field)) for row, course in enumerate(self.courses) for field in FUZZY_FIELDS
+        )
+        self.places = sorted((place_names[place], place) for place in self.indexes["place"])
+        # Courses are encoded once, responses only join them
+        self.course_json = [
+            json.dumps(self.course_to_json(row), ensure_ascii=False) for row in range(len(self.courses))
+        ]
+        self.loaded_at = time.time()
+
+    def __len__(self):
+        return len(self.courses)
+
+    def lookup(self, field, value):
+        """Return the rows whose field has a value (normalized before the lookup)."""
+        return self.indexes[field].get(normalize_search_text(value), [])
+
+    def query(self, filters=None, day=None, start=None, end=None, min_capacity=None):
+        """
+        Return the rows matching every given condition, in schedule order.
+
+        Args:
+            filters (dict): Values of indexed fields the courses must have.
+            day (int or str): Weekday the courses must meet on.
+            start (int or str): With day, the courses must meet between start
+                and end (minutes or "HH:MM"), or at start if end is not given.
+            end (int or str): End of the period.
+            min_capacity (int): Smallest capacity of the courses.
+
+        Raises:
+            ValueError: If day or a time is invalid.
+        """
+        candidates = [self.lookup(field, value) for field, value in (filters or {}).items()]
+        if day is not None:
+            if start is None:
+                start, end = 0, 24 * 60
+            candidates.append(self.times.at(day, start, end))
+
+        if candidates:
+            candidates.sort(key=len)
+            rows = set(candidates[0])
+            for other in candidates[1:]:
+                rows.intersection_update(other)
+                if not rows:
+                    break
+            rows = sorted(rows)
+        else:
+            rows = range(len(self.courses))
+
+        if min_capacity is not None:
+            capacities = self.capacities
+            rows = [row for row in rows if capacities[row] is not None and capacities[row] >= min_capacity]
+        return list(rows)
+
+    def free_places(self, day, start, end=None):
+        """Return the places with no class between start and end on a day, sorted."""
+        used = {normalize_search_text(self.courses[row].place) for row in self.times.at(day, start, end)}
+        return [name for name, place in self.places if place not in used]
+
+    def conflicts(self, class_code, course_code=None, group_code=None):
+        """
+        Return the rows of the courses whose class times overlap those of a class.
+
+        Args:
+            class_code (str): Class code of the class.
+            course_code (str): Course code of the class, needed when its class
+                code is shared by the classes of several courses.
+            group_code (str): Group of the class, needed when the course is
+                offered by several groups with that class code.
+
+        Raises:
+            ValueError: If no class or more than one class matches.
+        """
+        filters = {"class_code": class_code, "course_code": course_code, "group_code": group_code}
+        classes = self.query({field: value for field, value in filters.items() if value is not None})
+        keys = {class_key(self.courses[row]) for row in classes}
+        if not keys:
+            raise ValueError(f"No class with class_code {class_code!r}")
+        if len(keys) > 1:
+            raise ValueError(
+                f"class_code {class_code!r} is used by {len(keys)} classes, give their course_code "
+                f"({', '.join(sorted({course_code for _, course_code, _ in keys}))}) and if needed group_code"
+            )
+        rows = set()
+        for row in classes:
+            rows.update(self.times.overlapping(row))
+        return sorted(rows.difference(classes))
+
+    def search(self, query, limit=10):
+        """Return the (row, score) of the courses whose name or professor best match a query, best first."""
+        return self.fuzzy.search(query, limit=limit)
+
+    def courses_json(self, rows, count=None):
+        """Return the JSON text of the number of rows ("count") and their courses ("courses")."""
+        count = len(rows) if count is None else count
+        return '{"count": %d, "courses": [%s]}' % (count, ", ".join(self.course_json[row] for row in rows))
+
+    def course_to_json(self, row):
+        """Return a course as a JSON-serializable dict, with its parsed class times."""
+        course = self.courses[row]
+        data = course.to_dict()
+        data["sessions"] = [
+            {"weekday": weekday, "start": start, "end": end}
+            for weekday, start, end in parse_day_time(course.day_time)
+        ]
+        return data
+
+
+class ScheduleServer(ThreadingHTTPServer):
+    """
+    HTTP server holding the current ScheduleIndex.
+
+    Args:
+        address (tuple): (host, port) to listen on.
+        folder_path (str): Folder of the Amozeshyar HTML pages.
+        workers (int): Processes used to parse the pages.
+        reload_interval (float): Seconds between two checks of the folder,
+            0 to never reload.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, folder_path, workers=1, reload_interval=2.0):
+        self.folder_path = folder_path
+        self.workers = workers
+        self.reload_interval = reload_interval
+        self.reloads = 0
+        self._cache = ParseCache()
+        self._fingerprint = folder_state(folder_path)
+        self.index = self.load()
+        self._stopped = threading.Event()
+        super().__init__(address, QueryHandler)
+
+    def load(self):
+        """Parse the pages and return a new ScheduleIndex."""
+        schedule = parse_html_files(self.folder_path, workers=self.workers, cache=self._cache)
+        return ScheduleIndex(course for courses in schedule.values() for course in courses)
+
+    def watch(self):
+        """Reload the schedule whenever the HTML files change, until shutdown."""
+        while not self._stopped.wait(self.reload_interval):
+            try:
+                fingerprint = folder_state(self.folder_path)
+                if fingerprint == self._fingerprint:
+                    continue
+                self._fingerprint = fingerprint
+                index = self.load()
+            except Exception as e:  # Keep serving the previous schedule
+                print(f"Could not reload the schedule: {e}")
+                continue
+            self.index = index  # Requests in flight keep the index they started with
+            self.reloads += 1
+            print(f"Schedule reloaded: {len(index)} courses")
+
+    def serve_forever(self, poll_interval=0.5):
+        if self.reload_interval:
+            threading.Thread(target=self.watch, daemon=True).start()
+        super().serve_forever(poll_interval)
+
+    def shutdown(self):
+        self._stopped.set()
+        super().shutdown()
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """Answer the queries of a ScheduleServer."""
+
+    protocol_version = "HTTP/1.1"  # Keep connections open between queries
+    disable_nagle_algorithm = True  # Headers and body are sent separately
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        index = self.server.index
+        if url.path == "/":
+            self.send_body(QUERY_PAGE.encode("utf-8"), "text/html; charset=utf-8")
+            return
+        route = self.routes.get(url.path)
+        if route is None:
+            self.send_json({"error": f"Unknown path: {url.path}"}, status=404)
+            return
+        try:
+            self.send_json(route(self, index, params))
+        except ValueError as e:
+            self.send_json({"error": str(e)}, status=400)
+
+    @staticmethod
+    def number_param(params, name, parse=int):
+        """Return a parameter parsed with parse, or None if it is not given."""
+        if name not in params:
+            return None
+        try:
+            return parse(params[name])
+        except ValueError:
+            raise ValueError(f"Invalid {name}: {params[name]!r}") from None
+
+    def query_courses(self, index, params):
+        filters = {field: params[field] for field in INDEXED_FIELDS if field in params}
+        rows = index.query(
+            filters,
+            day=params.get("day"),
+            start=self.number_param(params, "time", parse_time),
+            end=self.number_param(params, "end", parse_time),
+            min_capacity=self.number_param(params, "min_capacity"),
+        )
+        limit = self.number_param(params, "limit") or DEFAULT_LIMIT
+        return index.courses_json(rows[:limit], count=len(rows))
+
+    def query_free_places(self, index, params):
+        if "day" not in params or "time" not in params:
+            raise ValueError("day and time are required")
+        weekday_number(params["day"])  # Reject unknown days
+        start = self.number_param(params, "time", parse_time)
+        end = self.number_param(params, "end", parse_time)
+        return {"places": index.free_places(params["day"], start, end)}
+
+    def query_conflicts(self, index, params):
+        if "class_code" not in params:
+            raise ValueError("class_code is required")
+        return index.courses_json(
+            index.conflicts(params["class_code"], params.get("course_code"), params.get("group_code")))
+
+    def query_search(self, index, params):
+        if not params.get("q"):
+            raise ValueError("q is required")
+        results = index.search(params["q"], limit=self.number_param(params, "limit") or 10)
+        rows = [row for row, _ in results]
+        return '{"count": %d, "courses": [%s], "scores": %s}' % (
+            len(rows), ", ".join(index.course_json[row] for row in rows), json.dumps([score for _, score in results]))
+
+    def query_status(self, index, params):
+        return {"courses": len(index), "loaded_at": index.loaded_at, "reloads": self.server.reloads}
+
+    routes = {
+        "/courses": query_courses,
+        "/free-places": query_free_places,
+        "/conflicts": query_conflicts,
+        "/search": query_search,
+        "/status": query_status,
+    }
+
+    def send_json(self, data, status=200):
+        """Send a JSON response, data being JSON-serializable or already encoded JSON text."""
+        text = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+        self.send_body(text.encode("utf-8"), "application/json; charset=utf-8", status)
+
+    def send_body(self, body, content_type, status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Queries are not logged
+
+
+# Page to run queries from a browser
+QUERY_PAGE = """<!DOCTYPE html>
+<html dir="rtl" lang="fa">
+<head>
+    <meta charset="UTF-8">
+    <title>جستجوی دروس</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }
+        form { background-color: white; padding: 15px; border-radius: 5px; }
+        input { padding: 6px; margin: 4px; border: 1px solid #ddd; border-radius: 4px; }
+        button { padding: 8px 15px; margin: 4px; border: none; border-radius: 4px; background-color: #007bff; color: white; cursor: pointer; }
+        table { border-collapse: collapse; width: 100%; margin: 20px 0; background-color: white; }
+        th, td { border: 1px solid #ddd; padding: 8px; text-align: right; }
+        th { background-color: #f2f2f2; }
+    </style>
+</head>
+<body>
+    <form id="query">
+        <input name="course_code" placeholder="کد درس">
+        <input name="professor" placeholder="استاد">
+        <input name="group_code" placeholder="کد گروه آموزشی">
+        <input name="place" placeholder="مکان برگزاری">
+        <input name="class_code" placeholder="کد ارائه">
+        <input name="day" placeholder="روز (مثال: دوشنبه)">
+        <input name="time" placeholder="ساعت (10:35)">
+        <input name="end" placeholder="تا ساعت">
+        <input name="min_capacity" placeholder="حداقل ظرفیت">
+        <button type="submit">جستجوی دروس</button>
+        <button type="button" id="freePlaces">مکان‌های خالی</button>
+    </form>
+    <p id="summary"></p>
+    <table id="results"></table>
+<script>
+    const form = document.getElementById('query');
+    const fields = ['course_name', 'course_code', 'day_time', 'professor', 'capacity', 'class_code', 'place', 'group_code'];
+
+    function params() {
+        const query = new URLSearchParams();
+        new FormData(form).forEach((value, name) => { if (value.trim()) query.set(name, value.trim()); });
+        return query;
+    }
+
+    function cell(tag, text) {
+        const element = document.createElement(tag);
+        element.textContent = text;
+        return element;
+    }
+
+    async function show(path, render) {
+        const response = await fetch(path + '?' + params());
+        const data = await response.json();
+        const table = document.getElementById('results');
+        table.replaceChildren();
+        if (!response.ok) {
+            document.getElementById('summary').textContent = data.error;
+            return;
+        }
+        render(data, table);
+    }
+
+    form.addEventListener('submit', event => {
+        event.preventDefault();
+        show('/courses', (data, table) => {
+            document.getElementById('summary').textContent = data.count + ' درس';
+            const header = table.insertRow();
+            fields.forEach(field => header.appendChild(cell('th', field)));
+            data.courses.forEach(course => {
+                const row = table.insertRow();
+                fields.forEach(field => row.appendChild(cell('td', course[field])));
+            });
+        });
+    });
+
+    document.getElementById('freePlaces').addEventListener('click', () => {
+        show('/free-places', (data, table) => {
+            document.getElementById('summary').textContent = data.places.length + ' مکان خالی';
+            data.places.forEach(place => table.insertRow().appendChild(cell('td', place)));
+        });
+    });
+</script>
+</body>
+</html>
+"""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve queries on the course schedule over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on (default: 8000)")
+    parser.add_argument("--html-folder", default="html-pages", help="folder of the Amozeshyar HTML pages")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of processes used to parse the HTML files (default: number of cores)")
+    parser.add_argument("--reload-interval", type=float, default=2.0,
+                        help="seconds between checks of the HTML folder for changes, 0 to disable (default: 2)")
+    args = parser.parse_args()
+
+    server = ScheduleServer((args.host, args.port), args.html_folder, args.workers, args.reload_interval)
+    print(f"Serving {len(server.index)} courses on http://{args.host}:{server.server_address[1]}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,250 @@
+"""
+Binary snapshot of the parsed course catalog.
+
+write_snapshot stores the weekly schedule returned by parse_html_files in a
+compact binary file, and Snapshot maps it back into memory without parsing
+any HTML. The file holds:
+
+    - a table of the distinct strings (UTF-8, with their offsets),
+    - a column of string indexes for each text field,
+    - fixed-width integer columns for the units (in hundredths), the capacity
+      and the class times parsed by timeslots.parse_day_time,
+    - the names of the days and the offset of the first row of each, the rows
+      being stored day after day.
+
+All integers are little-endian and every section is 8-byte aligned. Opening
+a snapshot only reads the header: the columns are memoryviews of the mapped
+file and strings are decoded the first time they are used.
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from script import COURSE_FIELDS, Course
+from timeslots import parse_day_time
+
+MAGIC = b"AMZSNAP\0"
+VERSION = 1
+
+# Fields stored as indexes into the string table
+STRING_FIELDS = tuple(field for field in COURSE_FIELDS if field not in ("total_units", "capacity"))
+
+# Sections of the file, in order, with the typecode of their items
+SECTIONS = (
+    ("string_offsets", "I"),
+    ("string_data", "B"),
+    *((field, "I") for field in STRING_FIELDS),
+    ("total_units", "i"),  # Hundredths of a unit
+    ("capacity", "i"),  # The capacity, or -1 - string index if it is not a number
+    ("session_offsets", "I"),  # First session of each row, and the end of the last one
+    ("session_weekday", "B"),
+    ("session_start", "H"),  # Minutes since midnight
+    ("session_end", "H"),
+    ("day_names", "I"),  # String index of the name of each day
+    ("day_offsets", "I"),  # First row of each day, and the row count
+)
+
+# Magic, version, row count, then the (offset, size) in bytes of each section
+HEADER = struct.Struct("<8sII" + "QQ" * len(SECTIONS))
+
+ALIGNMENT = 8
+
+
+def _little_endian(values):
+    """Return the bytes of an array in little-endian order."""
+    if sys.byteorder == "big" and values.itemsize > 1:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_snapshot(path, weekly_schedule, table=None):
+    """
+    Write a weekly schedule to a snapshot file.
+
+    The file is written next to its destination and then renamed over it, so
+    readers never see a partial snapshot.
+
+    Args:
+        path (str): Path of the snapshot file.
+        weekly_schedule (dict): Courses of each day, as returned by
+            parse_html_files (or row indexes of table).
+        table (CourseTable): Table the rows of weekly_schedule refer to, if any.
+
+    Returns:
+        int: Number of courses written.
+    """
+    strings = {}  # String -> index in the string table
+
+    def string_index(value):
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(strings)
+        return index
+
+    columns = {name: array(typecode) for name, typecode in SECTIONS if name != "string_data"}
+    for day, courses in weekly_schedule.items():
+        columns["day_names"].append(string_index(day))
+        columns["day_offsets"].append(len(columns["total_units"]))
+        for course in courses if table is None else map(table.__getitem__, courses):
+            for field in STRING_FIELDS:
+                columns[field].append(string_index(getattr(course, field)))
+            columns["total_units"].append(round(course.total_units * 100))
+            capacity = course.capacity
+            if capacity.isdigit() and str(int(capacity)) == capacity and int(capacity) < 2 ** 31:
+                columns["capacity"].append(int(capacity))
+            else:
+                columns["capacity"].append(-1 - string_index(capacity))
+            columns["session_offsets"].append(len(columns["session_weekday"]))
+            for weekday, start, end in parse_day_time(course.day_time):
+                columns["session_weekday"].append(weekday)
+                columns["session_start"].append(start)
+                columns["session_end"].append(end)
+    row_count = len(columns["total_units"])
+    columns["day_offsets"].append(row_count)
+    columns["session_offsets"].append(len(columns["session_weekday"]))
+
+    string_data = bytearray()
+    for value in strings:
+        columns["string_offsets"].append(len(string_data))
+        string_data += value.encode("utf-8")
+    columns["string_offsets"].append(len(string_data))
+
+    sections = []
+    layout = []
+    offset = HEADER.size
+    for name, _ in SECTIONS:
+        data = bytes(string_data) if name == "string_data" else _little_endian(columns[name])
+        offset += -offset % ALIGNMENT
+        layout += [offset, len(data)]
+        sections.append((offset, data))
+        offset += len(data)
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, row_count, *layout))
+        for offset, data in sections:
+            file.write(b"\0" * (offset - file.tell()))
+            file.write(data)
+    os.replace(temp_path, path)
+    return row_count
+
+
+class Snapshot:
+    """
+    Course catalog mapped from a snapshot file.
+
+    It can be used in place of a CourseTable: rows are referred to by their
+    index, snapshot[index] builds the Course of a row, get and column read
+    single fields and group_by_weekday returns the rows of each day (as
+    ranges, since they are stored day after day).
+
+    Args:
+        path (str): Path of the snapshot file.
+
+    Raises:
+        ValueError: If the file is not a snapshot of this version.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is not a course snapshot")
+        magic, version, self._row_count, *layout = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} course snapshot")
+
+        self._buffer = memoryview(self._mmap)
+        self.columns = {}
+        for (name, typecode), offset, size in zip(SECTIONS, layout[::2], layout[1::2]):
+            view = self._buffer[offset:offset + size]
+            if sys.byteorder == "big" and typecode not in "Bb":
+                view = array(typecode, view.tobytes())
+                view.byteswap()
+            elif typecode != "B":
+                view = view.cast(typecode)
+            self.columns[name] = view
+        self._strings = [None] * (len(self.columns["string_offsets"]) - 1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Release the columns and unmap the file."""
+        for view in getattr(self, "columns", {}).values():
+            if isinstance(view, memoryview):
+                view.release()
+        self.columns = {}
+        if getattr(self, "_buffer", None) is not None:
+            self._buffer.release()
+            self._buffer = None
+        self._mmap.close()
+
+    def __len__(self):
+        return self._row_count
+
+    def __getitem__(self, index):
+        return Course(**{field: self.get(index, field) for field in COURSE_FIELDS})
+
+    def string(self, index):
+        """Return an entry of the string table, decoding it on first use."""
+        value = self._strings[index]
+        if value is None:
+            offsets = self.columns["string_offsets"]
+            value = bytes(self.columns["string_data"][offsets[index]:offsets[index + 1]]).decode("utf-8")
+            self._strings[index] = value
+        return value
+
+    def get(self, index, field):
+        """Return the value of one field of a row."""
+        if field == "total_units":
+            return self.columns["total_units"][index] / 100
+        if field == "capacity":
+            capacity = self.columns["capacity"][index]
+            return str(capacity) if capacity >= 0 else self.string(-1 - capacity)
+        return self.string(self.columns[field][index])
+
+    def column(self, field):
+        """Return the decoded values of a field for every row."""
+        return [self.get(index, field) for index in range(self._row_count)]
+
+    def capacity(self, index):
+        """Return the capacity of a row as a number, or None if it is not one."""
+        capacity = self.columns["capacity"][index]
+        return capacity if capacity >= 0 else None
+
+    def sessions(self, index):
+        """Return the (weekday, start, end) class times of a row, see timeslots.parse_day_time."""
+        offsets = self.columns["session_offsets"]
+        weekdays, starts, ends = (self.columns[name] for name in ("session_weekday", "session_start", "session_end"))
+        return tuple(
+            (weekdays[session], starts[session], ends[session])
+            for session in range(offsets[index], offsets[index + 1])
+        )
+
+    def group_by_weekday(self):
+        """
+        Return the rows of each day, in the order of the schedule the snapshot
+        was written from.
+
+        Returns:
+            dict: Range of row indexes for each day.
+        """
+        offsets = self.columns["day_offsets"]
+        return {
+            self.string(name): range(offsets[day], offsets[day + 1])
+            for day, name in enumerate(self.columns["day_names"])
+        }
+
+    def courses(self):
+        """Yield the Course of every row."""
+        for index in range(self._row_count):
+            yield self[index]
@@ -0,0 +1,480 @@
+"""
+Conflict-free timetable generator.
+
+Given the course codes a student wants to take, finds picks of one class
+(class_code) per course whose class times and exams do not overlap and that
+satisfy the requested constraints, ranked by a score.
+
+Usage:
+    python solver.py 4628169362 4628101485 --not-before 10:00 --no-day "پنج شنبه" --top 5
+"""
+import argparse
+import heapq
+import json
+import os
+import sys
+from itertools import count
+
+from persian import normalize_text
+from script import ParseCache, get_jalali_date, parse_html_files
+from snapshot import Snapshot
+from timeslots import WEEKDAY_NAMES, format_time, parse_day_time, parse_exam, parse_time, weekday_number
+
+# Class times and exams are encoded as bitsets of 1-minute slots: longer slots
+# would round the times, and classes ending and starting in the same slot
+# (like 10:02 and 10:03) would clash
+SLOT_MINUTES = 1
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+TIME_MASK = (1 << len(WEEKDAY_NAMES) * SLOTS_PER_DAY) - 1  # Class time slots, exams come after them
+
+
+def slot_mask(offset, start, end):
+    """Return the bitset of the slots covering [start, end) minutes, shifted by offset slots."""
+    first = start // SLOT_MINUTES
+    last = max(-(-end // SLOT_MINUTES), first + 1)  # Round the end up, cover at least one slot
+    return ((1 << (last - first)) - 1) << (offset + first)
+
+
+class Constraints:
+    """
+    Hard constraints on a timetable and the weights used to score it.
+
+    Args:
+        not_before (int): No class may start before this minute of the day.
+        not_after (int): No class may end after this minute of the day.
+        excluded_days (iterable): Weekday numbers or names without classes.
+        max_gap (int): Longest allowed gap, in minutes, between two classes of a day.
+        professors (iterable): Preferred professors, which raise the score. Their
+            names are normalized like the parsed ones (see persian.normalize_text).
+        only_preferred (bool): Only allow classes of the preferred professors
+            (for the courses that have any).
+        day_weight (int): Score lost per day with classes, in minutes of gap.
+        gap_weight (int): Score lost per minute of gap between classes.
+        professor_weight (int): Score gained per class of a preferred professor.
+    """
+
+    def __init__(self, not_before=None, not_after=None, excluded_days=(), max_gap=None,
+                 professors=(), only_preferred=False, day_weight=120, gap_weight=1, professor_weight=60):
+        self.not_before = not_before
+        self.not_after = not_after
+        self.excluded_days = {weekday_number(day) for day in excluded_days}
+        self.max_gap = max_gap
+        self.professors = {normalize_text(professor) for professor in professors}
+        self.only_preferred = only_preferred
+        self.day_weight = day_weight
+        self.gap_weight = gap_weight
+        self.professor_weight = professor_weight
+
+    def allows(self, sessions):
+        """Return whether the sessions of a class satisfy the per-class constraints."""
+        for weekday, start, end in sessions:
+            if weekday in self.excluded_days:
+                return False
+            if self.not_before is not None and start < self.not_before:
+                return False
+            if self.not_after is not None and end > self.not_after:
+                return False
+        return True
+
+
+class Section:
+    """
+    A class that can be picked for a course.
+
+    Classes of the same course with exactly the same times and exam, and
+    taught by a preferred professor or not, are interchangeable for the
+    solver: one Section stands for all of them and the others are kept in
+    `alternatives`.
+    """
+
+    __slots__ = ("course", "sessions", "exam", "mask", "time_mask", "slots", "preferred", "day_mask", "alternatives")
+
+    def __init__(self, course, sessions, exam, mask, preferred):
+        self.course = course
+        self.sessions = sessions
+        self.exam = exam
+        self.mask = mask
+        self.time_mask = mask & TIME_MASK  # Without the exam
+        self.slots = self.time_mask.bit_count()
+        self.preferred = preferred
+        self.day_mask = 0  # Bit per weekday with a session
+        for weekday, _, _ in sessions:
+            self.day_mask |= 1 << weekday
+        self.alternatives = []
+
+
+def build_sections(courses, course_codes, constraints):
+    """
+    Build the candidate sections of each requested course.
+
+    Args:
+        courses (iterable): Course objects of the catalog.
+        course_codes (list): Requested course codes.
+        constraints (Constraints): Constraints the classes must satisfy.
+
+    Returns:
+        list: For each course code, its list of candidate Sections.
+
+    Raises:
+        ValueError: If a course is not offered or none of its classes satisfy
+            the constraints.
+    """
+    wanted = dict.fromkeys(course_codes)
+    by_code = {code: {} for code in wanted}
+    for course in courses:
+        if course.course_code in by_code:
+            # Drop duplicate pages; class codes alone are shared by the classes of different groups
+            by_code[course.course_code].setdefault((course.group_code, course.class_code), course)
+
+    exams = {}
+    for classes in by_code.values():
+        for course in classes.values():
+            exam = parse_exam(course.exam)
+            if exam:
+                exams.setdefault(exam[0], len(exams))
+
+    # Exams are encoded after the class times
+    exam_offset = TIME_MASK.bit_length()
+    candidates = []
+    for code, classes in by_code.items():
+        if not classes:
+            raise ValueError(f"Course {code} is not offered")
+
+        if constraints.only_preferred and any(course.professor in constraints.professors for course in classes.values()):
+            classes = {key: course for key, course in classes.items() if course.professor in constraints.professors}
+
+        sections = {}
+        for course in classes.values():
+            sessions = parse_day_time(course.day_time)
+            if not constraints.allows(sessions):
+                continue
+            mask = 0
+            for weekday, start, end in sessions:
+                mask |= slot_mask(weekday * SLOTS_PER_DAY, start, end)
+            exam = parse_exam(course.exam)
+            if exam:
+                mask |= slot_mask(exam_offset + exams[exam[0]] * SLOTS_PER_DAY, exam[1], exam[2])
+
+            preferred = course.professor in constraints.professors
+            key = (tuple(sessions), exam, preferred)  # Exact times, whatever the size of the slots
+            if key in sections:
+                sections[key].alternatives.append(course)
+            else:
+                sections[key] = Section(course, sessions, exam, mask, preferred)
+
+        if not sections:
+            raise ValueError(f"No class of course {code} satisfies the constraints")
+        candidates.append(list(sections.values()))
+
+    return candidates
+
+
+def schedule_gaps(sections):
+    """Return (total gap, longest gap) in minutes between consecutive classes of each day."""
+    days = {}
+    for section in sections:
+        for weekday, start, end in section.sessions:
+            days.setdefault(weekday, []).append((start, end))
+
+    total = longest = 0
+    for sessions in days.values():
+        sessions.sort()
+        for (_, previous_end), (start, _) in zip(sessions, sessions[1:]):
+            gap = max(start - previous_end, 0)
+            total += gap
+            longest = max(longest, gap)
+    return total, longest
+
+
+def schedule_days(sections):
+    """Return the set of weekdays with classes."""
+    return {weekday for section in sections for weekday, _, _ in section.sessions}
+
+
+def score_schedule(sections, constraints):
+    """
+    Score a complete schedule, higher is better: fewer days with classes,
+    shorter gaps and more classes of the preferred professors.
+    """
+    total_gap, _ = schedule_gaps(sections)
+    preferred = sum(section.preferred for section in sections)
+    return (preferred * constraints.professor_weight
+            - len(schedule_days(sections)) * constraints.day_weight
+            - total_gap * constraints.gap_weight)
+
+
+def added_gap(section, spans):
+    """Return the gap a section adds outside the (first, last) span of each day it shares."""
+    gap = 0
+    for weekday, start, end in section.sessions:
+        span = spans.get(weekday)
+        if span:
+            gap += max(span[0] - end, start - span[1], 0)
+    return gap
+
+
+def solve(courses, course_codes, constraints=None, top=5):
+    """
+    Find the best conflict-free timetables for a set of courses.
+
+    The search picks one section per course by backtracking over bitsets of
+    class and exam times, keeping for each remaining course the sections
+    still compatible with the picked ones. The course with the fewest of them
+    is tried next, starting with the sections that add the fewest days and
+    gaps, and the search is repeated for schedules with one more day of
+    classes each time. A branch is cut as soon as a course has no compatible
+    section left, the remaining courses cannot fit in the free time slots, or
+    the best score it could reach cannot enter the top results: days with
+    classes are only ever added, and the gaps of each day can only shrink by
+    the classes the remaining courses could put inside them.
+
+    Args:
+        courses (iterable): Course objects of the catalog.
+        course_codes (list): Course codes to take.
+        constraints (Constraints): Hard constraints and scoring weights.
+        top (int): Number of timetables to return.
+
+    Returns:
+        list: (score, sections) of the best timetables, best first.
+
+    Raises:
+        ValueError: See build_sections.
+    """
+    constraints = constraints or Constraints()
+    candidates = build_sections(courses, course_codes, constraints)
+    can_prefer = [any(section.preferred for section in sections) for sections in candidates]
+    best = []  # Min-heap of (score, tie breaker, sections)
+    tie_breaker = count()
+
+    def search(remaining, chosen, chosen_mask, days, spans, preferred, max_days):
+        """Extend the chosen sections; remaining holds (course index, compatible sections)."""
+        if not remaining:
+            if days.bit_count() < max_days:
+                return  # Found by an earlier pass
+            if constraints.max_gap is not None and schedule_gaps(chosen)[1] > constraints.max_gap:
+                return
+            entry = (score_schedule(chosen, constraints), -next(tie_breaker), list(chosen))
+            if len(best) < top:
+                heapq.heappush(best, entry)
+            elif entry[0] > best[0][0]:
+                heapq.heapreplace(best, entry)
+            return
+
+        selected = None
+        new_days = 0  # Days any completion adds at least
+        fill = dict.fromkeys(spans, 0)  # Minutes the remaining courses could add inside each day's span
+        needed_slots = 0  # Time slots the remaining courses need at least
+        free_slots = 0  # Time slots any of their sections use
+        for position, (_, options) in enumerate(remaining):
+            fewest_days = len(WEEKDAY_NAMES)
+            fewest_slots = TIME_MASK.bit_length()
+            course_fill = {}
+            for section in options:
+                free_slots |= section.time_mask
+                fewest_slots = min(fewest_slots, section.slots)
+                fewest_days = min(fewest_days, (section.day_mask & ~days).bit_count())
+                inside = {}
+                for weekday, start, end in section.sessions:
+                    span = spans.get(weekday)
+                    if span and start >= span[0] and end <= span[1]:
+                        inside[weekday] = inside.get(weekday, 0) + end - start
+                for weekday, minutes in inside.items():
+                    course_fill[weekday] = max(course_fill.get(weekday, 0), minutes)
+            new_days = max(new_days, fewest_days)
+            needed_slots += fewest_slots
+            for weekday, minutes in course_fill.items():
+                fill[weekday] += minutes
+
+            # Continue with the course that has the fewest compatible sections
+            if selected is None or len(options) < len(remaining[selected][1]):
+                selected = position
+
+        # The remaining courses cannot fit, or need more days than allowed
+        if needed_slots > free_slots.bit_count() or days.bit_count() + new_days > max_days:
+            return
+        if len(best) == top:
+            # Gap that no remaining course can fill, counted by minutes and by free time slots
+            gap = sum(max(last - first - busy - fill[weekday], 0) for weekday, (first, last, busy) in spans.items())
+            holes = 0
+            for weekday, (first, last, _) in spans.items():
+                holes |= slot_mask(weekday * SLOTS_PER_DAY, first, last)
+            holes &= ~(chosen_mask | free_slots)
+            gap = max(gap, holes.bit_count() * SLOT_MINUTES)
+            bound = ((preferred + sum(can_prefer[index] for index, _ in remaining)) * constraints.professor_weight
+                     - (days.bit_count() + new_days) * constraints.day_weight
+                     - gap * constraints.gap_weight)
+            if bound <= best[0][0]:
+                return
+
+        options = sorted(remaining[selected][1], key=lambda section: (
+            (section.day_mask & ~days).bit_count(), added_gap(section, spans), -section.preferred))
+        rest = remaining[:selected] + remaining[selected + 1:]
+        for section in options:
+            # Keep the sections of the other courses that are still compatible
+            section_days = days | section.day_mask
+            section_rest = []
+            for index, course_options in rest:
+                course_options = [
+                    other for other in course_options
+                    if not other.mask & section.mask and (section_days | other.day_mask).bit_count() <= max_days
+                ]
+                if not course_options:
+                    break
+                section_rest.append((index, course_options))
+            else:
+                section_spans = dict(spans)
+                for weekday, start, end in section.sessions:
+                    first, last, busy = section_spans.get(weekday, (start, end, 0))
+                    section_spans[weekday] = (min(first, start), max(last, end), busy + end - start)
+                chosen.append(section)
+                search(section_rest, chosen, chosen_mask | section.time_mask, section_days, section_spans,
+                       preferred + section.preferred, max_days)
+                chosen.pop()
+
+    # Search the schedules with no day of classes (no class time given), then
+    # 1 day, 2 days... The good schedules found first make the bound cut most
+    # of the later passes.
+    max_score = sum(can_prefer) * constraints.professor_weight
+    for max_days in range(len(WEEKDAY_NAMES) + 1):
+        if len(best) == top and best[0][0] >= max_score - max_days * constraints.day_weight:
+            break  # Schedules with more days cannot score better
+        search(list(enumerate(candidates)), [], 0, 0, {}, 0, max_days)
+    return [(score, sections) for score, _, sections in sorted(best, reverse=True)]
+
+
+def schedules_to_json(schedules):
+    """Return the schedules found by solve as JSON-serializable dicts."""
+    result = []
+    for score, sections in schedules:
+        total_gap, longest_gap = schedule_gaps(sections)
+        result.append({
+            "score": score,
+            "days": len(schedule_days(sections)),
+            "total_gap": total_gap,
+            "longest_gap": longest_gap,
+            "classes": [
+                dict(
+                    section.course.to_dict(),
+                    sessions=[
+                        {"day": WEEKDAY_NAMES[weekday], "start": format_time(start), "end": format_time(end)}
+                        for weekday, start, end in section.sessions
+                    ],
+                    alternatives=[course.class_code for course in section.alternatives],
+                )
+                for section in sections
+            ],
+        })
+    return result
+
+
+def render_schedules_html(schedules):
+    """Render the schedules found by solve as an HTML page with a weekly grid per schedule."""
+    html_content = [f"""<!DOCTYPE html>
+<html dir="rtl" lang="fa">
+<head>
+    <meta charset="UTF-8">
+    <title>برنامه‌های پیشنهادی</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }}
+        .container {{ max-width: 1200px; margin: 0 auto; background-color: white; padding: 20px; border-radius: 8px; }}
+        table {{ border-collapse: collapse; width: 100%; margin: 20px 0; }}
+        th, td {{ border: 1px solid #ddd; padding: 8px; text-align: right; vertical-align: top; }}
+        th {{ background-color: #f2f2f2; }}
+        h2 {{ color: #333; border-bottom: 2px solid #007bff; padding-bottom: 5px; }}
+        .session {{ margin-bottom: 6px; }}
+    </style>
+</head>
+<body>
+<h1>برنامه‌های پیشنهادی</h1>
+<h3>اخرین بروزرسانی: {get_jalali_date()}</h3>
+<div class="container">
+"""]
+    if not schedules:
+        html_content.append("<p>هیچ برنامه‌ای بدون تداخل پیدا نشد.</p>\n")
+
+    for number, (score, sections) in enumerate(schedules, 1):
+        html_content.append(f"<h2>برنامه {number} (امتیاز {score})</h2>\n<table>\n")
+        for weekday, day in enumerate(WEEKDAY_NAMES):
+            sessions = sorted(
+                (start, end, section.course)
+                for section in sections
+                for session_day, start, end in section.sessions
+                if session_day == weekday
+            )
+            if not sessions:
+                continue
+            cells = "".join(
+                f'<div class="session">{format_time(start)} تا {format_time(end)}: '
+                f"{course.course_name} ({course.class_code}) - {course.professor} - {course.place}</div>"
+                for start, end, course in sessions
+            )
+            html_content.append(f"<tr><th>{day}</th><td>{cells}</td></tr>\n")
+        html_content.append("</table>\n<table>\n<tr><th>نام درس</th><th>کد ارائه</th><th>استاد</th><th>زمان امتحان</th></tr>\n")
+        for section in sections:
+            course = section.course
+            html_content.append(
+                f"<tr><td>{course.course_name}</td><td>{course.class_code}</td>"
+                f"<td>{course.professor}</td><td>{course.exam}</td></tr>\n"
+            )
+        html_content.append("</table>\n")
+
+    html_content.append("</div>\n</body>\n</html>\n")
+    return "".join(html_content)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find conflict-free timetables for a set of courses.")
+    parser.add_argument("course_codes", nargs="+", help="codes of the courses to take")
+    parser.add_argument("--not-before", type=parse_time, help="no class before this time (HH:MM)")
+    parser.add_argument("--not-after", type=parse_time, help="no class after this time (HH:MM)")
+    parser.add_argument("--no-day", action="append", default=[], help="a day without classes (repeatable)")
+    parser.add_argument("--max-gap", type=int, help="longest gap between two classes of a day, in minutes")
+    parser.add_argument("--professor", action="append", default=[], help="a preferred professor (repeatable)")
+    parser.add_argument("--only-preferred", action="store_true",
+                        help="only use the preferred professors' classes for courses they teach")
+    parser.add_argument("--top", type=int, default=5, help="number of timetables to output (default: 5)")
+    parser.add_argument("--json", help="write the timetables as JSON to this file (- for stdout)")
+    parser.add_argument("--html", help="write the timetables as an HTML page to this file")
+    parser.add_argument("--html-folder", default="html-pages", help="folder of the Amozeshyar HTML pages")
+    parser.add_argument("--from-snapshot", metavar="PATH",
+                        help="read the courses from a snapshot written by script.py --snapshot instead of the pages")
+    args = parser.parse_args()
+
+    try:
+        constraints = Constraints(
+            not_before=args.not_before, not_after=args.not_after, excluded_days=args.no_day,
+            max_gap=args.max_gap, professors=args.professor, only_preferred=args.only_preferred,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.from_snapshot:
+        try:
+            with Snapshot(args.from_snapshot) as catalog:
+                courses = list(catalog.courses())
+        except (OSError, ValueError) as e:
+            parser.error(f"cannot read the snapshot: {e}")
+    else:
+        schedule = parse_html_files(args.html_folder, workers=os.cpu_count() or 1, cache=ParseCache())
+        courses = [course for day_courses in schedule.values() for course in day_courses]
+    try:
+        schedules = solve(courses, args.course_codes, constraints, top=args.top)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+    if args.json == "-":
+        json.dump(schedules_to_json(schedules), sys.stdout, ensure_ascii=False, indent=2)
+    elif args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(schedules_to_json(schedules), file, ensure_ascii=False, indent=2)
+    if args.html:
+        with open(args.html, "w", encoding="utf-8") as file:
+            file.write(render_schedules_html(schedules))
+
+    if args.json != "-":
+        for number, (score, sections) in enumerate(schedules, 1):
+            print(f"{number}. score {score}: " + ", ".join(
+                f"{section.course.course_name} ({section.course.class_code})" for section in sections))
+        if not schedules:
+            print("No conflict-free timetable found.")
@@ -0,0 +1,369 @@
+"""
+Structured class times and an interval index over them.
+
+The "day_time" column holds values like "دوشنبه  از 10:35 تا 12:15", possibly
+with several sessions in one value (extra sessions may be cut off with "...").
+parse_day_time turns such a value into (weekday, start_minute, end_minute)
+tuples, and TimeSlotIndex answers which classes meet at a given time or
+overlap another class. parse_exam does the same for the exam column, and
+ExamIndex finds the exams held at a given time or overlapping each other.
+"""
+import heapq
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from functools import lru_cache
+
+import jdatetime
+
+# Days of the week in order, the index of a day is its weekday number
+WEEKDAY_NAMES = ("شنبه", "يكشنبه", "دوشنبه", "سه شنبه", "چهارشنبه", "پنج شنبه", "جمعه")
+
+# Accepted spellings of each day (Arabic/Persian letters, with or without space)
+WEEKDAY_NUMBERS = {
+    "شنبه": 0,
+    "يكشنبه": 1, "یکشنبه": 1, "يك شنبه": 1, "یک شنبه": 1,
+    "دوشنبه": 2, "دو شنبه": 2,
+    "سه شنبه": 3, "سهشنبه": 3, "سه‌شنبه": 3, "سه": 3,
+    "چهارشنبه": 4, "چهار شنبه": 4,
+    "پنج شنبه": 5, "پنجشنبه": 5, "پنج‌شنبه": 5, "پنج": 5,
+    "جمعه": 6,
+}
+
+# One session: day name, then "از HH:MM تا HH:MM"
+SESSION_RE = re.compile(
+    r"(%s)\s*از\s*(\d{1,2}):(\d{2})\s*تا\s*(\d{1,2}):(\d{2})"
+    % "|".join(sorted(map(re.escape, WEEKDAY_NUMBERS), key=len, reverse=True))
+)
+
+
+# Exam time: "YYYY/MM/DD از HH:MM تا HH:MM"
+EXAM_RE = re.compile(r"(\d{4})/(\d{1,2})/(\d{1,2})\s*از\s*(\d{1,2}):(\d{2})\s*تا\s*(\d{1,2}):(\d{2})")
+
+
+def parse_time(value):
+    """Convert a "HH:MM" time to minutes since midnight."""
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def format_time(minutes):
+    """Convert minutes since midnight to a "HH:MM" time."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def weekday_number(day):
+    """
+    Return the weekday number (index in WEEKDAY_NAMES) of a day.
+
+    Args:
+        day (int or str): Weekday number or day name.
+
+    Raises:
+        ValueError: If the day is unknown.
+    """
+    if isinstance(day, int) and 0 <= day < len(WEEKDAY_NAMES):
+        return day
+    if day in WEEKDAY_NUMBERS:
+        return WEEKDAY_NUMBERS[day]
+    raise ValueError(f"Unknown weekday: {day!r}")
+
+
+@lru_cache(maxsize=None)
+def parse_day_time(day_time):
+    """
+    Parse the sessions of a day_time value.
+
+    Args:
+        day_time (str): Value of the day_time column.
+
+    Returns:
+        tuple: (weekday, start_minute, end_minute) for each complete session,
+        in the order they appear. Empty if no time is given.
+    """
+    return tuple(
+        (WEEKDAY_NUMBERS[day], int(start_h) * 60 + int(start_m), int(end_h) * 60 + int(end_m))
+        for day, start_h, start_m, end_h, end_m in SESSION_RE.findall(day_time)
+    )
+
+
+@lru_cache(maxsize=None)
+def parse_exam(exam):
+    """
+    Parse the value of the exam column.
+
+    Args:
+        exam (str): Value of the exam column, like "1404/03/19 از 16:00 تا 17:30".
+
+    Returns:
+        tuple: (date, start_minute, end_minute) of the exam, the date being a
+        jdatetime.date, or None if no valid exam time is given.
+    """
+    match = EXAM_RE.search(exam)
+    if not match:
+        return None
+    year, month, day, start_h, start_m, end_h, end_m = map(int, match.groups())
+    try:
+        date = jdatetime.date(year, month, day)
+    except ValueError:  # Not a day of the Jalali calendar
+        return None
+    return date, start_h * 60 + start_m, end_h * 60 + end_m
+
+
+def class_key(course):
+    """
+    Return the (group_code, course_code, class_code) key of a class, the same
+    as script.RowMerger.KEY_FIELDS: class codes alone are shared by the
+    classes of different courses.
+    """
+    return course.group_code, course.course_code, course.class_code
+
+
+def parse_date(value):
+    """Convert a "YYYY/MM/DD" Jalali date to a jdatetime.date."""
+    year, month, day = map(int, value.split("/"))
+    return jdatetime.date(year, month, day)
+
+
+class TimeSlotIndex:
+    """
+    Interval index of class sessions per weekday.
+
+    Sessions of each weekday are kept sorted by start time. A query for the
+    sessions overlapping [start, end) only scans the sessions starting in
+    [start - longest session, end), found by binary search, so it takes
+    O(log n + k) for k nearby sessions instead of a scan of every class.
+
+    Keys are any hashable unique identifiers of the classes (class_key, row
+    index...), not class codes, which repeat across courses.
+    """
+
+    def __init__(self, items=()):
+        """
+        Args:
+            items (iterable): (key, day_time) pairs to index.
+        """
+        self._sessions = defaultdict(list)  # key -> sessions
+        self._pending = defaultdict(list)  # weekday -> (start, end, key) added since the last sort
+        self._starts = {}  # weekday -> sorted starts
+        self._entries = {}  # weekday -> (start, end, key) sorted like _starts
+        self._longest = defaultdict(int)  # weekday -> longest session
+        for key, day_time in items:
+            self.add(key, day_time)
+
+    @classmethod
+    def from_courses(cls, courses, key=class_key):
+        """Build the index of courses, keyed by their class_key by default."""
+        return cls((key(course), course.day_time) for course in courses)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, key):
+        return key in self._sessions
+
+    def add(self, key, day_time):
+        """Index the sessions of a class."""
+        for weekday, start, end in parse_day_time(day_time):
+            self.add_session(key, weekday, start, end)
+
+    def add_session(self, key, weekday, start, end):
+        """Index one session of a class."""
+        self._sessions[key].append((weekday, start, end))
+        self._pending[weekday].append((start, end, key))
+        self._longest[weekday] = max(self._longest[weekday], end - start)
+
+    def sessions(self, key):
+        """Return the (weekday, start, end) sessions of a class."""
+        return list(self._sessions.get(key, ()))
+
+    def at(self, day, start, end=None):
+        """
+        Return the keys of the classes meeting on a day between start and end.
+
+        Args:
+            day (int or str): Weekday number or day name.
+            start (int or str): Start of the period, in minutes or "HH:MM".
+            end (int or str): End of the period (exclusive); defaults to start,
+                to find the classes in progress at that instant.
+
+        Returns:
+            list: Keys of the matching classes, ordered by session start.
+        """
+        weekday = weekday_number(day)
+        start = parse_time(start) if isinstance(start, str) else start
+        end = start if end is None else parse_time(end) if isinstance(end, str) else end
+        seen = set()
+        keys = []
+        for _, _, key in self._overlapping(weekday, start, max(end, start + 1)):
+            if key not in seen:
+                seen.add(key)
+                keys.append(key)
+        return keys
+
+    def overlapping(self, key):
+        """
+        Return the keys of the other classes with a session overlapping one of
+        the sessions of a class.
+        """
+        seen = {key}
+        keys = []
+        for weekday, start, end in self._sessions.get(key, ()):
+            for _, _, other in self._overlapping(weekday, start, end):
+                if other not in seen:
+                    seen.add(other)
+                    keys.append(other)
+        return keys
+
+    def _overlapping(self, weekday, start, end):
+        """Yield the (start, end, key) sessions of a weekday overlapping [start, end)."""
+        self._sort(weekday)
+        starts = self._starts.get(weekday)
+        if not starts:
+            return
+        entries = self._entries[weekday]
+        first = bisect_left(starts, start - self._longest[weekday])
+        last = bisect_left(starts, end, first)
+        for index in range(first, last):
+            entry = entries[index]
+            if entry[1] > start:
+                yield entry
+
+    def _sort(self, weekday):
+        pending = self._pending.pop(weekday, None)
+        if pending:
+            entries = self._entries.get(weekday, []) + pending
+            entries.sort(key=lambda entry: (entry[0], entry[1]))
+            self._entries[weekday] = entries
+            self._starts[weekday] = [entry[0] for entry in entries]
+
+
+class ExamIndex:
+    """
+    Sorted index of exam times.
+
+    Exams are kept sorted by date and start time. A query for the exams
+    overlapping a period uses binary search like TimeSlotIndex, and
+    collisions sweeps the exams in order while keeping the ones still running
+    in a heap, so every overlapping pair is found in O(n log n + k) for k
+    pairs instead of comparing each exam with all the others.
+
+    Keys are any hashable identifiers (course_code, row index...). A key can
+    have several exams; an exam added twice for the same key is kept once.
+    """
+
+    def __init__(self, items=()):
+        """
+        Args:
+            items (iterable): (key, exam) pairs to index, exam being a value of
+                the exam column or as returned by parse_exam.
+        """
+        self._exams = defaultdict(list)  # key -> exams
+        self._entries = []  # (date, start, end, key) sorted by date and start
+        self._starts = []  # (date, start) of each entry
+        self._longest = 0  # Longest exam
+        self._sorted = True
+        for key, exam in items:
+            self.add(key, exam)
+
+    @classmethod
+    def from_courses(cls, courses, key=lambda course: course.course_code):
+        """Build the index of courses, keyed by their course_code by default."""
+        return cls((key(course), course.exam) for course in courses)
+
+    def __len__(self):
+        return len(self._exams)
+
+    def __contains__(self, key):
+        return key in self._exams
+
+    def add(self, key, exam):
+        """Index an exam of a key, ignoring values without a valid exam time."""
+        if isinstance(exam, str):
+            exam = parse_exam(exam)
+        if exam is None or exam in self._exams[key]:
+            return
+        self._exams[key].append(exam)
+        date, start, end = exam
+        self._entries.append((date, start, end, key))
+        self._longest = max(self._longest, end - start)
+        self._sorted = False
+
+    def exams(self, key):
+        """Return the (date, start, end) exams of a key."""
+        return list(self._exams.get(key, ()))
+
+    def entries(self):
+        """Return the (date, start, end, key) exams sorted by date, start and end."""
+        self._sort()
+        return list(self._entries)
+
+    def at(self, date, start, end=None):
+        """
+        Return the keys with an exam on a date between start and end.
+
+        Args:
+            date (jdatetime.date or str): Date of the period, or "YYYY/MM/DD".
+            start (int or str): Start of the period, in minutes or "HH:MM".
+            end (int or str): End of the period (exclusive); defaults to start,
+                to find the exams in progress at that instant.
+
+        Returns:
+            list: Matching keys, ordered by exam start.
+        """
+        date = parse_date(date) if isinstance(date, str) else date
+        start = parse_time(start) if isinstance(start, str) else start
+        end = start if end is None else parse_time(end) if isinstance(end, str) else end
+        keys = []
+        for _, _, _, key in self._overlapping(date, start, max(end, start + 1)):
+            if key not in keys:
+                keys.append(key)
+        return keys
+
+    def overlapping(self, key):
+        """Return the other keys with an exam overlapping one of the exams of a key."""
+        keys = []
+        for date, start, end in self._exams.get(key, ()):
+            for _, _, _, other in self._overlapping(date, start, end):
+                if other != key and other not in keys:
+                    keys.append(other)
+        return keys
+
+    def collisions(self):
+        """
+        Find every pair of overlapping exams of different keys.
+
+        Yields:
+            tuple: (key, other_key, date, start, end) for each pair, with the
+            period both exams share. other_key's exam starts first (or at the
+            same time).
+        """
+        self._sort()
+        running = []  # Heap of (end, order, key) of the exams not over yet
+        current_date = None
+        for order, (date, start, end, key) in enumerate(self._entries):
+            if date != current_date:
+                current_date = date
+                running = []
+            while running and running[0][0] <= start:
+                heapq.heappop(running)
+            for other_end, _, other in running:  # All of them end after this one starts
+                if other != key:
+                    yield key, other, date, start, min(end, other_end)
+            heapq.heappush(running, (end, order, key))
+
+    def _overlapping(self, date, start, end):
+        """Yield the (date, start, end, key) exams overlapping [start, end) on a date."""
+        self._sort()
+        first = bisect_left(self._starts, (date, start - self._longest))
+        last = bisect_left(self._starts, (date, end), first)
+        for index in range(first, last):
+            entry = self._entries[index]
+            if entry[2] > start:
+                yield entry
+
+    def _sort(self):
+        if not self._sorted:
+            self._entries.sort(key=lambda entry: entry[:3])
+            self._starts = [entry[:2] for entry in self._entries]
+            self._sorted = True
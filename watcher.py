@@ -0,0 +1,103 @@
+"""
+Wait for changes in a folder.
+
+FolderWatcher uses inotify on Linux (through ctypes, no extra package is
+needed) and falls back to waking up at a fixed interval elsewhere. It only
+says that something may have changed: callers compare the folder with its
+previous state (see folder_state) to find what did.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import time
+
+# inotify events that can change the files of a folder
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# Time given to a burst of events (like a scraper writing several pages) to end
+SETTLE_DELAY = 0.1
+
+
+def folder_state(folder_path, suffix=".html"):
+    """Return {file path: (size, modification time)} for the files of a folder with a suffix."""
+    state = {}
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.name.endswith(suffix) and entry.is_file():
+                stat = entry.stat()
+                state[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    return state
+
+
+def _inotify_fd(folder_path):
+    """Return an inotify file descriptor watching a folder, or None if inotify is unavailable."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        init, add_watch = libc.inotify_init1, libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+    if fd < 0:
+        return None
+    if add_watch(fd, os.fsencode(folder_path), WATCH_MASK) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class FolderWatcher:
+    """
+    Wait until the files of a folder may have changed.
+
+    Args:
+        folder_path (str): Folder to watch.
+        interval (float): Longest wait in seconds. Without inotify, the
+            folder is checked this often.
+        use_inotify (bool): Set to False to always poll.
+    """
+
+    def __init__(self, folder_path, interval=0.5, use_inotify=True):
+        self.interval = interval
+        self._fd = _inotify_fd(folder_path) if use_inotify else None
+        self.method = "polling" if self._fd is None else "inotify"
+
+    def wait(self):
+        """
+        Block until an event is reported, or for at most interval seconds.
+
+        Returns:
+            bool: True if inotify reported an event (always False when polling).
+        """
+        if self._fd is None:
+            time.sleep(self.interval)
+            return False
+        readable, _, _ = select.select([self._fd], [], [], self.interval)
+        if not readable:
+            return False
+        time.sleep(SETTLE_DELAY)
+        self._drain()
+        return True
+
+    def _drain(self):
+        try:
+            while os.read(self._fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()